@@ -2,20 +2,35 @@ import os
 import pandas as pd
 import sqlite3
 import logging # 追加
-from config import DELIMITERS, ENCODINGS, SKIP_EXTENSIONS
+from config import ENCODINGS, SKIP_EXTENSIONS, STAGING_PARSE_ROWS, SCHEMA_DRIFT_CHECK_ROWS
+from staging_cache import StagingCache, detect_delimiter, with_missing_values
+from duplicate_detector import MinHasher, signature_rows, save_signatures, find_duplicate_columns
+from column_index import rebuild_index
+from schema_catalog import get_catalog
+from excel_reader import is_excel, read_sheet, sheet_logical_name, sheet_names, split_logical_name
+from compressed_input import is_compressed, list_members, open_text
+from schema_registry import SchemaRegistry
+from inference_memo import InferenceMemo, rules_key
+from rule_store import RuleStore
+from sap_normalizer import SapNormalizer
+from pattern_rules import TypeCorrectionRules
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s') # 追加
 logger = logging.getLogger(__name__) # 追加
 
-def infer_sqlite_type(series, column_name, file_name=None):
-    """改良版：SAP対応 + T002修正ルール適用型推定"""
+# 型推定に使うサンプル行数
+ANALYZE_SAMPLE_ROWS = 200
+
+def infer_sqlite_type(series, column_name, file_name=None, corrector=None):
+    """改良版：SAP対応 + T002修正ルール適用型推定
+    
+    corrector: T002修正ルール（TypeCorrectionRules）。列ごとにルールストアを開かないよう、
+               複数列を推定する場合は呼び出し側で1回だけ作って渡す
+    """
     
     # 1. TypeCorrectionRulesのインスタンス化
-    try:
-        from pattern_rules import TypeCorrectionRules
+    if corrector is None and file_name:
         corrector = TypeCorrectionRules()
-    except ImportError:
-        corrector = None
     
     s = series.dropna().astype(str)
     if len(s) == 0:
@@ -35,6 +50,32 @@ def infer_sqlite_type(series, column_name, file_name=None):
     
     return initial_inferred_type, initial_inferred_type # 修正ルールがない場合も両方返す
 
+# SAP日付形式対応（拡張版）
+DATE_FORMATS = [
+    "%Y-%m-%d", "%Y/%m/%d", "%Y%m%d", 
+    "%Y-%m-%d %H:%M:%S", "%H:%M:%S",
+    "%d.%m.%Y",  # SAP標準：DD.MM.YYYY
+    "%d/%m/%Y",  # DD/MM/YYYY
+    "%m/%d/%Y"   # MM/DD/YYYY
+]
+
+def detect_date_format(s):
+    """サンプル全体を解釈できる日付フォーマットを返す（該当なしはNone）
+    
+    loader.pyの型変換でも同じフォーマットを再利用するため、column_masterに保存する。
+    """
+    # 全値が解釈できるかだけを見るため、ユニーク値で判定すれば十分
+    s = pd.Series(s.dropna().astype(str).unique())
+    if len(s) == 0:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            pd.to_datetime(s, format=fmt, errors="raise")
+            return fmt
+        except Exception:
+            continue
+    return None
+
 def _original_infer_logic(s, column_name):
     """元の型推定ロジック（T002修正前）"""
     
@@ -55,20 +96,8 @@ def _original_infer_logic(s, column_name):
             normalized_s.iloc[i] = '-' + val[:-1]
 
     # SAP日付形式対応（拡張版）
-    date_formats = [
-        "%Y-%m-%d", "%Y/%m/%d", "%Y%m%d", 
-        "%Y-%m-%d %H:%M:%S", "%H:%M:%S",
-        "%d.%m.%Y",  # SAP標準：DD.MM.YYYY
-        "%d/%m/%Y",  # DD/MM/YYYY
-        "%m/%d/%Y"   # MM/DD/YYYY
-    ]
-    
-    for fmt in date_formats:
-        try:
-            pd.to_datetime(s, format=fmt, errors="raise")
-            return "DATETIME"
-        except Exception:
-            continue
+    if detect_date_format(s) is not None:
+        return "DATETIME"
 
     # 数値判定（改良版）
     # 1. まず整数チェック（後ろマイナス対応後）
@@ -98,19 +127,113 @@ def _original_infer_logic(s, column_name):
 
     return "TEXT"
 
-def detect_delimiter(file_path, encoding, sample_lines=5):
-    """複数行を使って区切り文字を推定する"""
-    with open(file_path, "r", encoding=encoding, errors="ignore") as f:
-        lines = [f.readline() for _ in range(sample_lines)]
-    text = "".join(lines)
-    counts = {d: text.count(d) for d in DELIMITERS}
-    return max(counts, key=counts.get)
+def _read_excel_samples(file_path, file_name, cache):
+    """Excelの全シートの型推定用サンプル → [(論理ファイル名, df, "excel", None)]
+    
+    シートは先頭から必要な行数だけストリーミングで読む（ブック全体を展開しない）
+    """
+    try:
+        names = sheet_names(file_path)
+    except Exception as e:
+        print(f"読み込み失敗(Excel): {file_name}, {e}")
+        return []
+
+    samples = []
+    for sheet in names:
+        logical_name = sheet_logical_name(file_name, sheet, len(names))
+        try:
+            cached = cache.get(file_path, ANALYZE_SAMPLE_ROWS, member=sheet)
+            if cached is not None:
+                raw = cached[0]
+            else:
+                raw = read_sheet(file_path, sheet, STAGING_PARSE_ROWS)
+                if len(raw.columns) == 0:
+                    continue  # 空のシート
+                cache.put(file_path, raw, "excel", None, complete=len(raw) < STAGING_PARSE_ROWS, member=sheet)
+            samples.append((logical_name, with_missing_values(raw.head(ANALYZE_SAMPLE_ROWS)), "excel", None))
+        except Exception as e:
+            print(f"読み込み失敗(Excel): {logical_name}, {e}")
+    return samples
 
 
-def analyze_files(data_dir, output_file, db_file="master.db"):
+def _read_samples(file_path, file_name, cache):
+    """型推定用サンプルを読み込む → [(論理ファイル名, df, encoding, delimiter)]。失敗時は空リスト
+    
+    テキスト/CSVは1ファイル1件、Excelはシートごとに1件、.gz / .zip はメンバーごとに1件。
+    """
+    if is_excel(file_name):
+        return _read_excel_samples(file_path, file_name, cache)
+    if is_compressed(file_name):
+        try:
+            members = list_members(file_path)
+        except Exception as e:
+            print(f"読み込み失敗(圧縮ファイル): {file_name}, {e}")
+            return []
+        samples = []
+        for logical_name, member in members:
+            sample = _read_sample(file_path, logical_name, cache, member)
+            if sample is not None:
+                samples.append((logical_name, *sample))
+        return samples
+    sample = _read_sample(file_path, file_name, cache)
+    return [(file_name, *sample)] if sample is not None else []
+
+
+def _read_sample(file_path, file_name, cache, member=None):
+    """型推定用サンプルを読み込む → (df, encoding, delimiter)。失敗時はNone
+    
+    ステージングキャッシュにあれば再解析せずに使う。ミス時はloaderと共用できる行数を
+    解析してキャッシュに保存する（値は生の文字列で保存し、推定時に欠損値へ変換）。
+    """
+    cached = cache.get(file_path, ANALYZE_SAMPLE_ROWS, member=member)
+    if cached is not None:
+        raw, enc, delimiter = cached
+        return with_missing_values(raw.head(ANALYZE_SAMPLE_ROWS)), enc, delimiter
+
+    # テキスト/CSV
+    for enc in ENCODINGS:
+        try:
+            delimiter = detect_delimiter(file_path, enc, member=member)
+            with open_text(file_path, enc, member) as f:
+                raw = pd.read_csv(f, delimiter=delimiter, dtype=str, nrows=STAGING_PARSE_ROWS,
+                                  engine="python", na_filter=False)
+            cache.put(file_path, raw, enc, delimiter, complete=len(raw) < STAGING_PARSE_ROWS, member=member)
+            return with_missing_values(raw.head(ANALYZE_SAMPLE_ROWS)), enc, delimiter
+        except Exception:
+            continue
+
+    print(f"読み込み失敗: {file_name}")
+    return None
+
+
+def analyze_files(data_dir, output_file, db_file="master.db", file_names=None, failed_files=None):
+    """data_dir のファイルを解析して column_master に登録する
+    
+    file_names を指定した場合はそのファイルだけを解析する（監視デーモンからの1ファイル取り込み用）。
+    この場合、他のファイルの行を含む列候補CSVは上書きしない。
+    failed_files にリストを渡した場合は、読み込めなかったファイル名を追加する（空のファイルは除く）。
+    """
     results = []
+    cache = StagingCache()
+    hasher = MinHasher()
+    analyzed_files = []
+    signatures = []  # 重複列検出用のMinHash署名
 
-    for file_name in os.listdir(data_dir):
+    # T002修正ルールは解析1回につき1つだけ作り、全列で共有する。ルール・バージョン・SAPパターンは
+    # すべてレジストリ・メモと同じ db_file のルールストアから取る（空のストアはJSONから取り込まれる）
+    store = RuleStore(db_file)
+    corrector = TypeCorrectionRules(store)
+    rules_version = store.version()
+    rules_data = store.snapshot()
+    conn = sqlite3.connect(db_file)
+    # 既知のヘッダー（レイアウト）は記録済みの型を再利用し、新しいレイアウト・列だけ推定する
+    registry = SchemaRegistry(conn, rules_version, SapNormalizer(rules_data.get('sap_patterns')))
+    # 中身が前回と同じ列は推定結果のメモを使う（ルールが変わるとメモは破棄される）
+    memo = InferenceMemo(conn, rules_key(rules_version))
+    file_specific_rules = rules_data.get('unregistered_files', {})
+    layouts = []
+
+    for file_name in (os.listdir(data_dir) if file_names is None else file_names):
         file_path = os.path.join(data_dir, file_name)
 
         if not os.path.isfile(file_path):
@@ -118,55 +241,59 @@ def analyze_files(data_dir, output_file, db_file="master.db"):
         if any(file_name.lower().endswith(ext) for ext in SKIP_EXTENSIONS):
             continue
 
-        # Excel
-        if file_name.lower().endswith((".xls", ".xlsx")):
-            try:
-                df = pd.read_excel(file_path, nrows=200, dtype=str)
-                for col in df.columns:
-                    initial_type, corrected_type = infer_sqlite_type(df[col], col, file_name)
-                    results.append({
-                        "file_name": file_name,
-                        "column_name": col,
-                        "Inferred_Type": corrected_type, # 修正後の型を格納
-                        "Initial_Inferred_Type": initial_type, # 初期推定型を格納
-                        "Encoding": "excel",
-                        "Delimiter": None
-                    })
-                continue
-            except Exception as e:
-                print(f"読み込み失敗(Excel): {file_name}, {e}")
-                continue
-
-        # テキスト/CSV
-        success = False
-        for enc in ENCODINGS:
-            try:
-                delimiter = detect_delimiter(file_path, enc)
-                df = pd.read_csv(file_path, delimiter=delimiter, dtype=str, nrows=200, encoding=enc, engine="python")
-                for col in df.columns:
-                    initial_type, corrected_type = infer_sqlite_type(df[col], col, file_name)
-                    results.append({
-                        "file_name": file_name,
-                        "column_name": col,
+        # Excelはシートごと、圧縮ファイルはメンバーごとに別の論理ファイルとして登録する
+        samples = _read_samples(file_path, file_name, cache)
+        if not samples and failed_files is not None and os.path.getsize(file_path) > 0:
+            failed_files.append(file_name)
+        for logical_name, df, enc, delimiter in samples:
+            # ファイル別ルール（unregistered_files など）はブック名・メンバー名で引く
+            rule_file_name = split_logical_name(logical_name)[0]
+            analyzed_files.append(logical_name)
+            signatures.extend(signature_rows(logical_name, df, hasher))
+
+            # ファイル固有ルールのあるファイルはファイル名で型が変わるため常に推定する
+            file_specific = rule_file_name in file_specific_rules
+            known = {} if file_specific else registry.lookup(logical_name, list(df.columns), enc, delimiter)
+            types = {}
+            for col in df.columns:
+                info = known.get(col)
+                if info is not None and registry.drifted(df[col], info, SCHEMA_DRIFT_CHECK_ROWS):
+                    print(f"スキーマレジストリ: {logical_name}:{col} が記録済みの型 {info['Inferred_Type']} と異なるため再推定")
+                    info = None
+                memo_key = None
+                if info is None and not file_specific:
+                    memo_key = memo.key(col, df[col])
+                    info = memo.get(memo_key)
+                if info is None:
+                    initial_type, corrected_type = infer_sqlite_type(df[col], col, rule_file_name, corrector)
+                    info = {
                         "Inferred_Type": corrected_type, # 修正後の型を格納
                         "Initial_Inferred_Type": initial_type, # 初期推定型を格納
-                        "Encoding": enc,
-                        "Delimiter": delimiter
-                    })
-                success = True
-                break
-            except Exception:
-                continue
-
-        if not success:
-            print(f"読み込み失敗: {file_name}")
+                        "Date_Format": detect_date_format(df[col]) if corrected_type == "DATETIME" else None
+                    }
+                    if memo_key is not None:
+                        memo.put(memo_key, info)
+                types[col] = info
+                results.append({
+                    "file_name": logical_name,
+                    "column_name": col,
+                    "Inferred_Type": info["Inferred_Type"],
+                    "Initial_Inferred_Type": info["Initial_Inferred_Type"],
+                    "Encoding": enc,
+                    "Delimiter": delimiter,
+                    "Date_Format": info["Date_Format"]
+                })
+            reused = sum(1 for col in df.columns if known.get(col) is types[col])
+            if reused:
+                print(f"スキーマレジストリ: {logical_name} {reused}/{len(df.columns)}列の型を再利用")
+            layouts.append((logical_name, list(df.columns), enc, delimiter, types, reused == len(df.columns)))
 
     # CSV保存
-    pd.DataFrame(results).to_csv(output_file, index=False, encoding="utf-8-sig")
-    print(f"列候補を出力しました → {output_file}")
+    if file_names is None:
+        pd.DataFrame(results).to_csv(output_file, index=False, encoding="utf-8-sig")
+        print(f"列候補を出力しました → {output_file}")
 
     # SQLiteに保存
-    conn = sqlite3.connect(db_file)
     cur = conn.cursor()
 
     cur.execute("""
@@ -177,23 +304,44 @@ def analyze_files(data_dir, output_file, db_file="master.db"):
             initial_inferred_type TEXT,
             encoding TEXT,
             delimiter TEXT,
+            date_format TEXT,
+            sap_rules TEXT,
             PRIMARY KEY (file_name, column_name)
         )
     """)
 
+    # 旧スキーマのDBにはdate_format / sap_rules列がないため追加
+    existing_columns = get_catalog(conn).columns("column_master")
+    for extra_column in ("date_format", "sap_rules"):
+        if extra_column not in existing_columns:
+            cur.execute(f"ALTER TABLE column_master ADD COLUMN {extra_column} TEXT")
+    # T002ルール評価（rule_engine）の型条件での絞り込み用
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_column_master_types ON column_master (initial_inferred_type, data_type)")
+
     for row in results:
         cur.execute("""
-            INSERT INTO column_master (file_name, column_name, data_type, initial_inferred_type, encoding, delimiter)
-            VALUES (?, ?, ?, ?, ?, ?)
+            INSERT INTO column_master (file_name, column_name, data_type, initial_inferred_type, encoding, delimiter, date_format)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
             ON CONFLICT(file_name, column_name)
             DO UPDATE SET 
                 data_type=excluded.data_type,
                 initial_inferred_type=excluded.initial_inferred_type,
                 encoding=excluded.encoding,
-                delimiter=excluded.delimiter
-        """, (row["file_name"], row["column_name"], row["Inferred_Type"], row["Initial_Inferred_Type"], row.get("Encoding"), row.get("Delimiter")))
+                delimiter=excluded.delimiter,
+                date_format=excluded.date_format
+        """, (row["file_name"], row["column_name"], row["Inferred_Type"], row["Initial_Inferred_Type"], row.get("Encoding"), row.get("Delimiter"), row.get("Date_Format")))
+
+    # 今回のレイアウトと列の型を記録
+    for layout in layouts:
+        registry.record(*layout)
+    memo.flush()
+
+    # 重複列検出（MinHash署名を保存し、LSHで候補ペアのみ比較）
+    save_signatures(conn, analyzed_files, signatures)
 
     conn.commit()
+    find_duplicate_columns(conn)
+    rebuild_index(conn)
     conn.close()
     print(f"SQLiteに保存しました → {db_file}")
 
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+列名インデックス
+column_master の列名から「どのファイルにこの列（に似た列）があるか」を引くための索引
+
+- column_master(column_name) の二次インデックス（完全一致）
+- column_name_index: 正規化した列名（NFKC・大文字小文字無視・空白除去）
+- column_name_ngram: 正規化した列名の2-gram（部分一致。日本語・英字の両方に対応）
+
+複数の列名をまとめて検索する場合は一時テーブルに検索語を入れて1回のJOINで解決する。
+"""
+
+import sqlite3
+import unicodedata
+from typing import Dict, Iterable, List, Tuple
+
+NGRAM_SIZE = 2
+
+
+def normalize_column_name(name: str) -> str:
+    """列名の正規化（全角/半角・大文字/小文字・空白の違いを吸収）"""
+    normalized = unicodedata.normalize('NFKC', str(name)).casefold()
+    return ''.join(normalized.split())
+
+
+def column_ngrams(normalized: str, n: int = NGRAM_SIZE) -> List[str]:
+    """正規化済み列名のn-gram（n文字未満の列名はそのまま1つのgramとする）"""
+    if len(normalized) <= n:
+        return [normalized] if normalized else []
+    return sorted({normalized[i:i + n] for i in range(len(normalized) - n + 1)})
+
+
+def init_tables(conn: sqlite3.Connection) -> None:
+    """索引テーブル・インデックスを作成"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_column_master_column_name ON column_master (column_name)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS column_name_index (
+            file_name TEXT,
+            column_name TEXT,
+            normalized_name TEXT,
+            PRIMARY KEY (file_name, column_name)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_column_name_index_normalized ON column_name_index (normalized_name)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS column_name_ngram (
+            gram TEXT,
+            file_name TEXT,
+            column_name TEXT,
+            PRIMARY KEY (gram, file_name, column_name)
+        ) WITHOUT ROWID
+    """)
+
+
+def rebuild_index(conn: sqlite3.Connection) -> int:
+    """column_master から索引を作り直し、索引した列数を返す"""
+    init_tables(conn)
+    rows = conn.execute("SELECT file_name, column_name FROM column_master").fetchall()
+
+    name_rows = []
+    gram_rows = []
+    for file_name, column_name in rows:
+        normalized = normalize_column_name(column_name)
+        name_rows.append((file_name, column_name, normalized))
+        gram_rows.extend((gram, file_name, column_name) for gram in column_ngrams(normalized))
+
+    conn.execute("DELETE FROM column_name_index")
+    conn.execute("DELETE FROM column_name_ngram")
+    conn.executemany("INSERT INTO column_name_index VALUES (?, ?, ?)", name_rows)
+    conn.executemany("INSERT OR IGNORE INTO column_name_ngram VALUES (?, ?, ?)", gram_rows)
+    conn.commit()
+    return len(name_rows)
+
+
+def ensure_index(conn: sqlite3.Connection) -> None:
+    """索引の (ファイル名, 列名) が column_master と一致しなければ作り直す（analyze実行時は常に作り直す）
+
+    件数が同じ変更（列名の変更・ファイルの入れ替え）も検出するため、件数に加えて
+    column_master にあって索引にない行がないかを主キー同士で比べる。
+    """
+    init_tables(conn)
+    master_count = conn.execute("SELECT COUNT(*) FROM column_master").fetchone()[0]
+    index_count = conn.execute("SELECT COUNT(*) FROM column_name_index").fetchone()[0]
+    if master_count != index_count or conn.execute("""
+        SELECT 1 FROM (
+            SELECT file_name, column_name FROM column_master
+            EXCEPT SELECT file_name, column_name FROM column_name_index
+        ) LIMIT 1
+    """).fetchone():
+        rebuild_index(conn)
+
+
+def _load_queries(conn: sqlite3.Connection, names: Iterable[str]) -> List[str]:
+    """検索語を一時テーブルに格納"""
+    names = list(dict.fromkeys(names))
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _column_lookup (query TEXT PRIMARY KEY, normalized TEXT)")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _column_lookup_gram (query TEXT, gram TEXT, PRIMARY KEY (query, gram))")
+    conn.execute("DELETE FROM _column_lookup")
+    conn.execute("DELETE FROM _column_lookup_gram")
+    conn.executemany("INSERT INTO _column_lookup VALUES (?, ?)",
+                     [(name, normalize_column_name(name)) for name in names])
+    conn.executemany("INSERT OR IGNORE INTO _column_lookup_gram VALUES (?, ?)",
+                     [(name, gram) for name in names for gram in column_ngrams(normalize_column_name(name))])
+    return names
+
+
+def find_columns(conn: sqlite3.Connection, names: Iterable[str],
+                 mode: str = 'normalized') -> Dict[str, List[Tuple[str, str]]]:
+    """列名ごとに一致する (ファイル名, 列名) を返す
+
+    Args:
+        mode: 'exact'（完全一致）/ 'normalized'（正規化後の完全一致）/ 'partial'（正規化後の部分一致）
+    """
+    ensure_index(conn)
+    names = _load_queries(conn, names)
+    params = ()
+    if mode == 'exact':
+        sql = """
+            SELECT q.query, m.file_name, m.column_name
+            FROM _column_lookup q JOIN column_master m ON m.column_name = q.query
+        """
+    elif mode == 'normalized':
+        sql = """
+            SELECT q.query, i.file_name, i.column_name
+            FROM _column_lookup q JOIN column_name_index i ON i.normalized_name = q.normalized
+        """
+    elif mode == 'partial':
+        # 検索語のgramをすべて含む列を候補にし、最後に部分文字列として含むか確認する
+        sql = """
+            SELECT q.query, g.file_name, g.column_name
+            FROM _column_lookup_gram qg
+            JOIN column_name_ngram g ON g.gram = qg.gram
+            JOIN _column_lookup q ON q.query = qg.query
+            JOIN column_name_index i ON i.file_name = g.file_name AND i.column_name = g.column_name
+            WHERE instr(i.normalized_name, q.normalized) > 0
+            GROUP BY q.query, g.file_name, g.column_name
+            HAVING COUNT(*) = (SELECT COUNT(*) FROM _column_lookup_gram c WHERE c.query = q.query)
+            UNION
+            -- n文字未満の検索語はgramで絞り込めないため正規化名を直接走査する
+            SELECT q.query, i.file_name, i.column_name
+            FROM _column_lookup q JOIN column_name_index i ON instr(i.normalized_name, q.normalized) > 0
+            WHERE length(q.normalized) < ?
+        """
+        params = (NGRAM_SIZE,)
+    else:
+        raise ValueError(f"不明な検索モード: {mode}")
+
+    results: Dict[str, List[Tuple[str, str]]] = {name: [] for name in names}
+    for query, file_name, column_name in conn.execute(sql + " ORDER BY 1, 2, 3", params):
+        results[query].append((file_name, column_name))
+    return results
+
+
+def find_files(conn: sqlite3.Connection, names: Iterable[str], mode: str = 'normalized') -> Dict[str, List[str]]:
+    """列名ごとに、その列（に似た列）を持つファイル名の一覧を返す"""
+    return {
+        name: sorted({file_name for file_name, _ in matches})
+        for name, matches in find_columns(conn, names, mode).items()
+    }
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+DataFrameのメモリ削減
+読み込みはすべて dtype=str（1セル1つのPython文字列）のため、型変換後のチャンクを
+書き込みまでの間（キュー上・書き込み中）小さく持つように列の型を詰める。
+
+- 保管場所・工場・会社などのコード列（COMPACT_CATEGORY_COLUMNS）と、値の種類が少ない文字列列はカテゴリ型
+- その他の文字列列は pyarrow があれば Arrow 文字列（任意依存。なければPython文字列のまま）
+- 整数列は値の範囲に収まる最小の整数型（Int8/16/32）、実数列は値が変わらない場合のみ float32
+- どの型もSQLiteへの書き込み時は元の型と同じ列型（TEXT / INTEGER / REAL）・値になる
+"""
+
+import threading
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import COMPACT_CATEGORY_COLUMNS, COMPACT_CATEGORY_MAX_RATIO
+
+try:
+    import pyarrow  # noqa: F401
+    ARROW_STRING = pd.StringDtype('pyarrow')
+except ImportError:  # pyarrowは任意依存
+    ARROW_STRING = None
+
+# この行数未満のチャンクは値の種類の割合を判定しない（コード列の指定だけでカテゴリ化）
+MIN_CATEGORY_ROWS = 100
+_INT_TYPES = [('Int8', np.int8), ('Int16', np.int16), ('Int32', np.int32)]
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """DataFrameのメモリ使用量（文字列の中身を含む）"""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _is_code_column(col_name: str, category_columns: Iterable[str]) -> bool:
+    return any(name in str(col_name) for name in category_columns)
+
+
+def _downcast_integer(s: pd.Series) -> pd.Series:
+    values = s.dropna()
+    if values.empty:
+        return s.astype('Int8')
+    low, high = values.min(), values.max()
+    for dtype, info in _INT_TYPES:
+        limits = np.iinfo(info)
+        if limits.min <= low and high <= limits.max:
+            return s.astype(dtype)
+    return s
+
+
+def _downcast_float(s: pd.Series) -> pd.Series:
+    narrow = s.astype('float32')
+    # float32で値が変わる（丸められる）列は元のまま
+    if ((narrow.astype('float64') == s) | s.isna()).all():
+        return narrow
+    return s
+
+
+def _compact_text(s: pd.Series, col_name: str, category_columns: Iterable[str],
+                  max_ratio: Optional[float]) -> pd.Series:
+    if _is_code_column(col_name, category_columns):
+        return s.astype('category')
+    if max_ratio is not None and len(s) >= MIN_CATEGORY_ROWS and s.nunique() <= len(s) * max_ratio:
+        return s.astype('category')
+    if ARROW_STRING is not None and s.dtype == object:
+        return s.astype(ARROW_STRING)
+    return s
+
+
+def compact_frame(df: pd.DataFrame, category_columns: Iterable[str] = COMPACT_CATEGORY_COLUMNS,
+                  max_category_ratio: Optional[float] = COMPACT_CATEGORY_MAX_RATIO) -> pd.DataFrame:
+    """列の型をメモリの小さい型に置き換える（dfをそのまま書き換えて返す）
+
+    Args:
+        category_columns: 列名にこの文字列を含む文字列列は常にカテゴリ型にする
+        max_category_ratio: 値の種類数が行数のこの割合以下の文字列列もカテゴリ型にする（Noneは判定しない）
+    """
+    for col_name in df.columns:
+        s = df[col_name]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(s.dtype):
+            df[col_name] = _downcast_integer(s)
+        elif pd.api.types.is_float_dtype(s.dtype):
+            df[col_name] = _downcast_float(s)
+        elif s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+            df[col_name] = _compact_text(s, col_name, category_columns, max_category_ratio)
+    return df
+
+
+class MemoryReport:
+    """1ファイル分の削減前後のメモリ量を集計する（解析ワーカーから並行に呼ばれる）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.before_bytes = 0
+        self.after_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, before_bytes: int, after_bytes: int) -> None:
+        with self._lock:
+            self.before_bytes += before_bytes
+            self.after_bytes += after_bytes
+
+    def convert(self, df: pd.DataFrame, convert: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+        """文字列のチャンクを convert で型変換して詰め、前後の大きさを記録する
+
+        convert は df をそのまま書き換えてよい（変換前の大きさは先に測る）
+        """
+        before = frame_bytes(df)
+        converted = compact_frame(convert(df))
+        self.add(before, frame_bytes(converted))
+        return converted
+
+    @property
+    def saved_ratio(self) -> float:
+        if self.before_bytes == 0:
+            return 0.0
+        return 1 - self.after_bytes / self.before_bytes
+
+    def summary(self) -> str:
+        return (f"メモリ: {self.name} 文字列 {self.before_bytes / 1024 ** 2:.1f}MB → "
+                f"型変換・圧縮後 {self.after_bytes / 1024 ** 2:.1f}MB（{self.saved_ratio:.0%} 削減）")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+比較レポート（推定型と実際の型の比較結果）のDB保存
+load_and_compare の結果を実行IDつきで compare_report テーブルに蓄積し、
+T001/T002の分析はインデックス付きのテーブル・ビューへのSQLで行う
+
+- compare_runs:   実行ごとの情報（開始・終了日時、部分再ロードの対象ファイル）
+- compare_report: 実行ID × ファイル × 列 の比較結果（過去の実行も保持）
+- compare_report_latest: 最新の全件ロードの結果に、その後の部分再ロードの結果を重ねたビュー
+  （全件ロードで失敗した・なくなったファイルの古い結果は含めない）
+- v_t002_*:       T002の問題パターンごとのビュー（compare_report_latest が対象）
+"""
+
+import csv
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+import type_profiler
+
+REPORT_COLUMNS = ["File", "Column", "Inferred_Type", "Actual_Type", "Match", "Encoding", "Delimiter"]
+UNREGISTERED_TYPES = ('未登録', '（未登録）')
+
+# T002の問題パターン -> ビュー名
+PATTERN_VIEWS = {
+    "mismatch": "v_compare_mismatch",
+    "unregistered": "v_t002_unregistered",
+    "datetime_to_text": "v_t002_datetime_to_text",
+    "integer_to_text": "v_t002_integer_to_text",
+    "storage_location": "v_t002_storage_location",
+    "value_type_mismatch": "v_t002_value_type_mismatch",
+}
+
+_VIEW_DEFINITIONS = {
+    "compare_report_latest": """
+        SELECT r.* FROM compare_report AS r
+        WHERE r.run_id >= (SELECT COALESCE(MAX(f.run_id), 0) FROM compare_runs AS f WHERE f.target_files IS NULL)
+          AND r.run_id = (SELECT MAX(l.run_id) FROM compare_report AS l WHERE l.File = r.File)
+    """,
+    "v_compare_mismatch": "SELECT * FROM compare_report_latest WHERE Match != '○'",
+    "v_t002_unregistered": f"""
+        SELECT * FROM compare_report_latest
+        WHERE Inferred_Type IN ({', '.join(repr(t) for t in UNREGISTERED_TYPES)})
+    """,
+    "v_t002_datetime_to_text": """
+        SELECT * FROM compare_report_latest WHERE Inferred_Type = 'DATETIME' AND Actual_Type = 'TEXT'
+    """,
+    "v_t002_integer_to_text": """
+        SELECT * FROM compare_report_latest WHERE Inferred_Type = 'INTEGER' AND Actual_Type = 'TEXT'
+    """,
+    "v_t002_storage_location": """
+        SELECT * FROM compare_report_latest
+        WHERE File LIKE '%zm114%' AND Column LIKE '%保管場所%' AND Inferred_Type = 'INTEGER'
+    """,
+    # 宣言型と実際の格納型（typeof）が食い違う列（例: INTEGER列にTEXT値）
+    "v_t002_value_type_mismatch": """
+        SELECT r.*, p.dominant_type AS Stored_Type, p.foreign_count AS Foreign_Count, p.total AS Profiled_Rows
+        FROM compare_report_latest AS r
+        JOIN column_type_profile AS p ON p.file_name = r.File AND p.column_name = r.Column
+        WHERE p.foreign_count > 0
+    """,
+}
+
+
+def init_tables(conn: sqlite3.Connection) -> None:
+    """テーブル・インデックス・ビューを作成"""
+    type_profiler.init_tables(conn)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compare_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at DATETIME,
+            finished_at DATETIME,
+            target_files TEXT,
+            row_count INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compare_report (
+            run_id INTEGER,
+            File TEXT,
+            Column TEXT,
+            Inferred_Type TEXT,
+            Actual_Type TEXT,
+            Match TEXT,
+            Encoding TEXT,
+            Delimiter TEXT,
+            PRIMARY KEY (run_id, File, Column)
+        )
+    """)
+    # ファイル・列での検索と、ファイルごとの最新実行の特定（MAX(run_id)）に使う
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_compare_report_file_column ON compare_report (File, Column, run_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_compare_report_types ON compare_report (Inferred_Type, Actual_Type)")
+    # 定義が変わったビューだけ作り直す（毎回作り直すと schema_version が変わり続ける）
+    existing = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'view'"))
+    for view_name, definition in _VIEW_DEFINITIONS.items():
+        sql = f"CREATE VIEW {view_name} AS {definition.strip()}"
+        if existing.get(view_name) != sql:
+            conn.execute(f"DROP VIEW IF EXISTS {view_name}")
+            conn.execute(sql)
+
+
+def save_run(conn: sqlite3.Connection, rows: List[Dict], target_files: Optional[Iterable[str]] = None,
+             started_at: Optional[str] = None) -> int:
+    """比較結果を新しい実行として保存し、実行IDを返す
+
+    Args:
+        target_files: 部分再ロードの対象ファイル（全件ロードの場合はNone）
+    """
+    init_tables(conn)
+    now = datetime.now().isoformat(timespec='seconds')
+    cursor = conn.execute(
+        "INSERT INTO compare_runs (started_at, finished_at, target_files, row_count) VALUES (?, ?, ?, ?)",
+        (started_at or now, now,
+         json.dumps(sorted(target_files), ensure_ascii=False) if target_files is not None else None,
+         len(rows))
+    )
+    run_id = cursor.lastrowid
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO compare_report (run_id, {', '.join(REPORT_COLUMNS)})
+        VALUES (?, {', '.join('?' for _ in REPORT_COLUMNS)})
+    """, [(run_id, *(row.get(col) for col in REPORT_COLUMNS)) for row in rows])
+    conn.commit()
+    return run_id
+
+
+def fetch_frame(conn: sqlite3.Connection, view: str = "compare_report_latest") -> pd.DataFrame:
+    """ビュー（またはパターン名）の内容をDataFrameで取得"""
+    init_tables(conn)
+    view = PATTERN_VIEWS.get(view, view)
+    if view not in _VIEW_DEFINITIONS:
+        raise ValueError(f"不明なビュー: {view}")
+    return pd.read_sql_query(f"SELECT {', '.join(REPORT_COLUMNS)} FROM {view} ORDER BY File, Column", conn)
+
+
+def export_csv(conn: sqlite3.Connection, csv_path: str, view: str = "compare_report_latest",
+               chunk_size: int = 10000) -> int:
+    """ビューの内容をCSVに逐次書き出し（全件をメモリに載せない）、書き出した行数を返す"""
+    init_tables(conn)
+    view = PATTERN_VIEWS.get(view, view)
+    if view not in _VIEW_DEFINITIONS:
+        raise ValueError(f"不明なビュー: {view}")
+    cursor = conn.execute(f"SELECT {', '.join(REPORT_COLUMNS)} FROM {view} ORDER BY File, Column")
+    count = 0
+    with open(csv_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            count += len(rows)
+    return count
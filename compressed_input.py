@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+圧縮入力（.gz / .zip）
+圧縮されたSAPの出力ファイルを一時展開せずに読むための入力層。
+展開したバイト列をそのままストリームとして文字コード判定・区切り文字検出・read_csv に渡す。
+
+- .gz: 中身1ファイル。論理ファイル名は末尾の .gz を除いた名前（zs65.txt.gz → zs65.txt）
+- .zip: メンバーごとに1論理ファイル。論理ファイル名はメンバーのファイル名（フォルダ部分は除く）
+  別フォルダに同じファイル名のメンバーがある場合は、最初のメンバーだけを読み込み残りは警告してスキップする
+- 論理ファイル名を未圧縮のファイル名と同じにするため、ルール・テーブル名はそのまま使える
+- 圧縮ファイル内のExcelは対象外（openpyxlが全体のランダムアクセスを必要とするため）
+"""
+
+import gzip
+import io
+import os
+import zipfile
+from typing import IO, List, Optional, Tuple
+
+from config import SKIP_EXTENSIONS
+from excel_reader import is_excel
+
+COMPRESSED_EXTENSIONS = ('.gz', '.zip')
+
+
+def is_compressed(file_name: str) -> bool:
+    return file_name.lower().endswith(COMPRESSED_EXTENSIONS)
+
+
+def _is_skipped(name: str) -> bool:
+    return any(name.lower().endswith(ext) for ext in SKIP_EXTENSIONS)
+
+
+def list_members(file_path: str) -> List[Tuple[str, Optional[str]]]:
+    """圧縮ファイル内の読み込み対象 → [(論理ファイル名, zipメンバー名)]（gzipのメンバー名はNone）
+
+    中身は展開せず、zipは中央ディレクトリ、gzipはファイル名だけから求める。
+    """
+    file_name = os.path.basename(file_path)
+    if file_name.lower().endswith('.gz'):
+        members = [(file_name[:-3], None)]
+    else:
+        with zipfile.ZipFile(file_path) as zf:
+            members = [(os.path.basename(info.filename), info.filename)
+                       for info in zf.infolist() if not info.is_dir()]
+
+    results = []
+    seen = {}
+    for logical_name, member in members:
+        if not logical_name or _is_skipped(logical_name):
+            continue
+        if is_excel(logical_name):
+            print(f"スキップ(圧縮ファイル内のExcel): {file_name} - {logical_name}")
+            continue
+        if logical_name in seen:
+            print(f"スキップ(論理ファイル名の重複): {file_name} - {member} ({seen[logical_name]} を読み込みます)")
+            continue
+        seen[logical_name] = member
+        results.append((logical_name, member))
+    return results
+
+
+def open_binary(file_path: str, member: Optional[str] = None) -> IO[bytes]:
+    """ファイル（.gz / zipメンバーは展開しながら）をバイナリストリームとして開く"""
+    if member is not None:
+        zf = zipfile.ZipFile(file_path)
+        try:
+            # メンバーのストリームがzipファイルの参照を持つため、閉じても読み込みは続けられる
+            return zf.open(member)
+        finally:
+            zf.close()
+    if file_path.lower().endswith('.gz'):
+        return gzip.open(file_path, 'rb')
+    return open(file_path, 'rb')
+
+
+def open_text(file_path: str, encoding: str, member: Optional[str] = None,
+              errors: str = 'strict') -> IO[str]:
+    """ファイルをテキストストリームとして開く（通常ファイル・.gz・zipメンバー共通）"""
+    if member is None and not file_path.lower().endswith('.gz'):
+        return open(file_path, 'r', encoding=encoding, errors=errors, newline='')
+    return io.TextIOWrapper(open_binary(file_path, member), encoding=encoding, errors=errors, newline='')
+
+
+def physical_names(logical_names, data_dir: str, file_names) -> set:
+    """論理ファイル名の集合を、それを含む実ファイル名の集合に読み替える（部分再ロード用）"""
+    wanted = set(logical_names)
+    selected = set()
+    for name in file_names:
+        if name in wanted:
+            selected.add(name)
+        elif name.lower().endswith('.gz'):
+            if name[:-3] in wanted:
+                selected.add(name)
+        elif name.lower().endswith('.zip'):
+            # zipは中央ディレクトリのメンバー名だけを見る（展開しない）
+            try:
+                if any(logical in wanted for logical, _ in list_members(os.path.join(data_dir, name))):
+                    selected.add(name)
+            except (OSError, zipfile.BadZipFile):
+                continue
+    return selected
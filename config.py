@@ -19,3 +19,66 @@ SKIP_EXTENSIONS = [".py", ".log", ".bak", ".db"]
 # デリミタ・エンコーディング候補
 DELIMITERS = [",", "\t", ";", "|", " "]
 ENCODINGS = ["utf-8", "cp932", "shift_jis", "utf-16"]
+
+# 起動時import時間の上限（ミリ秒）：cron実行の保守コマンド（init_dev / init_prod）用
+STARTUP_IMPORT_BUDGET_MS = 200
+
+# ステージングキャッシュ（解析済みファイルのArrow IPC保存先・上限）
+STAGING_CACHE_DIR = os.path.join(OUTPUT_DIR, "staging")
+STAGING_CACHE_MAX_BYTES = 2 * 1024 ** 3  # 2GB
+STAGING_CACHE_MAX_AGE_DAYS = 7
+# キャッシュミス時に解析する行数（analyze / load の両方を満たす行数）
+STAGING_PARSE_ROWS = 1000
+
+# 比較レポート（compare_report テーブルの内容を compare_report.csv にも書き出すか）
+COMPARE_REPORT_CSV_EXPORT = True
+COMPARE_REPORT_CSV = os.path.join(OUTPUT_DIR, "compare_report.csv")
+
+# 実データ型プロファイル（typeof集計）のサンプリング行数（Noneの場合は全件走査）
+PROFILE_SAMPLE_ROWS = 100000
+
+# Excelのストリーミング読み込みで1チャンクにまとめる行数
+EXCEL_CHUNK_ROWS = 10000
+
+# 監視デーモン（main.py watch）：ポーリング間隔・ファイル確定までの静止時間（秒）・取り込み待ちキューの上限
+WATCH_POLL_INTERVAL = 1.0
+WATCH_QUIESCENCE_SECONDS = 2.0
+WATCH_QUEUE_SIZE = 16
+
+# パイプライン（main.py pipeline）で並列に実行するステージ数の上限
+PIPELINE_WORKERS = 2
+
+# ロード：ファイル全体を読み込み・解析/型変換・書き込みの3段で並行に処理する
+LOAD_MAX_ROWS = None  # 1ファイルあたりのロード行数の上限（Noneは全行）
+LOAD_BLOCK_BYTES = 4 * 1024 ** 2  # 読み込みブロックの大きさ
+LOAD_PARSE_WORKERS = 2  # 解析・型変換ワーカー数
+LOAD_QUEUE_SIZE = 4  # 段の間のキューに置けるブロック数
+LOAD_CHECKPOINT_CHUNKS = 10  # このチャンク数ごとにコミットし、再開位置を記録する
+LOAD_MAX_CARRY_BLOCKS = 4  # 引用符内の改行を待って持ち越す上限（ブロック数）。超えたら改行だけで区切る
+
+# メモリ予算（requirements.md: 8GB以下で動作。OS・他プロセス分を残してプロセスのRSS上限とする）
+MEMORY_BUDGET_BYTES = 6 * 1024 ** 3
+
+# ロード中のDataFrameのメモリ削減（compact_frame.py）：列名にこの文字列を含む文字列列はカテゴリ型
+COMPACT_CATEGORY_COLUMNS = ["保管場所", "工場", "会社"]
+# 値の種類数が行数のこの割合以下の文字列列もカテゴリ型にする（Noneは指定列のみ）
+COMPACT_CATEGORY_MAX_RATIO = 0.5
+
+# 型変換（unique_convert.py）：ユニーク数が行数のこの割合以下の列はユニーク値だけを変換して展開する
+UNIQUE_CONVERT_MAX_RATIO = 0.5
+
+# スキーマレジストリ（schema_registry.py）：記録済みの型を再利用する列の先頭何行を型どおりか確認するか（Noneは確認しない）
+SCHEMA_DRIFT_CHECK_ROWS = 20
+
+# 型推定のメモ（inference_memo.py）：(列名, サンプル値のハッシュ) ごとの推定結果を保持する件数の上限
+INFERENCE_MEMO_MAX_ENTRIES = 100000
+
+# 分散ロード（main.py load_distributed / load_worker）：別ノードのワーカーも使う場合は、
+# キューDB・ステージングDBのディレクトリ・DATA_DIR・DB_FILE をすべてのノードから見える共有マウントに置く
+WORK_QUEUE_DB = os.path.join(OUTPUT_DIR, "work_queue.db")
+WORK_STAGING_DIR = os.path.join(OUTPUT_DIR, "worker_staging")  # ワーカーごとのステージングDB
+WORK_LEASE_SECONDS = 300  # ハートビートが途絶えてから別のワーカーが取り直すまでの秒数
+WORK_HEARTBEAT_SECONDS = 30
+WORK_MAX_ATTEMPTS = 3  # 失敗・リース切れでジョブを取り直す上限回数
+WORK_LOCAL_WORKERS = 2  # コーディネーターが同じマシンで起動するワーカープロセス数
+WORK_POLL_SECONDS = 1.0
@@ -12,5 +12,9 @@ def init_db():
             PRIMARY KEY (file_name, column_name)
         )
     """)
+    # T002ルール評価（rule_engine）の型条件での絞り込み用（初期推定型の列がある既存DBのみ）
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(column_master)")]
+    if "initial_inferred_type" in columns:
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_column_master_types ON column_master (initial_inferred_type, data_type)")
     conn.commit()
     conn.close()
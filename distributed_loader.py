@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+分散ロード（main.py load_distributed / load_worker）
+月末のようにファイル数・サイズが増えて1台では夜間の時間内に load が終わらない場合に、
+ファイルごとのジョブをキュー（work_queue.py）に入れ、複数のワーカープロセス・ノードで並行にロードする。
+
+- コーディネーター（load_distributed）: 対象ファイルを大きい順にジョブとして登録し、同じマシンで
+  WORK_LOCAL_WORKERS 個のワーカーを起動する。完了したジョブから順に、ワーカーのステージングDBを
+  master.db に ATTACH してテーブル・型プロファイルを取り込み、最後に比較レポートを保存する
+- ワーカー（load_worker）: ジョブを取り出し、読み込み・型変換・書き込みをジョブ専用のステージングDBに
+  対して行い、閉じてから完了を報告する（コーディネーターが書き込み中のDBを読むことはない）。
+  master.db に同時に書き込むのはコーディネーターだけ
+- ワーカーは処理中 WORK_HEARTBEAT_SECONDS ごとにリースを延ばす。落ちたワーカーのジョブは
+  リース切れの後に別のワーカーが取り直す
+- 取り込みに失敗したジョブ（ロック待ちのタイムアウトなど）は次の確認で取り込み直し、
+  WORK_MAX_ATTEMPTS 回失敗したら failed にする
+- 中断したコーディネーターのバッチは load_distributed --resume で続きから処理・取り込みできる。
+  再開せずに新しいバッチを始めた場合、前のバッチの残りのジョブは取り消す
+- 変換に使う column_master はジョブごとに master.db からステージングDBに写す
+  （master.db を ATTACH したまま書き込むと、修飾なしの DROP TABLE が master.db 側に効くため）
+"""
+
+import glob
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import (DATA_DIR, DB_FILE, WORK_HEARTBEAT_SECONDS, WORK_LEASE_SECONDS, WORK_LOCAL_WORKERS,
+                    WORK_MAX_ATTEMPTS, WORK_POLL_SECONDS, WORK_QUEUE_DB, WORK_STAGING_DIR)
+from work_queue import OPEN_STATUSES, Job, WorkQueue
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def staging_db_path(job: Job, worker_id: str, staging_dir: str = WORK_STAGING_DIR) -> str:
+    """ジョブ・ワーカーごとのステージングDBのパス（取り直したジョブは別のファイルに書く）"""
+    safe_id = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in worker_id)
+    return os.path.join(staging_dir, f"{job.batch_id}_{job.job_id}_{safe_id}.db")
+
+
+def remove_staging(batch_id: str, staging_dir: str = WORK_STAGING_DIR) -> None:
+    """バッチのステージングDBを削除（取り込み済み・取り消し済みのバッチ）"""
+    for path in glob.glob(os.path.join(staging_dir, f"{batch_id}_*.db")):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"警告: ステージングDBを削除できません: {path} - {e}")
+
+
+class Heartbeat:
+    """処理中のジョブのリースを定期的に延ばすスレッド（with で使う）"""
+
+    def __init__(self, queue: WorkQueue, job: Job, worker_id: str, interval: float = WORK_HEARTBEAT_SECONDS):
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'heartbeat-{job.job_id}', daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.job, self.worker_id):
+                    self.lost = True
+                    return
+            except sqlite3.Error as e:
+                print(f"ハートビート失敗: {self.job.file_name} - {e}")
+
+    def __enter__(self) -> "Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def copy_column_master(conn: sqlite3.Connection, master_db: str) -> None:
+    """推定型・日付フォーマット・SAP正規化指定（column_master）を master.db からステージングDBに写す"""
+    conn.execute("ATTACH DATABASE ? AS master", (master_db,))
+    try:
+        conn.execute("DROP TABLE IF EXISTS main.column_master")
+        if conn.execute("SELECT 1 FROM master.sqlite_master WHERE type = 'table' AND name = 'column_master'").fetchone():
+            conn.execute("CREATE TABLE main.column_master AS SELECT * FROM master.column_master")
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE master")
+
+
+def run_worker(worker_id: Optional[str] = None, queue_db: str = WORK_QUEUE_DB, data_dir: str = DATA_DIR,
+               master_db: str = DB_FILE, staging_dir: str = WORK_STAGING_DIR, exit_when_idle: bool = True,
+               poll_seconds: float = WORK_POLL_SECONDS, batch_id: Optional[str] = None) -> int:
+    """ジョブを取り出してステージングDBにロードする。完了したジョブ数を返す
+
+    exit_when_idle=True の場合は未処理・処理中のジョブがなくなったら終了し、
+    False の場合は新しいジョブを待ち続ける（Ctrl+Cで終了）。
+    batch_id を指定した場合はそのバッチのジョブだけを処理する（コーディネーターが起動するワーカー）。
+    """
+    from loader import (SimpleFileProcessor, build_override_set, load_file, load_t002_loader_updates,
+                        sanitize_table_name)
+    from memory_governor import MemoryGovernor
+    from sap_normalizer import SapNormalizer
+
+    queue = WorkQueue(queue_db)
+    worker_id = worker_id or default_worker_id()
+    os.makedirs(staging_dir, exist_ok=True)
+    processor = SimpleFileProcessor()
+    override_set = build_override_set(load_t002_loader_updates())
+    normalizer = SapNormalizer.from_rule_store(master_db)
+    governor = MemoryGovernor()
+
+    print(f"=== 分散ロード ワーカー {worker_id} ===")
+    completed = 0
+    while True:
+        job = queue.claim(worker_id, batch_id)
+        if job is None:
+            if exit_when_idle and not queue.has_open_jobs(batch_id):
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        print(f"[{worker_id}] 処理中: {job.file_name} (job {job.job_id}, {job.attempts}回目)")
+        staging_db = staging_db_path(job, worker_id, staging_dir)
+        conn = sqlite3.connect(staging_db, timeout=30)
+        try:
+            with Heartbeat(queue, job, worker_id) as heartbeat:
+                copy_column_master(conn, master_db)
+                rows, processed, errors = load_file(conn, processor, os.path.join(data_dir, job.file_name),
+                                                    override_set, normalizer, governor)
+        except Exception as e:
+            print(f"[{worker_id}] 失敗: {job.file_name} - {e}")
+            conn.close()
+            os.remove(staging_db)
+            queue.fail(job, worker_id, str(e))
+            continue
+        conn.close()
+
+        result = {"tables": sorted({sanitize_table_name(row["File"]) for row in rows}),
+                  "rows": rows, "processed": processed, "errors": errors}
+        if heartbeat.lost or not queue.complete(job, worker_id, staging_db, result):
+            print(f"[{worker_id}] リースが切れた（または取り消された）ため結果を破棄: {job.file_name}")
+            os.remove(staging_db)
+            continue
+        completed += 1
+    print(f"[{worker_id}] 終了 (完了: {completed} ジョブ)")
+    return completed
+
+
+def merge_job(conn: sqlite3.Connection, job: Dict) -> None:
+    """ジョブのテーブルと型プロファイルをステージングDBから master.db に取り込む（1トランザクション）"""
+    from type_profiler import init_tables as init_profile_tables
+
+    init_profile_tables(conn)
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS worker", (job["staging_db"],))
+    try:
+        has_profile = conn.execute(
+            "SELECT 1 FROM worker.sqlite_master WHERE type = 'table' AND name = 'column_type_profile'").fetchone()
+        conn.execute("BEGIN")
+        for table in job["result"]["tables"]:
+            row = conn.execute("SELECT sql FROM worker.sqlite_master WHERE type = 'table' AND name = ?",
+                               (table,)).fetchone()
+            if row is None:
+                continue
+            conn.execute(f'DROP TABLE IF EXISTS main."{table}"')
+            conn.execute(row[0])  # ワーカーが作ったときと同じ定義（列の型）で main に作る
+            conn.execute(f'INSERT INTO main."{table}" SELECT * FROM worker."{table}"')
+            conn.execute("DELETE FROM main.column_type_profile WHERE table_name = ?", (table,))
+            if has_profile:
+                conn.execute("INSERT INTO main.column_type_profile SELECT * FROM worker.column_type_profile "
+                             "WHERE table_name = ?", (table,))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE worker")
+
+
+def merge_batch(conn: sqlite3.Connection, queue: WorkQueue, batch_id: str,
+                merge_errors: Optional[Dict[int, int]] = None) -> int:
+    """完了したジョブを取り込み、取り込んだジョブ数を返す
+
+    取り込みに失敗したジョブは done のまま残し、次の呼び出しで取り込み直す。
+    merge_errors（job_id → 失敗回数）を渡すと、WORK_MAX_ATTEMPTS 回失敗したジョブを failed にする。
+    """
+    merged = 0
+    for job in queue.done_jobs(batch_id):
+        try:
+            merge_job(conn, job)
+        except (sqlite3.Error, OSError) as e:
+            print(f"取り込み失敗（再試行します）: {job['file_name']} - {e}")
+            if merge_errors is not None:
+                merge_errors[job["job_id"]] = merge_errors.get(job["job_id"], 0) + 1
+                if merge_errors[job["job_id"]] >= WORK_MAX_ATTEMPTS:
+                    queue.mark_failed(job["job_id"], f"取り込み失敗: {e}")
+            continue
+        queue.mark_merged(job["job_id"])
+        try:
+            os.remove(job["staging_db"])
+        except OSError:
+            pass  # 残ったファイルはバッチの終了時に削除する
+        merged += 1
+        print(f"取り込み完了: {job['file_name']} ({', '.join(job['result']['tables']) or 'テーブルなし'})")
+    return merged
+
+
+def load_distributed(workers: int = WORK_LOCAL_WORKERS, target_files: Optional[List[str]] = None,
+                     queue_db: str = WORK_QUEUE_DB, staging_dir: str = WORK_STAGING_DIR,
+                     poll_seconds: float = WORK_POLL_SECONDS, resume: bool = False) -> List[Dict]:
+    """コーディネーター: ジョブを登録し、ワーカーの完了分から master.db に取り込む
+
+    workers=0 の場合は同じマシンではワーカーを起動せず、別ノードの load_worker を待つ。
+    resume=True の場合は新しいバッチを作らず、中断された最新のバッチの続きを処理・取り込む。
+    """
+    from loader import list_target_files, save_results
+
+    print("=== 分散ロード ===")
+    queue = WorkQueue(queue_db)
+    open_batches = queue.open_batches()
+    if resume:
+        if not open_batches:
+            print("再開できるバッチがありません")
+            return []
+        batch_id = open_batches[0]
+        target_files, started_at = queue.batch_info(batch_id)
+        started_at = started_at or datetime.now().isoformat(timespec='seconds')
+        print(f"バッチ {batch_id} を再開: {queue.counts(batch_id)} (キュー: {queue_db})")
+        print(f"処理中のジョブは、前のワーカーのリースが切れた後（最長 {WORK_LEASE_SECONDS} 秒）に取り直します")
+        open_batches = open_batches[1:]
+    for abandoned in open_batches:
+        # 再開されなかった前のバッチは取り込まないため、残りのジョブを取り消してステージングDBを消す
+        print(f"中断されたバッチ {abandoned} の残り {queue.cancel_batch(abandoned)} ジョブを取り消しました")
+        remove_staging(abandoned, staging_dir)
+    if not resume:
+        if not os.path.exists(DATA_DIR):
+            print(f"エラー: データディレクトリが見つかりません: {DATA_DIR}")
+            return []
+        started_at = datetime.now().isoformat(timespec='seconds')
+        _, files = list_target_files(target_files)
+        # 大きいファイルから処理する（最後に大きなファイルが1つだけ残って全体が待つのを避ける）
+        files.sort(key=lambda name: os.path.getsize(os.path.join(DATA_DIR, name)), reverse=True)
+        batch_id = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        count = queue.start_batch(batch_id, files, target_files, started_at)
+        print(f"バッチ {batch_id}: {count} ジョブを登録 (キュー: {queue_db})")
+
+    processes = [multiprocessing.Process(
+        target=run_worker, name=f'load-worker-{i}',
+        kwargs={"worker_id": f"{default_worker_id()}-{i}", "queue_db": queue_db, "staging_dir": staging_dir,
+                "batch_id": batch_id})
+        for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    merge_errors: Dict[int, int] = {}
+    interrupted = False
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        while True:
+            merge_batch(conn, queue, batch_id, merge_errors)
+            counts = queue.counts(batch_id)
+            if not any(counts.get(status) for status in OPEN_STATUSES):
+                break
+            if processes and not any(process.is_alive() for process in processes) and queue.has_open_jobs(batch_id):
+                # ローカルのワーカーがすべて終了した（異常終了など）
+                print(f"警告: ワーカーが終了しましたが未処理のジョブがあります: {counts}")
+                interrupted = True
+                break
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print("\n処理が中断されました")
+        interrupted = True
+    finally:
+        conn.close()
+        for process in processes:
+            process.join()
+
+    counts = queue.counts(batch_id)
+    print("\n" + "=" * 50)
+    print(f"処理結果: {counts}")
+    for failure in queue.failures(batch_id):
+        print(f"失敗: {failure['file_name']} - {failure['error']}")
+    if interrupted and any(counts.get(status) for status in OPEN_STATUSES):
+        # 比較レポートはバッチ全体の取り込みが終わってから保存する
+        print("残りのジョブは python main.py load_distributed --resume で処理・取り込みできます")
+        return []
+    remove_staging(batch_id, staging_dir)
+    results = queue.merged_rows(batch_id)
+    save_results(results, target_files, started_at)
+    return results
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+重複列検出（design.md Phase 2「同一データの重複検出」）
+列ごとのMinHash署名を型推定時に記録し、LSHバンディングで候補ペアのみ比較する
+
+2,400+列の総当たり比較（O(n^2)）を避け、ほぼ線形時間で
+ファイル名・列名が異なっても中身が同一（または近似）の列を検出する。
+結果は column_duplicates テーブルに保存し、統合スキーマ生成で利用する。
+"""
+
+import sqlite3
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+NUM_PERM = 128
+LSH_BANDS = 16  # 16バンド × 8行: 類似度 約0.7 以上が候補になる
+MERSENNE_PRIME = (1 << 31) - 1
+MIN_DISTINCT = 3  # 値の種類が少ない列（フラグ・定数列）は誤検出が多いため対象外
+DEFAULT_THRESHOLD = 0.8
+
+
+class MinHasher:
+    """列の値集合からMinHash署名を計算"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 42):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+
+    def signature(self, values: Iterable) -> Tuple[np.ndarray, int]:
+        """(署名, 異なり数) を返す。値がなければ署名はNone"""
+        series = pd.Series(list(values) if not isinstance(values, pd.Series) else values, dtype=object)
+        distinct = series.dropna().astype(str).str.strip()
+        distinct = distinct[distinct != ''].unique()
+        if len(distinct) == 0:
+            return None, 0
+
+        # 64bitハッシュを32bitに落としてから (a*x + b) mod p で置換を模擬（uint64で桁あふれしない）
+        hashes = pd.util.hash_array(np.asarray(distinct, dtype=object)) & np.uint64(0xFFFFFFFF)
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % np.uint64(MERSENNE_PRIME)
+        return permuted.min(axis=1), len(distinct)
+
+
+def init_tables(conn: sqlite3.Connection) -> None:
+    """署名・重複候補テーブルを作成"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS column_signature (
+            file_name TEXT,
+            column_name TEXT,
+            num_perm INTEGER,
+            n_distinct INTEGER,
+            signature BLOB,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (file_name, column_name)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS column_duplicates (
+            file_a TEXT,
+            column_a TEXT,
+            file_b TEXT,
+            column_b TEXT,
+            jaccard REAL,
+            detected_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (file_a, column_a, file_b, column_b)
+        )
+    """)
+
+
+def signature_rows(file_name: str, df: pd.DataFrame, hasher: MinHasher = None) -> List[Tuple]:
+    """DataFrameの各列の署名を column_signature の行形式で返す（型推定ループ内で計算）"""
+    hasher = hasher or MinHasher()
+    rows = []
+    for col in df.columns:
+        signature, n_distinct = hasher.signature(df[col])
+        if signature is None:
+            continue
+        rows.append((file_name, str(col), hasher.num_perm, n_distinct, signature.astype(np.uint64).tobytes()))
+    return rows
+
+
+def save_signatures(conn: sqlite3.Connection, file_names: Iterable[str], rows: List[Tuple]) -> None:
+    """対象ファイルの署名を置き換え保存"""
+    init_tables(conn)
+    conn.executemany("DELETE FROM column_signature WHERE file_name = ?", [(f,) for f in set(file_names)])
+    conn.executemany("""
+        INSERT INTO column_signature (file_name, column_name, num_perm, n_distinct, signature)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+
+
+def _load_signatures(conn: sqlite3.Connection, num_perm: int) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+    cursor = conn.execute("""
+        SELECT file_name, column_name, signature FROM column_signature
+        WHERE num_perm = ? AND n_distinct >= ?
+        ORDER BY file_name, column_name
+    """, (num_perm, MIN_DISTINCT))
+    keys, signatures = [], []
+    for file_name, column_name, blob in cursor:
+        keys.append((file_name, column_name))
+        signatures.append(np.frombuffer(blob, dtype=np.uint64))
+    matrix = np.vstack(signatures) if signatures else np.empty((0, num_perm), dtype=np.uint64)
+    return keys, matrix
+
+
+def find_duplicate_columns(conn: sqlite3.Connection, threshold: float = DEFAULT_THRESHOLD,
+                           bands: int = LSH_BANDS, num_perm: int = NUM_PERM) -> pd.DataFrame:
+    """LSHバンディングで重複候補列を検出し、column_duplicates を更新して返す"""
+    init_tables(conn)
+    keys, matrix = _load_signatures(conn, num_perm)
+    rows_per_band = num_perm // bands
+
+    # 同じバンドのハッシュ値が一致した列同士だけを候補にする
+    candidates = set()
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        band_slice = matrix[:, band * rows_per_band:(band + 1) * rows_per_band]
+        for idx in range(len(keys)):
+            buckets[band_slice[idx].tobytes()].append(idx)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            for i, left in enumerate(members):
+                for right in members[i + 1:]:
+                    # 同一ファイル内の列は対象外（ファイル間の重複のみ）
+                    if keys[left][0] != keys[right][0]:
+                        candidates.add((left, right))
+
+    results = []
+    for left, right in candidates:
+        jaccard = float(np.mean(matrix[left] == matrix[right]))
+        if jaccard >= threshold:
+            results.append((*keys[left], *keys[right], round(jaccard, 4)))
+    results.sort(key=lambda r: (-r[4], r[0], r[1], r[2], r[3]))
+
+    conn.execute("DELETE FROM column_duplicates")
+    conn.executemany("""
+        INSERT INTO column_duplicates (file_a, column_a, file_b, column_b, jaccard)
+        VALUES (?, ?, ?, ?, ?)
+    """, results)
+    conn.commit()
+
+    print(f"重複列検出: {len(keys)}列 / 候補{len(candidates)}ペア / 重複{len(results)}ペア (閾値: {threshold})")
+    return pd.DataFrame(results, columns=["file_a", "column_a", "file_b", "column_b", "jaccard"])
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Excel読み込み（ストリーミング）
+openpyxl の read_only モードでシートを行単位に読み、一定行数ごとのDataFrame（値は文字列）を返す。
+pd.read_excel のようにブック全体のXMLをメモリに展開しないため、大きなSAPのExcel出力でも
+先頭行までの時間が短く、メモリ使用量はチャンクの行数で頭打ちになる。
+
+- 全シートを対象とし、1シート = 1テーブル（論理ファイル名 "ブック名#シート名"）
+- シートが1つだけのブックは従来どおりファイル名をそのまま論理ファイル名とする
+- .xls（openpyxl非対応）は pd.read_excel（xlrd）にフォールバック
+"""
+
+import os
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from config import EXCEL_CHUNK_ROWS
+
+EXCEL_EXTENSIONS = ('.xls', '.xlsx', '.xlsm')
+SHEET_SEPARATOR = '#'
+
+
+def is_excel(file_name: str) -> bool:
+    return file_name.lower().endswith(EXCEL_EXTENSIONS)
+
+
+def _is_streamable(file_path: str) -> bool:
+    """openpyxlで読めるか（.xls は不可）"""
+    return not file_path.lower().endswith('.xls')
+
+
+def sheet_logical_name(file_name: str, sheet_name: str, sheet_count: int) -> str:
+    """シートの論理ファイル名（column_master / テーブル名の元になる名前）"""
+    if sheet_count <= 1:
+        return file_name
+    return f"{file_name}{SHEET_SEPARATOR}{sheet_name}"
+
+
+def split_logical_name(logical_name: str) -> Tuple[str, Optional[str]]:
+    """論理ファイル名を (ファイル名, シート名) に分割（シート指定がなければNone）"""
+    file_name, sep, sheet_name = logical_name.partition(SHEET_SEPARATOR)
+    if sep and is_excel(file_name):
+        return file_name, sheet_name
+    return logical_name, None
+
+
+def _cell_to_str(value) -> str:
+    """セル値を pd.read_excel(dtype=str, na_filter=False) と同じ文字列表現に変換"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime, date)):
+        return str(pd.Timestamp(value))
+    return str(value)
+
+
+def _make_header(row: Tuple) -> List[str]:
+    """ヘッダー行から列名を作成（空欄は Unnamed: n、重複は .1, .2 … を付与）"""
+    header = []
+    seen = {}
+    for i, value in enumerate(row):
+        name = _cell_to_str(value) or f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+
+def sheet_names(file_path: str) -> List[str]:
+    """ブック内のシート名一覧"""
+    if not _is_streamable(file_path):
+        return list(pd.ExcelFile(file_path).sheet_names)
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def iter_sheet_chunks(file_path: str, sheet_name: Optional[str] = None,
+                      chunksize: int = EXCEL_CHUNK_ROWS, nrows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """シートを chunksize 行ごとのDataFrame（値は文字列、空セルは空文字）で順に返す"""
+    if not _is_streamable(file_path):
+        # .xls はストリーミングできないため一括読み込みを分割して返す
+        df = pd.read_excel(file_path, sheet_name=sheet_name or 0, dtype=str, na_filter=False, nrows=nrows)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize].reset_index(drop=True)
+        return
+
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name is not None else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = None
+        for row in rows:
+            if any(v is not None for v in row):
+                header = _make_header(row)
+                break
+        if header is None:
+            return
+
+        width = len(header)
+        buffer = []
+        emitted = 0
+        for row in rows:
+            if not any(v is not None for v in row):
+                continue  # 空行は読み飛ばす（read_excel と同じ）
+            values = [_cell_to_str(v) for v in row[:width]]
+            values.extend([''] * (width - len(values)))
+            buffer.append(values)
+            emitted += 1
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=header, dtype=object)
+                buffer = []
+            if nrows is not None and emitted >= nrows:
+                break
+        if buffer or emitted == 0:
+            yield pd.DataFrame(buffer, columns=header, dtype=object)
+    finally:
+        wb.close()
+
+
+def read_sheet(file_path: str, sheet_name: Optional[str] = None, nrows: Optional[int] = None) -> pd.DataFrame:
+    """シートの先頭 nrows 行を読み込む（必要な行を読んだ時点で打ち切る）"""
+    chunks = list(iter_sheet_chunks(file_path, sheet_name, nrows=nrows))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def read_workbook(file_path: str, nrows: Optional[int] = None) -> List[Tuple[str, str, pd.DataFrame]]:
+    """全シートを読み込み [(論理ファイル名, シート名, df)] を返す（空のシートは除く）"""
+    file_name = os.path.basename(file_path)
+    names = sheet_names(file_path)
+    results = []
+    for sheet in names:
+        df = read_sheet(file_path, sheet, nrows)
+        if len(df.columns) == 0:
+            continue
+        results.append((sheet_logical_name(file_name, sheet, len(names)), sheet, df))
+    return results
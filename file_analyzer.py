@@ -5,6 +5,11 @@ import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 import re
+from staging_cache import StagingCache
+from fixed_width import FIXED_WIDTH_SAMPLE_LINES, read_fixed_width
+
+# analyze / load で解析済みのファイルはキャッシュから区切り文字・型を取得する
+staging_cache = StagingCache()
 
 def detect_encoding(file_path):
     for enc in ['cp932', 'shift_jis']:
@@ -54,6 +59,18 @@ def detect_delimiter_and_types_revised(file_path, encoding):
     except Exception:
         return 'N/A', ['N/A']
 
+def infer_types_from_cached(df):
+    """キャッシュ済み（文字列のまま）のDataFrameから列ごとの型を推定"""
+    data_types = []
+    for col in df.columns:
+        values = df[col].mask(df[col].str.strip() == '')
+        numeric = pd.to_numeric(values, errors='coerce')
+        if values.notna().any() and numeric.notna().sum() == values.notna().sum():
+            data_types.append(pd.api.types.infer_dtype(numeric, skipna=True))
+        else:
+            data_types.append(pd.api.types.infer_dtype(values, skipna=True))
+    return data_types
+
 def analyze_irregular_file_robust(file_path, encoding, expected_columns, file_name):
     """不規則なファイルを頑健に解析する関数"""
     try:
@@ -125,6 +142,8 @@ def analyze_irregular_file_robust(file_path, encoding, expected_columns, file_na
         
         # 複数の方法でデータ行を読み込む
         methods = [
+            # 方法0: 固定長（SAPリスト出力。桁位置で列を切り出すため値の中の空白で列がずれない）
+            ('固定長', lambda: read_fixed_width(file_path, encoding, nrows=FIXED_WIDTH_SAMPLE_LINES)),
             # 方法1: pandas with quoting=csv.QUOTE_NONE (正規表現区切り)
             ('正規表現区切り', lambda: pd.read_csv(file_path, sep=r'\s+', encoding=encoding, 
                                engine='python', skiprows=1, nrows=5, header=None,
@@ -147,7 +166,9 @@ def analyze_irregular_file_robust(file_path, encoding, expected_columns, file_na
         for method_name, method_func in methods:
             try:
                 test_df = method_func()
-                if test_df is not None and len(test_df.columns) > 5:
+                # 固定長は列の境界を推定できた場合だけ結果を返すため、列数の少ないリストも採用する
+                min_columns = 2 if method_name == '固定長' else 6
+                if test_df is not None and len(test_df.columns) >= min_columns:
                     test_columns = len(test_df.columns)
                     
                     # 期待列数に最も近い結果を選ぶ
@@ -269,7 +290,12 @@ def analyze_files(file_paths):
             )
                         
         else:
-            delimiter_final, data_types = detect_delimiter_and_types_revised(file_path, encoding)
+            cached = staging_cache.get(file_path, nrows=10)
+            if cached is not None and cached[2] is not None:
+                cached_df, encoding, delimiter_final = cached
+                data_types = infer_types_from_cached(cached_df)
+            else:
+                delimiter_final, data_types = detect_delimiter_and_types_revised(file_path, encoding)
             actual_columns = len(data_types)
             if delimiter_final not in [',', '\t', 'N/A']:
                 is_irregular = 'Yes (Unusual Delimiter)'
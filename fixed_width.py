@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+固定長（SAPリスト出力）の解析
+SAPのリスト出力は区切り文字ではなく桁位置で列がそろっているため、空白の正規表現で分割すると
+値の中の空白（品目テキストなど）で列がずれる。ファイル全体をバイト配列（行 × 桁）にし、
+サンプルのデータ行のどの行でも空白（または縦罫線 |）の桁を列の境界として、列ごとにまとめて切り出す。
+
+- 桁位置はバイト単位。cp932 / shift_jis は全角1文字が2バイト＝表示幅2桁のため、そのまま桁がそろう
+  UTF-8 は全角が3バイトになるため、cp932 に変換してから切り出す
+- cp932 の2バイト文字は2バイト目が | (0x7C) になることがある（ポ・掛・竹など）ため、
+  2バイト目の 0x7C は縦罫線とみなさない
+- 罫線だけの行（----- や =====）と空行は読み飛ばす
+- 見出しの文字が続いている桁は境界にしない。見出しは左寄せ・数値は右寄せのように桁がずれるため、
+  見出しの語は最も近い列の名前にする。見出しの語がない列は左の列の続きとしてつなげる
+- 最後の列は行末まで切り出す。ASCIIだけの列は numpy でまとめて、それ以外はユニーク値ごとにデコードする
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from unique_convert import convert_unique
+
+# 境界とみなす文字（空白・縦罫線）と罫線行に使われる文字
+_BLANK_BYTES = np.frombuffer(b' |', dtype=np.uint8)
+_RULE_BYTES = np.frombuffer(b' -=|+', dtype=np.uint8)
+# 境界の推定に使うデータ行数
+FIXED_WIDTH_SAMPLE_LINES = 200
+# 2バイト目に 0x7C が現れる文字コード
+_SJIS_ENCODINGS = ('cp932', 'ms932', 'windows-31j', 'shift-jis', 'shift-jisx0213', 'sjis')
+
+Boundary = Tuple[int, int]  # (開始桁, 終了桁)
+
+
+def _byte_encoding(encoding: str) -> str:
+    """桁位置がバイト位置と一致する文字コード（UTF系はcp932に変換して扱う）"""
+    return 'cp932' if encoding.lower().replace('_', '-').startswith(('utf', 'u8')) else encoding
+
+
+def separator_mask(matrix: np.ndarray, encoding: str = 'cp932') -> np.ndarray:
+    """空白・縦罫線の桁を True にした配列（cp932の2バイト文字の2バイト目の 0x7C は除く）"""
+    blank = np.isin(matrix, _BLANK_BYTES)
+    if _byte_encoding(encoding).lower().replace('_', '-') not in _SJIS_ENCODINGS or matrix.size == 0:
+        return blank
+    lead = ((matrix >= 0x81) & (matrix <= 0x9F)) | ((matrix >= 0xE0) & (matrix <= 0xFC))
+    # 1バイト目になりうるバイトの連続区間では、区間の先頭から偶数番目が1バイト目（その次が2バイト目）
+    cols = np.arange(matrix.shape[-1])
+    run_start = np.maximum.accumulate(np.where(lead, 0, cols + 1), axis=-1)
+    is_lead = lead & ((cols - run_start) % 2 == 0)
+    trail = np.zeros_like(blank)
+    trail[..., 1:] = is_lead[..., :-1]
+    return blank & ~trail
+
+
+def line_matrix(data: bytes, encoding: str) -> np.ndarray:
+    """ファイル内容を (行数, 最大桁数) の uint8 配列にする（短い行は空白で埋め、罫線・空行は除く）"""
+    byte_encoding = _byte_encoding(encoding)
+    if byte_encoding != encoding:
+        data = data.decode(encoding, errors='replace').encode(byte_encoding, errors='replace')
+    lines = data.replace(b'\r\n', b'\n').split(b'\n')
+    width = max((len(line) for line in lines), default=0)
+    if width == 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+    matrix = np.frombuffer(b''.join(line.ljust(width) for line in lines), dtype=np.uint8).reshape(len(lines), width)
+    return matrix[~np.isin(matrix, _RULE_BYTES).all(axis=1)]
+
+
+def infer_boundaries(rows: np.ndarray, header: Optional[np.ndarray] = None,
+                     min_columns: int = 2, encoding: str = 'cp932') -> Optional[List[Boundary]]:
+    """サンプル行のすべてで空白（または |）の桁を境界として列の桁範囲を推定（固定長でなければNone）
+
+    header を指定した場合、見出しの文字が続いている桁は境界にしない（値の中の空白で列を分けない）。
+    見出しだけにあってデータ行が空の桁範囲は列にしない。
+    """
+    sample = rows[:FIXED_WIDTH_SAMPLE_LINES]
+    if len(sample) == 0 or (sample == ord('\t')).any():
+        return None
+    data_blank = separator_mask(sample, encoding).all(axis=0)
+    blank = data_blank if header is None else data_blank & separator_mask(header, encoding)
+
+    # 空白でない桁の連続区間が1列
+    edges = np.diff(np.concatenate(([1], blank.astype(np.int8), [1])))
+    boundaries = [(int(s), int(e)) for s, e in zip(np.flatnonzero(edges == -1), np.flatnonzero(edges == 1))
+                  if not data_blank[s:e].all()]
+    if len(boundaries) < min_columns:
+        return None
+    boundaries[-1] = (boundaries[-1][0], rows.shape[1])  # 最後の列は行末まで
+    return boundaries
+
+
+def header_names(header: np.ndarray, boundaries: Sequence[Boundary],
+                 encoding: str) -> Tuple[List[Boundary], List[str]]:
+    """見出し行の語を桁範囲が最も近い列の名前にする → (列の桁範囲, 列名)
+
+    見出しの語がない列は、値の中の空白（まれに付く時刻など）で分かれた左の列の続きとしてつなげる。
+    """
+    def distance(i: int, center: float) -> Tuple[float, float]:
+        start, end = boundaries[i]
+        # 桁範囲に重なる列を優先し、同じなら列の中央に近い列
+        return max(start - center, center - end, 0), abs((start + end) / 2 - center)
+
+    words: List[List[str]] = [[] for _ in boundaries]
+    # 空白・縦罫線以外の桁の連続区間が見出しの語
+    edges = np.diff(np.concatenate(([1], separator_mask(header, encoding).astype(np.int8), [1])))
+    for start, end in zip(np.flatnonzero(edges == -1), np.flatnonzero(edges == 1)):
+        center = (start + end) / 2
+        nearest = min(range(len(boundaries)), key=lambda i: distance(i, center))
+        words[nearest].append(header[start:end].tobytes().decode(_byte_encoding(encoding), errors='replace'))
+
+    merged: List[Boundary] = []
+    names: List[str] = []
+    for (start, end), column_words in zip(boundaries, words):
+        if not column_words and merged:
+            merged[-1] = (merged[-1][0], end)
+            continue
+        merged.append((start, end))
+        names.append(' '.join(column_words) or f"col{len(names)}")
+    return merged, names
+
+
+def _decode_cells(block: np.ndarray, encoding: str) -> pd.Series:
+    cells = np.ascontiguousarray(block).view(f'S{block.shape[1]}').ravel()  # 1セル1つの固定長バイト列
+    if block.size == 0 or block.max() < 0x80:
+        return pd.Series(np.char.strip(cells.astype('U')), dtype=object)
+    # 全角を含む列は同じ値（品目テキスト・保管場所名など）をまとめて1回だけデコード
+    return convert_unique(pd.Series(cells, dtype=object),
+                          lambda s: s.str.decode(encoding, errors='replace').str.strip())
+
+
+def slice_columns(rows: np.ndarray, boundaries: Sequence[Boundary], encoding: str) -> List[pd.Series]:
+    """各行から列の桁範囲を切り出して、前後の空白を除いた文字列のSeriesにする"""
+    byte_encoding = _byte_encoding(encoding)
+    return [_decode_cells(rows[:, start:end], byte_encoding) for start, end in boundaries]
+
+
+def _read_head(f, count: int) -> bytes:
+    """罫線・空行・繰り返しの見出し行を除いて count 行になるまで先頭から読む"""
+    lines = []
+    kept = []
+    for line in f:
+        lines.append(line)
+        content = line.rstrip(b'\r\n')
+        if set(content) - set(b' -=|+') and (not kept or content != kept[0]):
+            kept.append(content)
+            if len(kept) >= count:
+                break
+    return b''.join(lines)
+
+
+def read_fixed_width(file_path: str, encoding: str, nrows: Optional[int] = None,
+                     header: bool = True) -> Optional[pd.DataFrame]:
+    """固定長ファイルを文字列のDataFrameとして読む（固定長と判定できない場合はNone）
+
+    header=True の場合は先頭行（罫線を除く）を列名にする。
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read() if nrows is None else _read_head(f, nrows + int(header))
+    matrix = line_matrix(data, encoding)
+    if len(matrix) == 0:
+        return None
+    rows = matrix[int(header):]
+    if header:
+        # ページごとに繰り返される見出し行はデータから除く
+        rows = rows[~(rows == matrix[0]).all(axis=1)]
+    if nrows is not None:
+        rows = rows[:nrows]
+    boundaries = infer_boundaries(rows, matrix[0] if header else None, encoding=encoding)
+    if boundaries is None:
+        return None
+    if header:
+        boundaries, names = header_names(matrix[0], boundaries, encoding)
+    else:
+        names = [f"col{i}" for i in range(len(boundaries))]
+    columns = slice_columns(rows, boundaries, encoding)
+    return pd.DataFrame(dict(enumerate(columns))).set_axis(names, axis=1)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+型推定のメモ
+ヘッダーが変わっても大半の列は前回と同じ中身のため、(列名, サンプル値のハッシュ, ルールのキー) ごとに
+推定結果（初期推定型・修正後の型・日付フォーマット）を master.db に記録し、同じ列は推定を省略する。
+
+- ルールのキー: ルールストアのバージョン + pattern_rules_data.json の内容のハッシュ。
+  どちらかが変わると古い記録はすべて削除される
+- 件数の上限（INFERENCE_MEMO_MAX_ENTRIES）を超えた分は最後に使われたのが古いものから削除（LRU）
+- 記録・利用日時の更新は flush() でまとめて書く（解析中に書き込みロックを持たない）
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from config import INFERENCE_MEMO_MAX_ENTRIES
+from rule_store import DEFAULT_RULES_FILE
+
+MemoKey = Tuple[str, str]  # (列名, サンプル値のハッシュ)
+
+
+def init_tables(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS inference_memo (
+            column_name TEXT,
+            sample_hash TEXT,
+            rules_key TEXT,
+            initial_inferred_type TEXT,
+            data_type TEXT,
+            date_format TEXT,
+            last_used INTEGER,
+            PRIMARY KEY (column_name, sample_hash)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_inference_memo_last_used ON inference_memo (last_used)")
+
+
+def rules_key(rules_version: int, rules_file: str = DEFAULT_RULES_FILE) -> str:
+    """ルールストアのバージョンと pattern_rules_data.json の内容から作るキー"""
+    digest = hashlib.sha1(str(rules_version).encode('utf-8'))
+    if os.path.exists(rules_file):
+        with open(rules_file, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def sample_hash(series: pd.Series) -> str:
+    """サンプル値（順序・欠損を含む）のハッシュ"""
+    digest = hashlib.sha1()
+    for value in series:
+        digest.update(b'\x00' if pd.isna(value) else str(value).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class InferenceMemo:
+    """列ごとの型推定結果の永続メモ"""
+
+    def __init__(self, conn: sqlite3.Connection, rules_key: str, max_entries: int = INFERENCE_MEMO_MAX_ENTRIES):
+        self.conn = conn
+        self.rules_key = rules_key
+        self.max_entries = max_entries
+        self._pending: Dict[MemoKey, Dict] = {}
+        self._used: Dict[MemoKey, int] = {}
+        init_tables(conn)
+        # ルール（ストア・JSON）が変わった後の記録は使えないため削除する
+        if conn.execute("SELECT 1 FROM inference_memo WHERE rules_key != ? LIMIT 1", (rules_key,)).fetchone():
+            conn.execute("DELETE FROM inference_memo WHERE rules_key != ?", (rules_key,))
+            conn.commit()
+
+    @staticmethod
+    def key(column_name: str, series: pd.Series) -> MemoKey:
+        return str(column_name), sample_hash(series)
+
+    def get(self, key: MemoKey) -> Optional[Dict]:
+        """記録済みの推定結果 {Inferred_Type, Initial_Inferred_Type, Date_Format}（なければNone）"""
+        if key in self._pending:
+            return self._pending[key]
+        row = self.conn.execute(
+            "SELECT initial_inferred_type, data_type, date_format FROM inference_memo "
+            "WHERE column_name = ? AND sample_hash = ? AND rules_key = ?", (*key, self.rules_key)).fetchone()
+        if row is None:
+            return None
+        self._used[key] = time.time_ns()
+        return {"Inferred_Type": row[1], "Initial_Inferred_Type": row[0], "Date_Format": row[2]}
+
+    def put(self, key: MemoKey, info: Dict) -> None:
+        self._pending[key] = info
+        self._used[key] = time.time_ns()
+
+    def flush(self) -> None:
+        """記録・利用日時を書き込み、上限を超えた古い記録を削除（コミットは呼び出し側）"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO inference_memo VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(*key, self.rules_key, info["Initial_Inferred_Type"], info["Inferred_Type"], info["Date_Format"],
+              self._used[key]) for key, info in self._pending.items()])
+        self.conn.executemany(
+            "UPDATE inference_memo SET last_used = ? WHERE column_name = ? AND sample_hash = ?",
+            [(used, *key) for key, used in self._used.items() if key not in self._pending])
+        self.conn.execute("""
+            DELETE FROM inference_memo WHERE rowid IN (
+                SELECT rowid FROM inference_memo ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+        self._pending.clear()
+        self._used.clear()
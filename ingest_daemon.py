@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+監視フォルダ取り込みデーモン（main.py watch）
+DATA_DIR を監視し、置かれたファイルの書き込みが終わったら（サイズ・更新時刻が一定時間変わらなければ）
+そのファイルだけを analyze + load する。夜間バッチを待たずに数秒でクエリできるようにする。
+
+- inotify（inotify_simple がある場合）でファイルイベントを待ち、なければポーリングのみ
+- 変化の検出は常にディレクトリの走査で行う（inotifyは待ち時間を短くするためだけに使う）
+- 取り込みは上限付きのキューを1つのワーカーが順に処理する（SQLiteへの書き込みは1本）
+  キューが満杯の間は新しいファイルをキューに入れず、次の走査で改めて確認する
+- 取り込み済みのファイルは ingest_log テーブルに (サイズ, 更新時刻) を記録し、再起動しても再ロードしない
+  取り込みに失敗したファイルは記録せず、ファイルが更新されたときか再起動後に再試行する
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import (CANDIDATE_CSV, DATA_DIR, DB_FILE, SKIP_EXTENSIONS, WATCH_POLL_INTERVAL,
+                    WATCH_QUEUE_SIZE, WATCH_QUIESCENCE_SECONDS)
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # inotify_simpleは任意依存（Linux以外・未インストール時はポーリング）
+    INotify = None
+
+Signature = Tuple[int, int]  # (サイズ, 更新時刻ns)
+
+
+def init_tables(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_log (
+            file_name TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            ingested_at DATETIME
+        )
+    """)
+
+
+def load_ingest_log(db_file: str) -> Dict[str, Signature]:
+    """取り込み済みファイル → (サイズ, 更新時刻ns)"""
+    conn = sqlite3.connect(db_file)
+    try:
+        init_tables(conn)
+        return {name: (size, mtime_ns) for name, size, mtime_ns
+                in conn.execute("SELECT file_name, size, mtime_ns FROM ingest_log")}
+    finally:
+        conn.close()
+
+
+def record_ingest(db_file: str, file_name: str, signature: Signature) -> None:
+    conn = sqlite3.connect(db_file)
+    try:
+        init_tables(conn)
+        conn.execute("INSERT OR REPLACE INTO ingest_log VALUES (?, ?, ?, ?)",
+                     (file_name, *signature, datetime.now().isoformat(timespec='seconds')))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def scan_directory(data_dir: str) -> Dict[str, Signature]:
+    """取り込み対象ファイル → (サイズ, 更新時刻ns)。隠しファイル・除外拡張子は対象外"""
+    snapshot = {}
+    try:
+        entries = list(os.scandir(data_dir))
+    except FileNotFoundError:
+        return snapshot
+    for entry in entries:
+        name = entry.name
+        if name.startswith(('.', '~$')) or any(name.lower().endswith(ext) for ext in SKIP_EXTENSIONS):
+            continue
+        try:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue  # 走査中に移動・削除された
+        snapshot[name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class StabilityTracker:
+    """サイズ・更新時刻が quiescence 秒変わらなかったファイルを「書き込み完了」とみなす"""
+
+    def __init__(self, quiescence: float = WATCH_QUIESCENCE_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.quiescence = quiescence
+        self.clock = clock
+        self._seen: Dict[str, Tuple[Signature, float]] = {}
+
+    def observe(self, snapshot: Dict[str, Signature]) -> List[str]:
+        """走査結果を記録し、静止しているファイル名の一覧を返す"""
+        now = self.clock()
+        stable = []
+        for name, signature in snapshot.items():
+            previous = self._seen.get(name)
+            if previous is None or previous[0] != signature:
+                self._seen[name] = (signature, now)
+            elif now - previous[1] >= self.quiescence:
+                stable.append(name)
+        for name in set(self._seen) - set(snapshot):
+            del self._seen[name]
+        return sorted(stable)
+
+
+def ingest_file(file_name: str) -> None:
+    """1ファイルだけを analyze + load する（読み込み・ロードに失敗したら RuntimeError）"""
+    from analyzer import analyze_files
+    from loader import load_and_compare
+    failed = []
+    analyze_files(DATA_DIR, CANDIDATE_CSV, DB_FILE, file_names=[file_name], failed_files=failed)
+    if failed:
+        raise RuntimeError("ファイルを読み込めませんでした")
+    if load_and_compare(target_files=[file_name]):
+        raise RuntimeError("ロードに失敗しました")
+
+
+class IngestDaemon:
+    """監視フォルダの取り込みデーモン"""
+
+    def __init__(self, data_dir: str = DATA_DIR, db_file: str = DB_FILE,
+                 process: Callable[[str], None] = ingest_file,
+                 poll_interval: float = WATCH_POLL_INTERVAL,
+                 quiescence: float = WATCH_QUIESCENCE_SECONDS,
+                 queue_size: int = WATCH_QUEUE_SIZE,
+                 use_inotify: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        self.data_dir = data_dir
+        self.db_file = db_file
+        self.process = process
+        self.poll_interval = poll_interval
+        self.tracker = StabilityTracker(quiescence, clock)
+        self.queue: "queue.Queue[Tuple[str, Signature]]" = queue.Queue(maxsize=queue_size)
+        self.ingested = load_ingest_log(db_file)
+        self.pending = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._inotify = None
+        if use_inotify and INotify is not None and os.path.isdir(data_dir):
+            self._inotify = INotify()
+            self._inotify.add_watch(data_dir, flags.CREATE | flags.MODIFY | flags.CLOSE_WRITE | flags.MOVED_TO)
+
+    def poll_once(self) -> List[str]:
+        """ディレクトリを走査し、書き込みが終わった未取り込みのファイルをキューに入れる"""
+        snapshot = scan_directory(self.data_dir)
+        queued = []
+        for name in self.tracker.observe(snapshot):
+            signature = snapshot[name]
+            with self._lock:
+                if self.ingested.get(name) == signature or name in self.pending:
+                    continue
+                try:
+                    self.queue.put_nowait((name, signature))
+                except queue.Full:
+                    print(f"取り込み待ちが上限({self.queue.maxsize}件)に達しました。次の走査で再確認します")
+                    break
+                self.pending.add(name)
+            queued.append(name)
+            print(f"取り込み待ちに追加: {name}")
+        return queued
+
+    def process_next(self, timeout: Optional[float] = None) -> Optional[str]:
+        """キューから1件取り出して取り込む（取り込んだファイル名、キューが空ならNone）"""
+        try:
+            name, signature = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        started = time.monotonic()
+        try:
+            self.process(name)
+            record_ingest(self.db_file, name, signature)
+            with self._lock:
+                self.ingested[name] = signature
+            print(f"取り込み完了: {name} ({time.monotonic() - started:.1f}秒)")
+        except Exception as e:
+            # ingest_log には記録しないので、ファイルが更新されたとき（署名が変わったとき）か再起動後に再試行される
+            print(f"取り込み失敗: {name} - {e}")
+            with self._lock:
+                self.ingested[name] = signature
+        finally:
+            with self._lock:
+                self.pending.discard(name)
+            self.queue.task_done()
+        return name
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            self.process_next(timeout=self.poll_interval)
+
+    def _wait(self) -> None:
+        """次の走査まで待つ（inotifyがあればイベント到着で早めに起きる）"""
+        if self._inotify is not None:
+            self._inotify.read(timeout=int(self.poll_interval * 1000))
+        else:
+            self._stop.wait(self.poll_interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        mode = "inotify" if self._inotify is not None else "ポーリング"
+        print(f"監視開始: {self.data_dir} ({mode}, 静止時間 {self.tracker.quiescence}秒)")
+        worker = threading.Thread(target=self._worker, name="ingest-worker", daemon=True)
+        worker.start()
+        try:
+            while not self._stop.is_set():
+                self.poll_once()
+                self._wait()
+        except KeyboardInterrupt:
+            print("\n監視を終了します")
+        finally:
+            self.stop()
+            worker.join()
+            if self._inotify is not None:
+                self._inotify.close()
+
+
+def main() -> None:
+    os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+    IngestDaemon().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -23,9 +23,13 @@ def init_db_dev() -> bool:
                 initial_inferred_type TEXT,
                 encoding TEXT,
                 delimiter TEXT,
+                date_format TEXT,
+                sap_rules TEXT,
                 PRIMARY KEY (file_name, column_name)
             )
         """)
+        # T002ルール評価（rule_engine）の型条件での絞り込み用
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_column_master_types ON column_master (initial_inferred_type, data_type)")
         conn.commit()
         conn.close()
         return True
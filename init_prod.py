@@ -1,6 +1,7 @@
 import sqlite3
 import logging # 追加
 from config import DB_FILE
+from schema_catalog import get_catalog
 
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s') # 追加
 
@@ -18,13 +19,14 @@ def init_db_prod() -> bool:
                 initial_inferred_type TEXT,
                 encoding TEXT,
                 delimiter TEXT,
+                date_format TEXT,
+                sap_rules TEXT,
                 PRIMARY KEY (file_name, column_name)
             )
         """)
 
         # initial_inferred_type列がなければ追加
-        cur.execute("PRAGMA table_info(column_master)")
-        columns = [row[1] for row in cur.fetchall()]
+        columns = get_catalog(conn).columns("column_master")
         if "initial_inferred_type" not in columns:
             cur.execute("ALTER TABLE column_master ADD COLUMN initial_inferred_type TEXT")
 
@@ -35,6 +37,14 @@ def init_db_prod() -> bool:
         if "delimiter" not in columns:
             cur.execute("ALTER TABLE column_master ADD COLUMN delimiter TEXT")
             
+        if "date_format" not in columns:
+            cur.execute("ALTER TABLE column_master ADD COLUMN date_format TEXT")
+
+        if "sap_rules" not in columns:
+            cur.execute("ALTER TABLE column_master ADD COLUMN sap_rules TEXT")
+
+        # T002ルール評価（rule_engine）の型条件での絞り込み用
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_column_master_types ON column_master (initial_inferred_type, data_type)")
 
         conn.commit()
         conn.close()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+ロードのチェックポイント
+パイプライン型ロードは LOAD_CHECKPOINT_CHUNKS チャンクごとにコミットし、同じトランザクションで
+読み込み位置と書き込み済み行数を load_checkpoint テーブルに記録する。
+中断された（KeyboardInterrupt・異常終了）ロードは、次回ファイルとロード条件が同じであれば
+最後にコミットした位置から再開する。ロードが完了したら記録を削除する。
+変換・書き込みのエラーで失敗したロードは未コミット分を捨てて記録を削除し、次回は最初からロードする。
+
+読み込み位置の単位: テキストはヘッダーを含む（展開後の）バイト数、UTF-16/32 は文字数、Excelはデータ行数
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from schema_catalog import get_catalog
+
+
+def init_tables(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS load_checkpoint (
+            table_name TEXT PRIMARY KEY,
+            file_name TEXT,
+            fingerprint TEXT,
+            position INTEGER,
+            row_count INTEGER,
+            updated_at DATETIME
+        )
+    """)
+
+
+def source_fingerprint(path: str, *parts: Any) -> str:
+    """ファイル（サイズ・更新時刻）とロード条件（メンバー名・列・変換計画など）のフィンガープリント"""
+    stat = os.stat(path)
+    payload = json.dumps([stat.st_size, stat.st_mtime_ns, *parts], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class CheckpointStore:
+    """load_checkpoint テーブルの読み書き（ロードと同じ接続を使い、チャンクと同時にコミットする）"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        init_tables(conn)
+        conn.commit()
+
+    def resume_point(self, table_name: str, fingerprint: str) -> Optional[Tuple[int, int]]:
+        """再開できる場合は (読み込み位置, 書き込み済み行数)、できなければNone"""
+        row = self.conn.execute(
+            "SELECT fingerprint, position, row_count FROM load_checkpoint WHERE table_name = ?", (table_name,)
+        ).fetchone()
+        if row is None or row[0] != fingerprint or not get_catalog(self.conn).has_table(table_name):
+            return None
+        return row[1], row[2]
+
+    def save(self, table_name: str, file_name: str, fingerprint: str, position: int, row_count: int) -> None:
+        """位置を記録してコミット（それまでに書き込んだチャンクも同時に確定する）"""
+        self.conn.execute("INSERT OR REPLACE INTO load_checkpoint VALUES (?, ?, ?, ?, ?, ?)",
+                          (table_name, file_name, fingerprint, position, row_count,
+                           datetime.now().isoformat(timespec='seconds')))
+        self.conn.commit()
+
+    def clear(self, table_name: str) -> None:
+        """ロード完了時に記録を削除してコミット"""
+        self.conn.execute("DELETE FROM load_checkpoint WHERE table_name = ?", (table_name,))
+        self.conn.commit()
@@ -3,50 +3,40 @@ import pandas as pd
 import sqlite3
 import json
 from pathlib import Path
-from typing import Optional, Tuple, Dict, List
-from config import DATA_DIR, DB_FILE, OUTPUT_DIR, SKIP_EXTENSIONS
+from datetime import datetime
+from typing import Optional, Tuple, Dict, Iterable, List, Set
+from config import (DATA_DIR, DB_FILE, OUTPUT_DIR, SKIP_EXTENSIONS, STAGING_PARSE_ROWS,
+                    COMPARE_REPORT_CSV, COMPARE_REPORT_CSV_EXPORT, PROFILE_SAMPLE_ROWS, LOAD_MAX_ROWS)
+from sap_normalizer import SapNormalizer, get_default_normalizer, parse_rule_spec
+from staging_cache import StagingCache, detect_delimiter
+from schema_catalog import table_columns
+import compare_report
+from type_profiler import profile_and_save
+from excel_reader import is_excel, read_sheet, sheet_logical_name, sheet_names, split_logical_name
+from compressed_input import is_compressed, list_members, open_text, physical_names
+from pipelined_loader import InputSource, load_pipelined
+from load_checkpoint import CheckpointStore, source_fingerprint
+from memory_governor import MemoryGovernor
+from compact_frame import MemoryReport
+from unique_convert import convert_unique
 
-def detect_delimiter_simple(file_path: str, encoding: str) -> str:
-    """シンプルな区切り文字検出"""
-    try:
-        with open(file_path, 'r', encoding=encoding, errors='ignore') as f:
-            # 最初の数行を読む
-            sample_text = ""
-            for i in range(5):
-                line = f.readline()
-                if not line:
-                    break
-                sample_text += line
-        
-        # 各区切り文字の出現回数をカウント
-        delimiter_counts = {}
-        for delimiter in ['\t', ',', '|', ';']:  # よく使われる区切り文字
-            count = sample_text.count(delimiter)
-            if count > 0:
-                delimiter_counts[delimiter] = count
-        
-        # 最も多い区切り文字を返す（なければタブ）
-        if delimiter_counts:
-            return max(delimiter_counts.keys(), key=delimiter_counts.get)
-        else:
-            return '\t'  # デフォルト
-            
-    except Exception: # E722: Do not use bare `except`
-        return '\t'
-
-def safe_read_csv(file_path: str, encoding: str, delimiter: str) -> Optional[pd.DataFrame]:
-    """安全なCSV読み込み（pandas バージョン問わず動作）"""
+def safe_read_csv(file_path: str, encoding: str, delimiter: str, nrows: int = STAGING_PARSE_ROWS,
+                  member: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """安全なCSV読み込み（pandas バージョン問わず動作）
+    
+    .gz / zipメンバーは一時展開せず、展開しながらのストリームをそのまま渡す
+    """
     try:
-        # 基本的な引数のみ使用
-        df = pd.read_csv(
-            file_path,
-            sep=delimiter,  # delimiterの代わりにsepを使用
-            dtype=str,
-            encoding=encoding,
-            engine='python',
-            nrows=1000,  # サンプルのみ
-            na_filter=False  # NaN変換を無効化
-        )
+        with open_text(file_path, encoding, member) as f:
+            # 基本的な引数のみ使用
+            df = pd.read_csv(
+                f,
+                sep=delimiter,  # delimiterの代わりにsepを使用
+                dtype=str,
+                engine='python',
+                nrows=nrows,  # サンプルのみ
+                na_filter=False  # NaN変換を無効化
+            )
         return df
     except Exception: # E722: Do not use bare `except`
         return None
@@ -54,10 +44,15 @@ def safe_read_csv(file_path: str, encoding: str, delimiter: str) -> Optional[pd.
 class SimpleFileProcessor:
     """シンプルなファイル処理クラス"""
     
-    def process_excel(self, file_path: str) -> Tuple[Optional[pd.DataFrame], str, Optional[str]]:
-        """Excelファイル処理"""
+    def __init__(self, cache: Optional[StagingCache] = None, nrows: int = STAGING_PARSE_ROWS):
+        self.cache = cache if cache is not None else StagingCache()
+        self.nrows = nrows
+    
+    def process_excel(self, file_path: str, sheet_name: Optional[str] = None
+                      ) -> Tuple[Optional[pd.DataFrame], str, Optional[str]]:
+        """Excelファイル処理（指定シート、省略時は先頭シートを必要な行数だけストリーミングで読む）"""
         try:
-            df = pd.read_excel(file_path, dtype=str, nrows=1000)
+            df = read_sheet(file_path, sheet_name, self.nrows)
             if df.empty:
                 print(f"デバッグ: Excelファイルが空です: {os.path.basename(file_path)}")
                 return None, None, None
@@ -66,19 +61,58 @@ class SimpleFileProcessor:
             print(f"Excel読み込み失敗: {os.path.basename(file_path)} - {e}")
             return None, None, None
     
-    def process_text(self, file_path: str) -> Tuple[Optional[pd.DataFrame], str, str]:
-        """テキスト/CSVファイル処理"""
+    def process_sheet(self, file_path: str, sheet_name: str) -> Tuple[Optional[pd.DataFrame], str, Optional[str]]:
+        """Excelの1シートを処理（シートごとにステージングキャッシュを使う）"""
+        cached = self.cache.get(file_path, self.nrows, member=sheet_name)
+        if cached is not None:
+            return cached
+        df, encoding, delimiter = self.process_excel(file_path, sheet_name)
+        if df is not None:
+            self.cache.put(file_path, df, encoding, delimiter, complete=len(df) < self.nrows, member=sheet_name)
+        return df, encoding, delimiter
+    
+    def iter_inputs(self, file_path: str):
+        """ファイル内の論理ファイルごとに (論理ファイル名, df, encoding, delimiter) を返す
+        
+        Excelは全シートを1シート1テーブルとして返し、それ以外は process_file と同じ1件
+        """
         file_name = os.path.basename(file_path)
+        if is_compressed(file_name):
+            # .gz / .zip はメンバーごとに展開しながら読む（論理ファイル名はメンバー名）
+            try:
+                members = list_members(file_path)
+            except Exception as e:
+                print(f"圧縮ファイル読み込み失敗: {file_name} - {e}")
+                yield file_name, None, None, None
+                return
+            for logical_name, member in members:
+                yield (logical_name, *self.process_file(file_path, member=member))
+            return
+        if not is_excel(file_name):
+            yield (file_name, *self.process_file(file_path))
+            return
+        try:
+            names = sheet_names(file_path)
+        except Exception as e:
+            print(f"Excel読み込み失敗: {file_name} - {e}")
+            yield file_name, None, None, None
+            return
+        for sheet in names:
+            yield (sheet_logical_name(file_name, sheet, len(names)), *self.process_sheet(file_path, sheet))
+    
+    def process_text(self, file_path: str, member: Optional[str] = None) -> Tuple[Optional[pd.DataFrame], str, str]:
+        """テキスト/CSVファイル処理（member: zip内のメンバー名）"""
+        file_name = os.path.basename(file_path) if member is None else f"{os.path.basename(file_path)}:{member}"
         
         # エンコーディングを順番に試す
         for encoding in ['utf-8', 'cp932', 'shift_jis', 'utf-16']:
             try:
                 # まず区切り文字を検出
-                delimiter = detect_delimiter_simple(file_path, encoding)
+                delimiter = detect_delimiter(file_path, encoding, member)
                 print(f"試行中: {file_name} (encoding: {encoding}, delimiter: '{delimiter}')")
                 
                 # CSVを読み込み
-                df = safe_read_csv(file_path, encoding, delimiter)
+                df = safe_read_csv(file_path, encoding, delimiter, self.nrows, member)
                 
                 if df is not None and not df.empty and len(df.columns) > 0:
                     print(f"読み込み成功: {file_name} (encoding: {encoding}, shape: {df.shape})")
@@ -97,21 +131,30 @@ class SimpleFileProcessor:
         print(f"読み込み失敗: {file_name} - すべてのエンコーディングで失敗")
         return None, None, None
     
-    def process_file(self, file_path: str) -> Tuple[Optional[pd.DataFrame], str, Optional[str]]:
-        """ファイル処理のメインメソッド"""
+    def process_file(self, file_path: str, member: Optional[str] = None) -> Tuple[Optional[pd.DataFrame], str, Optional[str]]:
+        """ファイル処理のメインメソッド（member: zip内のメンバー名）"""
         file_name = os.path.basename(file_path)
         
-        if file_name.lower().endswith(('.xls', '.xlsx')):
-            return self.process_excel(file_path)
+        # 解析済みならステージングキャッシュから読み込み（再デコード・再解析しない）
+        cached = self.cache.get(file_path, self.nrows, member=member)
+        if cached is not None:
+            df, encoding, delimiter = cached
+            print(f"キャッシュ使用: {file_name} (encoding: {encoding}, shape: {df.shape})")
+            return df, encoding, delimiter
+        
+        if is_excel(file_name):
+            df, encoding, delimiter = self.process_excel(file_path)
         else:
-            return self.process_text(file_path)
+            df, encoding, delimiter = self.process_text(file_path, member)
+        
+        if df is not None:
+            self.cache.put(file_path, df, encoding, delimiter, complete=len(df) < self.nrows, member=member)
+        return df, encoding, delimiter
 
 def get_table_info(conn: sqlite3.Connection, table_name: str) -> Dict[str, str]:
-    """テーブル情報を取得"""
+    """テーブル情報を取得（カタログが古ければそのテーブルだけを読む）"""
     try:
-        cursor = conn.cursor()
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        return {row[1]: row[2] for row in cursor.fetchall()}
+        return table_columns(conn, table_name)
     except Exception: # E722: Do not use bare `except`
         return {}
 
@@ -144,79 +187,191 @@ def load_t002_loader_updates(file_path: str = "t002_loader_updates.json") -> Dic
         print(f"エラー: {file_path} の読み込み中に問題が発生しました: {e}")
         return {"datetime_override_fields": [], "storage_code_fields": []}
 
-def convert_dataframe_types(df: pd.DataFrame, inferred_schema: Dict[str, str], file_name: str, type_overrides: Dict[str, List[Dict]]) -> pd.DataFrame:
-    """DataFrameの列を推定型に応じて変換"""
-    df_converted = df.copy()
-    
+def build_override_set(type_overrides: Dict[str, List[Dict]]) -> Set[Tuple[str, str]]:
+    """型オーバーライドルールを (file, field) のハッシュ集合に展開（ロード開始時に1回だけ）"""
+    override_set = set()
+    for key in ('datetime_override_fields', 'storage_code_fields'):
+        for item in type_overrides.get(key, []):
+            override_set.add((item['file'], item['field']))
+    return override_set
+
+def get_date_formats(conn: sqlite3.Connection, file_name: str) -> Dict[str, str]:
+    """型推定時に検出した日付フォーマットを取得"""
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT column_name, date_format FROM column_master WHERE file_name=? AND date_format IS NOT NULL",
+            (file_name,)
+        )
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    except Exception: # date_format列がない旧スキーマ
+        return {}
+
+def get_sap_rules(conn: sqlite3.Connection, file_name: str) -> Dict[str, Optional[str]]:
+    """列ごとのSAP正規化ルール指定（column_master.sap_rules）を取得"""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT column_name, sap_rules FROM column_master WHERE file_name=?", (file_name,))
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    except Exception: # sap_rules列がない旧スキーマ
+        return {}
+
+class ConversionPlan:
+    """1ファイル分の列変換計画（チャンクごとに再利用する）"""
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.integer_columns: List[str] = []
+        self.real_columns: List[str] = []
+        self.datetime_columns: Dict[str, Optional[str]] = {}  # 列名 -> 日付フォーマット（不明はNone）
+        self.forced_text_columns: List[str] = []
+        self.normalization: Dict[str, Tuple[str, ...]] = {}  # 列名 -> 適用するSAP正規化ルール
+
+    @property
+    def numeric_columns(self) -> List[str]:
+        return self.integer_columns + self.real_columns
+
+def build_conversion_plan(columns, inferred_schema: Dict[str, str], file_name: str,
+                          override_set: Set[Tuple[str, str]],
+                          date_formats: Optional[Dict[str, str]] = None,
+                          sap_rules: Optional[Dict[str, Optional[str]]] = None) -> ConversionPlan:
+    """推定型・オーバーライド・日付フォーマット・SAP正規化指定から変換計画を作成"""
+    plan = ConversionPlan(file_name)
+    date_formats = date_formats or {}
+    sap_rules = sap_rules or {}
+    present = set(columns)
+
     for col_name, inferred_type in inferred_schema.items():
-        if col_name not in df_converted.columns:
+        if col_name not in present:
             continue
-            
+
         # t002_loader_updates.jsonからのオーバーライドをチェック
-        is_datetime_override = any(
-            item['file'] == file_name and item['field'] == col_name
-            for item in type_overrides.get('datetime_override_fields', [])
-        )
-        is_storage_code_override = any(
-            item['file'] == file_name and item['field'] == col_name
-            for item in type_overrides.get('storage_code_fields', [])
-        )
+        forced_text = (file_name, col_name) in override_set
+        effective_type = "TEXT" if forced_text else inferred_type
+
+        # SAP正規化（未指定ならINTEGER/REAL列のみ後ろマイナス・カンマ小数点）
+        rules = parse_rule_spec(sap_rules.get(col_name), effective_type)
+        if rules:
+            plan.normalization[col_name] = rules
 
-        if is_datetime_override or is_storage_code_override:
+        if forced_text:
             print(f"デバッグ: 型オーバーライド適用: {file_name}:{col_name} -> TEXT (元: {inferred_type})")
             # 強制的にTEXTとして扱うため、型変換をスキップ
+            plan.forced_text_columns.append(col_name)
             continue
-            
+
+        if inferred_type == "INTEGER":
+            plan.integer_columns.append(col_name)
+        elif inferred_type == "REAL":
+            plan.real_columns.append(col_name)
+        elif inferred_type == "DATETIME":
+            plan.datetime_columns[col_name] = date_formats.get(col_name)
+        # TEXTはそのまま（文字列）
+
+    return plan
+
+def apply_conversion_plan(df: pd.DataFrame, plan: ConversionPlan,
+                          normalizer: Optional[SapNormalizer] = None, copy: bool = True) -> pd.DataFrame:
+    """変換計画をチャンク全体に適用（列ごとのループではなく列ブロック単位で変換）
+    
+    copy=False の場合は df をそのまま書き換える（ロード中のチャンクは使い捨てのためコピーしない）
+    """
+    df_converted = df.copy() if copy else df
+
+    # SAP正規化：数値化の前に列ごとのユニーク値へ一括適用
+    if plan.normalization:
+        normalizer = normalizer or get_default_normalizer()
+        for col_name, rules in plan.normalization.items():
+            if rules and col_name in df_converted.columns:
+                df_converted[col_name] = convert_unique(
+                    df_converted[col_name], lambda s, rules=rules: normalizer.normalize_series(s, rules))
+
+    # 数値列：ユニーク値ごとに一括数値化
+    numeric_columns = plan.numeric_columns
+    if numeric_columns:
         try:
-            if inferred_type == "INTEGER":
-                # 整数変換（エラー値はNoneに）
-                df_converted[col_name] = pd.to_numeric(df_converted[col_name], errors='coerce').astype('Int64')
-            elif inferred_type == "REAL":
-                # 実数変換（エラー値はNoneに）
-                df_converted[col_name] = pd.to_numeric(df_converted[col_name], errors='coerce').astype('float64')
-            elif inferred_type == "DATETIME":
-                # 日付変換 → 文字列形式で保存（SQLiteのTimestamp問題回避）
+            numeric = df_converted[numeric_columns].apply(convert_unique, convert=_to_numeric)
+        except Exception: # E722: Do not use bare `except`
+            numeric = None
+        if numeric is not None:
+            for col_name in plan.integer_columns:
                 try:
-                    dt_series = pd.to_datetime(df_converted[col_name], errors='coerce')
-                    # 有効な日付のみ文字列変換、無効な日付はNone
-                    df_converted[col_name] = dt_series.dt.strftime('%Y-%m-%d %H:%M:%S').where(pd.notna(dt_series), None)
+                    # 整数変換（エラー値はNoneに）
+                    df_converted[col_name] = numeric[col_name].astype('Int64')
                 except Exception: # E722: Do not use bare `except`
-                    # 変換失敗時はTEXTのまま
-                    pass
-            # TEXTはそのまま（文字列）
+                    # 小数を含むなど整数化できない場合はTEXTのまま
+                    continue
+            if plan.real_columns:
+                # 実数変換（エラー値はNoneに）
+                df_converted[plan.real_columns] = numeric[plan.real_columns].astype('float64')
+
+    # 日付列：推定時のフォーマットごとにまとめて変換 → 文字列形式で保存（SQLiteのTimestamp問題回避）
+    columns_by_format: Dict[Optional[str], List[str]] = {}
+    for col_name, fmt in plan.datetime_columns.items():
+        columns_by_format.setdefault(fmt, []).append(col_name)
+
+    for fmt, cols in columns_by_format.items():
+        try:
+            # 解析・文字列化とも、繰り返し現れる日付はユニーク値ごとに1回だけ
+            dt_block = df_converted[cols].apply(convert_unique, convert=lambda s: _format_datetime(s, fmt))
         except Exception: # E722: Do not use bare `except`
-            # 変換に失敗した場合はTEXTのまま
+            # 変換失敗時はTEXTのまま
             continue
-    
+        for col_name in cols:
+            df_converted[col_name] = dt_block[col_name]
+
     return df_converted
 
+def _to_numeric(s: pd.Series) -> pd.Series:
+    return pd.to_numeric(s, errors='coerce')
+
+def _format_datetime(s: pd.Series, fmt: Optional[str]) -> pd.Series:
+    """日付に変換して文字列形式に戻す（有効な日付のみ文字列変換、無効な日付はNone）"""
+    if fmt:
+        dt_series = pd.to_datetime(s, format=fmt, errors='coerce')
+    else:
+        dt_series = pd.to_datetime(s, errors='coerce')
+    return dt_series.dt.strftime('%Y-%m-%d %H:%M:%S').where(pd.notna(dt_series), None)
+
+def convert_dataframe_types(df: pd.DataFrame, inferred_schema: Dict[str, str], file_name: str = None,
+                            type_overrides: Optional[Dict[str, List[Dict]]] = None,
+                            date_formats: Optional[Dict[str, str]] = None,
+                            sap_rules: Optional[Dict[str, Optional[str]]] = None) -> pd.DataFrame:
+    """DataFrameの列を推定型に応じて変換"""
+    override_set = build_override_set(type_overrides or {})
+    plan = build_conversion_plan(df.columns, inferred_schema, file_name, override_set, date_formats, sap_rules)
+    return apply_conversion_plan(df, plan)
+
 
 def save_with_types(df: pd.DataFrame, table_name: str, conn: sqlite3.Connection, inferred_schema: Dict[str, str]):
     """型指定付きでSQLiteテーブルを作成・保存（簡単版）"""
+    write_chunk(df, table_name, conn, replace=True)
+
+def write_chunk(df: pd.DataFrame, table_name: str, conn: sqlite3.Connection, replace: bool = False,
+                commit: bool = True):
+    """型変換済みのチャンクを書き込む
     
-    # テーブル削除
-    conn.execute(f"DROP TABLE IF EXISTS {table_name}")
-    conn.commit()
-    
-    # データ挿入前の安全化
-    df_safe = df.copy()
-    
-    # すべてのNaN、NaT、pd.NAをNoneに置換
-    for col in df_safe.columns:
-        # pandas 特殊値をすべてNoneに統一
-        try:
-            mask = pd.isna(df_safe[col])
-            df_safe[col] = df_safe[col].where(~mask, None)
-        except Exception: # E722: Do not use bare `except`
-            # 変換エラーの場合はそのまま
-            pass
+    replace=True の場合はテーブルを作り直す（列の型は to_sql と同じくDataFrameの型から決める）。
+    commit=False の場合はコミットしない（チェックポイントと同じトランザクションで確定するため）。
+    """
+    if replace:
+        # テーブル削除・作成
+        conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+        conn.execute(pd.io.sql.get_schema(df, table_name, con=conn))
     
-    # 単純にto_sqlを使用（型変換はDataFrame側で完了済み）
-    df_safe.to_sql(table_name, conn, if_exists='replace', index=False)
+    # すべてのNaN、NaT、pd.NAをNoneに置換（Int64などはPythonの値として取り出す）
+    rows = df.astype(object).where(df.notna(), None).to_numpy().tolist()
+    placeholders = ', '.join('?' for _ in df.columns)
+    conn.executemany(f'INSERT INTO "{table_name}" VALUES ({placeholders})', rows)
+    if commit:
+        conn.commit()
 
 def sanitize_table_name(file_name: str) -> str:
-    """テーブル名をサニタイズ"""
+    """テーブル名をサニタイズ（Excelの論理ファイル名 "ブック#シート" は "ブック_シート"）"""
+    file_name, sheet_name = split_logical_name(file_name)
     base_name = os.path.splitext(file_name)[0]
+    if sheet_name is not None:
+        base_name = f"{base_name}_{sheet_name}"
     # 英数字とアンダースコア以外を置換
     sanitized = ''.join(c if c.isalnum() or c == '_' else '_' for c in base_name)
     # 先頭が数字の場合は接頭辞を追加
@@ -224,27 +379,222 @@ def sanitize_table_name(file_name: str) -> str:
         sanitized = 'table_' + sanitized
     return sanitized or 'unnamed_table'
 
-def load_and_compare():
-    """メイン処理"""
+def input_source(file_path: str, logical_name: str) -> InputSource:
+    """論理ファイル名から読み込み元（zipメンバー・Excelシート）を特定"""
+    file_name = os.path.basename(file_path)
+    if is_excel(file_name):
+        return InputSource(file_path, sheet=split_logical_name(logical_name)[1], excel=True)
+    if is_compressed(file_name):
+        member = dict(list_members(file_path)).get(logical_name)
+        return InputSource(file_path, member=member)
+    return InputSource(file_path)
+
+def _load_input(conn: sqlite3.Connection, file_name: str, df: pd.DataFrame, encoding_used: Optional[str],
+                delimiter_used: Optional[str], override_set: Set[Tuple[str, str]],
+                normalizer: SapNormalizer, source: Optional[InputSource] = None,
+                governor: Optional[MemoryGovernor] = None) -> List[Dict]:
+    """論理ファイル1件を型変換して保存し、比較レポートの行を返す（保存失敗時は例外）
+    
+    source を指定した場合、df は列名と型推定用のサンプルとしてだけ使い、ファイル全体を
+    パイプライン型ロード（読み込み・解析/型変換・書き込みの並行実行）で保存する。
+    ブロックサイズ・並列数はサンプルの1行あたりのメモリ量からメモリ予算に収まるように決める。
+    """
+    # テーブル名生成
+    table_name = sanitize_table_name(file_name)
+    
+    # column_masterから推定型情報を取得
+    inferred_schema = get_inferred_info(conn, file_name)
+    
+    # DataFrame列の型変換（変換計画を作成して一括適用）
+    plan = build_conversion_plan(df.columns, inferred_schema, file_name, override_set,
+                                 get_date_formats(conn, file_name), get_sap_rules(conn, file_name))
+    # 型変換後の列はカテゴリ型・Arrow文字列・小さい数値型に詰め、削減量をファイルごとに表示
+    report = MemoryReport(table_name)
+    
+    def convert(chunk: pd.DataFrame) -> pd.DataFrame:
+        return report.convert(chunk, lambda c: apply_conversion_plan(c, plan, normalizer, copy=False))
+    
+    if source is None:
+        df_typed = convert(df)
+        
+        # SQLiteに保存（型指定付き）
+        save_with_types(df_typed, table_name, conn, inferred_schema)
+        print(f"SQLite保存完了: {table_name}")
+    else:
+        # 前回中断したロードは、ファイルと変換条件が同じなら最後にコミットした位置から再開
+        checkpoints = CheckpointStore(conn)
+        fingerprint = source_fingerprint(source.path, source.member, source.sheet, list(df.columns),
+                                         vars(plan), LOAD_MAX_ROWS)
+        resume_from = checkpoints.resume_point(table_name, fingerprint)
+        if resume_from is not None:
+            print(f"中断位置から再開: {table_name} ({resume_from[1]}行ロード済み)")
+        governor = governor or MemoryGovernor()
+        sizing = governor.plan_load(df)
+        source.chunk_rows = sizing.chunk_rows
+        print(f"ロード設定: {table_name} {sizing}")
+        try:
+            row_count = load_pipelined(
+                source, df.columns, encoding_used, delimiter_used,
+                convert=convert,
+                write=lambda chunk, first: write_chunk(chunk, table_name, conn, replace=first, commit=False),
+                max_rows=LOAD_MAX_ROWS, resume_from=resume_from,
+                checkpoint=lambda position, rows: checkpoints.save(table_name, file_name, fingerprint, position, rows),
+                workers=sizing.workers, queue_size=sizing.queue_size, block_bytes=sizing.block_bytes,
+                governor=governor)
+        except KeyboardInterrupt:
+            # 最後のチェックポイント以降に書き込んだチャンクを捨てる（次回はチェックポイントから再開）
+            conn.rollback()
+            raise
+        except Exception:
+            # 中断以外の失敗（変換・書き込みエラー）は再開せず、次回は最初からロードし直す
+            conn.rollback()
+            checkpoints.clear(table_name)
+            raise
+        checkpoints.clear(table_name)
+        print(f"SQLite保存完了: {table_name} ({row_count}行)")
+    print(report.summary())
+    
+    # 実際の格納型（typeof）の分布を記録
+    profile_and_save(conn, table_name, file_name, PROFILE_SAMPLE_ROWS)
+    
+    # スキーマ比較（推定型は保存前に取得したものを再利用）
+    actual_schema = get_table_info(conn, table_name)
+    
+    # 結果作成
+    rows = []
+    for col_name, actual_type in actual_schema.items():
+        inferred_type = inferred_schema.get(col_name, "（未登録）")
+        match = (actual_type.upper() == inferred_type.upper()) if inferred_type != "（未登録）" else False
+        
+        rows.append({
+            "File": file_name,
+            "Column": col_name,
+            "Inferred_Type": inferred_type,
+            "Actual_Type": actual_type,
+            "Match": "○" if match else "×",
+            "Encoding": encoding_used,
+            "Delimiter": delimiter_used
+        })
+    return rows
+
+def list_target_files(target_files: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+    """DATA_DIR のロード対象ファイル → (全ファイル, 対象ファイル)
+    
+    target_files を指定した場合は該当ファイルだけ。論理ファイル名（Excelのシート・圧縮ファイルの
+    メンバー）は実ファイル単位に読み替える。
+    """
+    all_files = [f for f in os.listdir(DATA_DIR) if os.path.isfile(os.path.join(DATA_DIR, f))]
+    partial_run = target_files is not None
+    requested_files = physical_names({split_logical_name(name)[0] for name in (target_files or [])},
+                                     DATA_DIR, all_files) if partial_run else set()
+    return all_files, [f for f in all_files
+                       if not any(f.lower().endswith(ext) for ext in SKIP_EXTENSIONS)
+                       and (not partial_run or f in requested_files)]
+
+def load_file(conn: sqlite3.Connection, processor: SimpleFileProcessor, file_path: str,
+              override_set: Set[Tuple[str, str]], normalizer: SapNormalizer,
+              governor: MemoryGovernor) -> Tuple[List[Dict], int, int]:
+    """実ファイル1件（Excelはシートごと、圧縮ファイルはメンバーごとに1テーブル）をロード
+    
+    Returns:
+        (比較レポートの行, 成功した論理ファイル数, 失敗した論理ファイル数)
+    """
+    results = []
+    processed_count = 0
+    error_count = 0
+    for input_name, df, encoding_used, delimiter_used in processor.iter_inputs(file_path):
+        if df is None:
+            # ファイルが空の場合も成功としてカウントし、次のファイルへ
+            processed_count += 1
+            print(f"完了 (空ファイル): {input_name}")
+            continue
+        
+        # サンプルがファイル全体を含む場合はそのまま保存し、それ以外は全体を並行ロード
+        source = None
+        if len(df) >= processor.nrows and (LOAD_MAX_ROWS is None or LOAD_MAX_ROWS > len(df)):
+            source = input_source(file_path, input_name)
+        elif LOAD_MAX_ROWS is not None:
+            df = df.head(LOAD_MAX_ROWS)
+        
+        try:
+            rows = _load_input(conn, input_name, df, encoding_used, delimiter_used,
+                               override_set, normalizer, source, governor)
+        except Exception as e:
+            # 未コミットの書き込みが後続のコミットで確定しないように捨てる
+            conn.rollback()
+            print(f"SQLite保存失敗: {e}")
+            error_count += 1
+            continue
+        
+        results.extend(rows)
+        processed_count += 1
+        print(f"完了: {input_name} (列数: {len(rows)})")
+    return results, processed_count, error_count
+
+def save_results(results: List[Dict], target_files: Optional[List[str]], started_at: str) -> None:
+    """比較結果を compare_report に新しい実行として保存（設定によりCSVにも書き出す）
+    
+    target_files: 部分再ロードの対象ファイル（全件ロードの場合はNone）
+    """
+    if not results:
+        print(" 処理可能なファイルがありませんでした")
+        return
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        try:
+            run_id = compare_report.save_run(conn, results, target_files, started_at)
+            print(f"\n 比較結果を保存しました → compare_report (run_id: {run_id})")
+            if COMPARE_REPORT_CSV_EXPORT:
+                # 各ファイルの最新結果をCSVに逐次書き出し
+                row_count = compare_report.export_csv(conn, COMPARE_REPORT_CSV)
+                print(f" 比較結果を出力しました → {COMPARE_REPORT_CSV} ({row_count}行)")
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f" 比較結果の保存失敗: {e}")
+
+def includes_any(file_names: Iterable[str], logical_names: Iterable[str]) -> bool:
+    """実ファイル名の一覧に、論理ファイル名のどれかを含むファイルがあるか"""
+    return bool(physical_names({split_logical_name(name)[0] for name in logical_names}, DATA_DIR, list(file_names)))
+
+def load_and_compare(target_files: Optional[List[str]] = None) -> List[str]:
+    """メイン処理
+    
+    Args:
+        target_files: 指定した場合はこのファイルだけを再ロードする（ルール差分適用用）。
+                      比較レポート（compare_report テーブル）には該当ファイルの行だけが
+                      新しい実行として追加され、他のファイルは前回の結果が最新のまま残る。
+    
+    Returns:
+        ロードできなかったデータファイル名（論理ファイルが1つでも失敗したもの、中断で処理しなかったものを含む）
+    """
     print("=== SQLite GUI Manager - Load & Compare ===")
+    started_at = datetime.now().isoformat(timespec='seconds')
     
     # 初期化
     processor = SimpleFileProcessor()
     results = []
     
-    # 型オーバーライドルールをロード
+    # 型オーバーライドルールをロード（(file, field) 集合に1回だけ展開）
     type_overrides = load_t002_loader_updates()
+    override_set = build_override_set(type_overrides)
+    
+    # SAP正規化エンジン（ルールストアのsap_patternsをコンパイル）
+    normalizer = SapNormalizer.from_rule_store()
+    
+    # メモリ予算（ファイルごとのブロックサイズ・並列数の決定と実行中のRSS監視）
+    governor = MemoryGovernor()
     
     # ディレクトリ確認
     if not os.path.exists(DATA_DIR):
         print(f"エラー: データディレクトリが見つかりません: {DATA_DIR}")
-        return
+        return list(target_files or [])
     
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     # ファイル一覧取得
-    all_files = [f for f in os.listdir(DATA_DIR) if os.path.isfile(os.path.join(DATA_DIR, f))]
-    target_files = [f for f in all_files if not any(f.lower().endswith(ext) for ext in SKIP_EXTENSIONS)]
+    partial_run = target_files is not None
+    all_files, target_files = list_target_files(target_files)
     
     print(f"全ファイル数: {len(all_files)}")
     print(f"処理対象: {len(target_files)}")
@@ -257,71 +607,24 @@ def load_and_compare():
         print(f"データベース接続成功: {DB_FILE}")
     except Exception as e:
         print(f"データベース接続失敗: {e}")
-        return
+        return list(target_files)
     
     processed_count = 0
     error_count = 0
+    failed_files = list(target_files)  # 最後まで処理できたファイルを除いていく
     
     try:
         for i, file_name in enumerate(target_files, 1):
             print(f"\n[{i}/{len(target_files)}] 処理中: {file_name}")
             
-            file_path = os.path.join(DATA_DIR, file_name)
-            
-            # ファイル読み込み
-            df, encoding_used, delimiter_used = processor.process_file(file_path)
-            
-            if df is None:
-                # ファイルが空の場合も成功としてカウントし、次のファイルへ
-                processed_count += 1
-                print(f"完了 (空ファイル): {file_name}")
-                continue
-            
-            # テーブル名生成
-            table_name = sanitize_table_name(file_name)
-            
-            # SQLiteに保存（型変換付き）
-            try:
-                # column_masterから推定型情報を取得
-                inferred_schema = get_inferred_info(conn, file_name)
-                
-                # DataFrame列の型変換
-                df_typed = convert_dataframe_types(df, inferred_schema, file_name, type_overrides)
-                
-                # SQLiteに保存（型指定付き）
-                save_with_types(df_typed, table_name, conn, inferred_schema)
-                print(f"SQLite保存完了: {table_name}")
-                
-            except Exception as e:
-                print(f"SQLite保存失敗: {e}")
-                error_count += 1
-                continue
-            except Exception as e:
-                print(f"SQLite保存失敗: {e}")
-                error_count += 1
-                continue
-            
-            # スキーマ比較
-            actual_schema = get_table_info(conn, table_name)
-            inferred_schema = get_inferred_info(conn, file_name)
-            
-            # 結果作成
-            for col_name, actual_type in actual_schema.items():
-                inferred_type = inferred_schema.get(col_name, "（未登録）")
-                match = (actual_type.upper() == inferred_type.upper()) if inferred_type != "（未登録）" else False
-                
-                results.append({
-                    "File": file_name,
-                    "Column": col_name,
-                    "Inferred_Type": inferred_type,
-                    "Actual_Type": actual_type,
-                    "Match": "○" if match else "×",
-                    "Encoding": encoding_used,
-                    "Delimiter": delimiter_used
-                })
-            
-            processed_count += 1
-            print(f"完了: {file_name} (列数: {len(actual_schema)})")
+            # ファイル読み込み（Excelはシートごとに1テーブル）
+            rows, processed, errors = load_file(conn, processor, os.path.join(DATA_DIR, file_name),
+                                                override_set, normalizer, governor)
+            results.extend(rows)
+            processed_count += processed
+            error_count += errors
+            if not errors:
+                failed_files.remove(file_name)
     
     except KeyboardInterrupt:
         print("\n処理が中断されました")
@@ -336,15 +639,8 @@ def load_and_compare():
     print(f"  失敗: {error_count} ファイル")
     print(f"  総行数: {len(results)} 行")
     
-    if results:
-        report_path = os.path.join(OUTPUT_DIR, "compare_report.csv")
-        try:
-            pd.DataFrame(results).to_csv(report_path, index=False, encoding="utf-8-sig")
-            print(f"\n 比較結果を出力しました → {report_path}")
-        except Exception as e:
-            print(f" CSV出力失敗: {e}")
-    else:
-        print(" 処理可能なファイルがありませんでした")
+    save_results(results, target_files if partial_run else None, started_at)
+    return failed_files
 
 if __name__ == "__main__":
     load_and_compare()
\ No newline at end of file
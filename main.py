@@ -1,30 +1,114 @@
 import sys
-from config import DATA_DIR, CANDIDATE_CSV, DB_FILE
-from analyzer import analyze_files
-from init_dev import init_db_dev
-from init_prod import init_db_prod
-from loader import load_and_compare  # ← 追加
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("使い方: python main.py [init_dev | init_prod | analyze | load]")
-        sys.exit(1)
+# サブコマンドのハンドラは実行時に遅延解決する。
+# モジュール先頭で analyzer / loader を import すると pandas まで読み込まれ、
+# sqlite3 しか使わない init_dev / init_prod（cron実行）の起動が遅くなるため。
+
+
+def _cmd_init_dev(args):
+    from init_dev import init_db_dev
+    return init_db_dev()
+
+
+def _cmd_init_prod(args):
+    from init_prod import init_db_prod
+    return init_db_prod()
+
+
+def _cmd_analyze(args):
+    from config import DATA_DIR, CANDIDATE_CSV, DB_FILE
+    from analyzer import analyze_files
+    print(f"使用中のDBファイル: {DB_FILE}")
+    return analyze_files(DATA_DIR, CANDIDATE_CSV, DB_FILE)
+
+
+def _cmd_load(args):
+    from loader import load_and_compare
+    return load_and_compare()
+
+
+def _cmd_apply_rules(args):
+    from t002_rule_applier import T002RuleApplier
+    # 前回適用時からの差分ルールだけを適用し、影響ファイルのみ再ロード
+    return T002RuleApplier().run_incremental_application(reload=True)
+
+
+def _cmd_sync_rules(args):
+    from t003_rule_integration import RuleIntegrationManager
+    return RuleIntegrationManager().sync_gui_to_loader(reload=True)
+
 
-    cmd = sys.argv[1]
+def _cmd_watch(args):
+    from ingest_daemon import main as watch_main
+    return watch_main()
 
-    if cmd == "init_dev":
-        init_db_dev()
 
-    elif cmd == "init_prod":
-        init_db_prod()
+def _cmd_pipeline(args):
+    from pipeline import run_pipeline
+    # 入力が変わったステージ・ファイルだけを実行（--force で全ステージを実行）
+    return run_pipeline(force="--force" in args)
 
-    elif cmd == "analyze":
-        print(f"使用中のDBファイル: {DB_FILE}")
-        analyze_files(DATA_DIR, CANDIDATE_CSV, DB_FILE)
 
-    elif cmd == "load":
-        load_and_compare()
+def _cmd_load_distributed(args):
+    from config import WORK_LOCAL_WORKERS
+    from distributed_loader import load_distributed
+    # --workers N: このマシンで起動するワーカー数（0 なら別ノードの load_worker だけで処理）
+    # --resume: 中断したバッチの続きを処理・取り込む
+    workers = WORK_LOCAL_WORKERS
+    if "--workers" in args:
+        value = args[args.index("--workers") + 1] if args.index("--workers") + 1 < len(args) else ""
+        if not value.isdigit():
+            print("使い方: python main.py load_distributed [--workers N] [--resume]")
+            return None
+        workers = int(value)
+    return load_distributed(workers=workers, resume="--resume" in args)
 
-    else:
+
+def _cmd_load_worker(args):
+    from distributed_loader import run_worker
+    # キューのジョブを処理する（--wait で新しいジョブを待ち続ける）
+    return run_worker(exit_when_idle="--wait" not in args)
+
+
+COMMANDS = {
+    "init_dev": _cmd_init_dev,
+    "init_prod": _cmd_init_prod,
+    "analyze": _cmd_analyze,
+    "load": _cmd_load,
+    "apply_rules": _cmd_apply_rules,
+    "sync_rules": _cmd_sync_rules,
+    "watch": _cmd_watch,
+    "pipeline": _cmd_pipeline,
+    "load_distributed": _cmd_load_distributed,
+    "load_worker": _cmd_load_worker,
+}
+
+
+def usage() -> str:
+    return f"使い方: python main.py [{' | '.join(COMMANDS)}]"
+
+
+def resolve_command(cmd):
+    """サブコマンド名からハンドラを取得（未知のコマンドはNone）"""
+    return COMMANDS.get(cmd)
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(usage())
+        return 1
+
+    cmd = argv[0]
+    handler = resolve_command(cmd)
+    if handler is None:
         print(f"不明なコマンド: {cmd}")
-        print("使い方: python main.py [init_dev | init_prod | analyze | load]")
+        print(usage())
+        return 1
+
+    handler(argv[1:])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
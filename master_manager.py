@@ -19,9 +19,13 @@ def init_master():
             initial_inferred_type TEXT, -- 初期推定型を追加
             encoding TEXT,
             delimiter TEXT,
+            date_format TEXT, -- 推定時に検出した日付フォーマット
+            sap_rules TEXT, -- SAP正規化ルール（NULL: 数値列のみ後ろマイナス・カンマ小数点）
             PRIMARY KEY(file_name, column_name)
         )
         """)
+        # T002ルール評価（rule_engine）の型条件での絞り込み用
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_column_master_types ON column_master (initial_inferred_type, data_type)")
     print(f"✅ マスタ初期化済み: {DB_PATH}")
 
 def load_master():
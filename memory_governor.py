@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+メモリ予算ガバナー
+requirements.md の「メモリ8GB以下での動作」を守るため、ロードのブロックサイズ・解析ワーカー数・
+キューの長さをファイルごとに決め、実行中は実際のRSSを監視して並列数を絞る。
+
+- 1行あたりのメモリ量はサンプル（ファイル先頭のブロック）の DataFrame から見積もる
+  （列数の多いファイルほど1ブロックの行数を減らす）
+- 同時にメモリ上にあるブロック数（ワーカー数 + キュー2本分 + 書き込み中の1つ）で予算を割り、
+  ブロックが小さくなりすぎる場合はキュー・ワーカーを減らす
+- 実行中にRSSが予算を超えた場合、先頭以外の解析ワーカーは予算内に戻るまで待つ
+- RSSは psutil（任意依存）、なければ /proc/self/statm から取得。どちらもない環境では見積もりのみ
+"""
+
+import os
+from typing import Optional
+
+import pandas as pd
+
+from config import (EXCEL_CHUNK_ROWS, LOAD_BLOCK_BYTES, LOAD_PARSE_WORKERS, LOAD_QUEUE_SIZE,
+                    MEMORY_BUDGET_BYTES)
+
+try:
+    import psutil
+except ImportError:  # psutilは任意依存
+    psutil = None
+
+MIN_BLOCK_BYTES = 64 * 1024
+MIN_CHUNK_ROWS = 100
+# 文字列のDataFrame1行に対して、型変換のコピー・書き込み用の行リストを含めて必要になる倍率
+WORKING_SET_FACTOR = 3
+
+
+def rss_bytes() -> Optional[int]:
+    """現在のプロセスの常駐メモリ（取得できない環境ではNone）"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class LoadSizing:
+    """1ファイルのロードに使うブロックサイズ・並列数"""
+
+    __slots__ = ('block_bytes', 'chunk_rows', 'workers', 'queue_size', 'row_bytes')
+
+    def __init__(self, block_bytes: int, chunk_rows: int, workers: int, queue_size: int, row_bytes: float):
+        self.block_bytes = block_bytes
+        self.chunk_rows = chunk_rows
+        self.workers = workers
+        self.queue_size = queue_size
+        self.row_bytes = row_bytes
+
+    def __repr__(self) -> str:
+        return (f"LoadSizing(block_bytes={self.block_bytes}, chunk_rows={self.chunk_rows}, "
+                f"workers={self.workers}, queue_size={self.queue_size}, row_bytes={self.row_bytes:.0f})")
+
+
+class MemoryGovernor:
+    """メモリ予算に合わせてロードの大きさを決め、実行中のRSSを監視する"""
+
+    def __init__(self, budget_bytes: int = MEMORY_BUDGET_BYTES, rss_reader=rss_bytes):
+        self.budget_bytes = budget_bytes
+        self.rss_reader = rss_reader
+        self._throttled = False
+
+    @staticmethod
+    def estimate_row_bytes(sample: pd.DataFrame) -> float:
+        """サンプル1行あたりのメモリ量（文字列のDataFrameとして）"""
+        if len(sample) == 0:
+            return float(max(len(sample.columns), 1) * 64)
+        return float(sample.memory_usage(deep=True, index=False).sum()) / len(sample)
+
+    @staticmethod
+    def estimate_raw_row_bytes(sample: pd.DataFrame) -> float:
+        """サンプル1行あたりのファイル上の大きさ（文字数 + 区切り文字）"""
+        if len(sample) == 0 or len(sample.columns) == 0:
+            return 1.0
+        chars = sum(int(sample[col].astype(str).str.len().sum()) for col in sample.columns)
+        return max(1.0, (chars + len(sample) * len(sample.columns)) / len(sample))
+
+    def available_bytes(self) -> int:
+        """予算のうち、まだ使っていない分（RSSが取れない場合は予算全体）"""
+        rss = self.rss_reader()
+        return max(self.budget_bytes - (rss or 0), 0)
+
+    def plan_load(self, sample: pd.DataFrame, max_workers: int = LOAD_PARSE_WORKERS,
+                  max_queue_size: int = LOAD_QUEUE_SIZE, max_block_bytes: int = LOAD_BLOCK_BYTES) -> LoadSizing:
+        """サンプルから1行あたりのメモリ量を見積もり、予算に収まるブロックサイズ・並列数を決める"""
+        row_bytes = self.estimate_row_bytes(sample) * WORKING_SET_FACTOR
+        raw_row_bytes = self.estimate_raw_row_bytes(sample)
+        available = self.available_bytes()
+
+        workers, queue_size = max(max_workers, 1), max(max_queue_size, 1)
+        while True:
+            in_flight = workers + 2 * queue_size + 1
+            block_rows = available / (in_flight * row_bytes)
+            if block_rows * raw_row_bytes >= MIN_BLOCK_BYTES or (workers == 1 and queue_size == 1):
+                break
+            # ブロックを小さくしすぎる代わりに、同時にメモリ上に置くブロック数を減らす
+            if queue_size > 1:
+                queue_size -= 1
+            else:
+                workers -= 1
+
+        block_bytes = int(min(max(block_rows * raw_row_bytes, MIN_BLOCK_BYTES), max_block_bytes))
+        chunk_rows = int(min(max(block_rows, MIN_CHUNK_ROWS), EXCEL_CHUNK_ROWS))
+        return LoadSizing(block_bytes, chunk_rows, workers, queue_size, row_bytes)
+
+    def over_budget(self) -> bool:
+        """実際のRSSが予算を超えているか"""
+        rss = self.rss_reader()
+        over = rss is not None and rss > self.budget_bytes
+        if over and not self._throttled:
+            print(f"警告: メモリ使用量 {rss / 1024 ** 2:.0f}MB が上限 {self.budget_bytes / 1024 ** 2:.0f}MB を"
+                  f"超えたため、解析ワーカーの並列数を絞ります")
+        self._throttled = over
+        return over
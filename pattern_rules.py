@@ -6,32 +6,66 @@ Pattern Rules for T002: データ型修正ルール実装
 
 import re
 import pandas as pd
+from collections import Counter
 from datetime import datetime
+from functools import lru_cache
 import logging
-import json
 import os
+from sap_normalizer import SapNormalizer, DEFAULT_SAP_PATTERNS
+from rule_store import RuleStore, DEFAULT_RULES_FILE
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=65536)
+def _is_valid_date_string(date_string):
+    """日付文字列の妥当性チェック"""
+    
+    date_formats = [
+        '%Y%m%d', '%Y/%m/%d', '%Y-%m-%d',
+        '%d.%m.%Y', '%m/%d/%Y', '%Y.%m.%d'
+    ]
+    
+    for fmt in date_formats:
+        try:
+            datetime.strptime(date_string, fmt)
+            return True
+        except ValueError:
+            continue
+    
+    return False
+
 class TypeCorrectionRules:
     """データ型修正ルールのメインクラス"""
     
-    def __init__(self):
-        """修正ルールの初期化"""
-        self.rules_file = "pattern_rules_data.json"
+    def __init__(self, store: RuleStore = None):
+        """修正ルールの初期化
+        
+        Args:
+            store: ルールストア（省略時は master.db）。
+                   ストアが空の場合は pattern_rules_data.json から取り込む
+        """
+        self.rules_file = DEFAULT_RULES_FILE
+        self.store = store or RuleStore()
         self._load_rules_data()
 
     def _load_rules_data(self):
-        """JSONファイルからルールデータをロードする"""
+        """ルールストアからルールデータをロードする"""
+        if self.store.is_empty():
+            self._import_initial_rules()
+        self._store_version = self.store.version()
+        self._rules_data = self.store.snapshot()
+        self._build_matchers()
+
+    def _import_initial_rules(self):
+        """空のルールストアにJSONファイル（なければデフォルト値）を取り込む"""
         if os.path.exists(self.rules_file):
-            with open(self.rules_file, 'r', encoding='utf-8') as f:
-                self._rules_data = json.load(f)
-            logger.info(f"ルールデータを {self.rules_file} からロードしました。")
+            self.store.import_json(self.rules_file)
+            logger.info(f"ルールデータを {self.rules_file} からルールストアに取り込みました。")
         else:
             # ファイルが存在しない場合はデフォルト値を設定し、保存する
-            self._rules_data = {
+            self.store.import_rules_data({
                 "unregistered_files": {
                     '払出明細（大阪）_ZPR01201.txt': {'encoding': 'shift_jis', 'separator': '\t'},
                     '払出明細（滋賀）_ZPR01201.txt': {'encoding': 'shift_jis', 'separator': '\t'},
@@ -66,20 +100,37 @@ class TypeCorrectionRules:
                         '重量', 'juuryou', 'weight', 'wt'
                     ]
                 },
-                "sap_patterns": {
-                    'trailing_minus': r'^(\d+)-$' ,
-                    'zero_padding': r'^0+(\d+)$' ,
-                    'decimal_comma': r'^(\d+),(\d+)$'
-                }
-            }
-            self._save_rules_data()
+                "sap_patterns": dict(DEFAULT_SAP_PATTERNS)
+            })
+            self.store.export_json(self.rules_file)
             logger.info(f"デフォルトのルールデータを {self.rules_file} に保存しました。")
 
+    def _build_matchers(self):
+        """ルールデータから判定用の正規表現・正規化エンジンを構築"""
+        self._datetime_regexes = [re.compile(p) for p in self._rules_data['datetime_patterns']]
+        self._sap_normalizer = SapNormalizer(self._rules_data.get('sap_patterns'))
+
+    def refresh(self) -> bool:
+        """ストアのバージョンが進んでいればルールを読み直す（読み直した場合True）"""
+        if self.store.version() == self._store_version:
+            return False
+        self._load_rules_data()
+        return True
+
     def _save_rules_data(self):
-        """ルールデータをJSONファイルに保存する"""
-        with open(self.rules_file, 'w', encoding='utf-8') as f:
-            json.dump(self._rules_data, f, indent=2, ensure_ascii=False)
-        logger.info(f"ルールデータを {self.rules_file} に保存しました。")
+        """_rules_data の内容でルールストアを置き換え、JSONにもエクスポートする
+        
+        行単位の編集は self.store.add / update / delete を使用する
+        """
+        self.store.import_rules_data(self._rules_data)
+        self.export_rules()
+        self._load_rules_data()
+
+    def export_rules(self, rules_file: str = None):
+        """ルールストアの内容をJSONファイルに書き出す"""
+        rules_file = rules_file or self.rules_file
+        self.store.export_json(rules_file)
+        logger.info(f"ルールデータを {rules_file} に保存しました。")
     
     def apply_file_specific_rules(self, file_name, data_sample):
         """ファイル固有のルール適用"""
@@ -114,15 +165,14 @@ class TypeCorrectionRules:
         datetime_match_count = 0
         total_samples = min(len(sample_values), 100)  # 最大100サンプル
         
-        for value in sample_values[:total_samples]:
-            value_str = str(value).strip()
-            
+        # 同じ値は1回だけ判定して出現回数分を数える
+        for value_str, count in Counter(str(v).strip() for v in sample_values[:total_samples]).items():
             # 各日付パターンでチェック
-            for pattern in self._rules_data['datetime_patterns']:
-                if re.match(pattern, value_str):
+            for regex in self._datetime_regexes:
+                if regex.match(value_str):
                     # さらに実際の日付として有効かチェック
                     if self._is_valid_date(value_str):
-                        datetime_match_count += 1
+                        datetime_match_count += count
                         break
         
         # 80%以上が日付パターンにマッチした場合はDATETIME
@@ -135,21 +185,8 @@ class TypeCorrectionRules:
         return None  # 判定なし（他のロジックに委ねる）
     
     def _is_valid_date(self, date_string):
-        """日付文字列の妥当性チェック"""
-        
-        date_formats = [
-            '%Y%m%d', '%Y/%m/%d', '%Y-%m-%d',
-            '%d.%m.%Y', '%m/%d/%Y', '%Y.%m.%d'
-        ]
-        
-        for fmt in date_formats:
-            try:
-                datetime.strptime(date_string, fmt)
-                return True
-            except ValueError:
-                continue
-        
-        return False
+        """日付文字列の妥当性チェック（同じ文字列の判定結果はキャッシュ）"""
+        return _is_valid_date_string(date_string)
     
     def apply_business_logic(self, column_name, column_data, inferred_type):
         """ビジネスロジックによる型判定"""
@@ -187,29 +224,11 @@ class TypeCorrectionRules:
         return None  # ビジネスロジック判定なし
     
     def normalize_sap_data(self, value):
-        """SAPデータの正規化"""
-        
-        if pd.isna(value):
-            return value
-        
-        value_str = str(value).strip()
-        
-        # 後ろマイナスの処理
-        minus_match = re.match(self._rules_data['sap_patterns']['trailing_minus'], value_str)
-        if minus_match:
-            return f"-{minus_match.group(1)}"
-        
-        # ゼロパディングの処理（ただしコードフィールドは除く）
-        zero_match = re.match(self._rules_data['sap_patterns']['zero_padding'], value_str)
-        if zero_match and len(value_str) > 3:  # 3桁以上のゼロパディングのみ
-            return zero_match.group(1)
-        
-        # カンマ小数点の処理
-        comma_match = re.match(self._rules_data['sap_patterns']['decimal_comma'], value_str)
-        if comma_match:
-            return f"{comma_match.group(1)}.{comma_match.group(2)}"
+        """SAPデータの正規化（後ろマイナス・ゼロパディング・カンマ小数点）
         
-        return value_str
+        チャンク単位の一括処理はsap_normalizer.SapNormalizerを使用する
+        """
+        return self._sap_normalizer.normalize_value(value)
     
     def correct_type(self, file_name, column_name, column_data, original_inferred_type):
         """総合的な型修正判定"""
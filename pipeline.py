@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+パイプラインスケジューラ（main.py pipeline）
+analyze → T002PatternFixer → T002RuleApplier → RuleIntegrationManager → load を、
+入力・出力を宣言したステージのDAGとして実行する。
+
+- 各ステージの入力（データファイル・pattern_rules.json・t002_loader_updates.json・
+  column_master・ルールストア）のフィンガープリントを pipeline_state テーブルに記録し、
+  前回実行時から入力が変わったステージだけを実行する
+- analyze / load はファイル単位で判定し、入力が変わったファイルだけを処理する
+  （column_master・t002_loader_updates.json はそのファイルに関係する行だけを比較する）
+- 依存関係のないステージは並列に実行する。ただし同じ出力を書くステージは同時に実行しない
+- pattern_rules_data.json のルールはルールストア（master.db）に移行済みのため、
+  ルールストアの内容をフィンガープリントに使う
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import CANDIDATE_CSV, DATA_DIR, DB_FILE, PIPELINE_WORKERS
+from compressed_input import is_compressed, list_members
+from excel_reader import split_logical_name
+from ingest_daemon import scan_directory
+
+PATTERN_RULES_FILE = "pattern_rules.json"
+LOADER_UPDATES_FILE = "t002_loader_updates.json"
+
+
+def _digest(value: Any) -> str:
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+# --- 入力・出力（アーティファクト） ---
+
+class Artifact:
+    """ステージの入力・出力。fingerprint() は全体、fingerprints_by_file() は論理ファイル別"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def fingerprint(self) -> str:
+        raise NotImplementedError
+
+    def fingerprints_by_file(self) -> Optional[Dict[str, str]]:
+        """論理ファイル名 → フィンガープリント（ファイル単位に分けられない入力はNone）"""
+        return None
+
+
+class JsonFileArtifact(Artifact):
+    """JSONファイル。生成日時などの変動するキーは除いて比較する"""
+
+    FILE_KEYS = ('file', 'file_name')
+
+    def __init__(self, path: str, ignore_keys: Sequence[str] = ('summary', 'generated_at')):
+        super().__init__(path)
+        self.path = path
+        self.ignore_keys = set(ignore_keys)
+
+    def _load(self) -> Any:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _strip(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: self._strip(v) for k, v in value.items() if k not in self.ignore_keys}
+        if isinstance(value, list):
+            return [self._strip(v) for v in value]
+        return value
+
+    def fingerprint(self) -> str:
+        return _digest(self._strip(self._load()))
+
+    def fingerprints_by_file(self) -> Dict[str, str]:
+        """ファイル名を持つ要素（修正ルール・オーバーライド）をファイルごとにまとめる"""
+        by_file: Dict[str, List[Any]] = {}
+
+        def walk(value):
+            if isinstance(value, dict):
+                file_name = next((value[k] for k in self.FILE_KEYS if isinstance(value.get(k), str)), None)
+                if file_name is not None:
+                    by_file.setdefault(file_name, []).append(self._strip(value))
+                    return
+                for v in value.values():
+                    walk(v)
+            elif isinstance(value, list):
+                for v in value:
+                    walk(v)
+
+        walk(self._load())
+        return {name: _digest(sorted(items, key=_digest)) for name, items in by_file.items()}
+
+
+class ColumnMasterArtifact(Artifact):
+    """column_master テーブル。columns を指定した場合はファイル名とその列だけ"""
+
+    def __init__(self, db_file: str, columns: Optional[Sequence[str]] = None):
+        super().__init__('column_master' if columns is None else f"column_master:{','.join(columns)}")
+        self.db_file = db_file
+        self.columns = columns
+
+    def _rows(self) -> List[Tuple]:
+        conn = sqlite3.connect(self.db_file)
+        try:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'column_master'").fetchone():
+                return []
+            selected = '*' if self.columns is None else ', '.join(['file_name', *self.columns])
+            return conn.execute(f"SELECT {selected} FROM column_master ORDER BY file_name, column_name").fetchall()
+        finally:
+            conn.close()
+
+    def fingerprint(self) -> str:
+        return _digest(self._rows())
+
+    def fingerprints_by_file(self) -> Dict[str, str]:
+        by_file: Dict[str, List[Tuple]] = {}
+        for row in self._rows():
+            by_file.setdefault(row[0], []).append(row)
+        return {name: _digest(rows) for name, rows in by_file.items()}
+
+
+class RuleStoreArtifact(Artifact):
+    """ルールストア（GUIで編集するパターンルール）。keys を指定した場合はそのカテゴリだけ"""
+
+    def __init__(self, db_file: str, keys: Optional[Sequence[str]] = None):
+        super().__init__('rule_store' if keys is None else f"rule_store:{','.join(keys)}")
+        self.db_file = db_file
+        self.keys = keys
+
+    def fingerprint(self) -> str:
+        from rule_store import current_rules_data
+        data = current_rules_data(self.db_file)
+        if self.keys is not None:
+            data = {k: data.get(k) for k in self.keys}
+        return _digest(data)
+
+
+# --- ステージ ---
+
+class Stage:
+    """パイプラインの1ステージ
+
+    Args:
+        run: per_file=False の場合は run()、True の場合は run(files)（files=None は全ファイル）。
+             run(files) が失敗したファイル名を返した場合、そのファイルは記録せず次回も実行する
+        after: 先に完了している必要があるステージ名
+        per_file: データファイル単位で差分実行するステージか
+    """
+
+    def __init__(self, name: str, inputs: Sequence[Artifact], outputs: Sequence[str],
+                 run: Callable, after: Sequence[str] = (), per_file: bool = False):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = set(outputs)
+        self.run = run
+        self.after = list(after)
+        self.per_file = per_file
+
+
+class Pipeline:
+    """ステージのDAGを、入力が変わったものだけ実行する"""
+
+    def __init__(self, stages: Sequence[Stage], data_dir: str = DATA_DIR, db_file: str = DB_FILE,
+                 workers: int = PIPELINE_WORKERS):
+        self.stages = {stage.name: stage for stage in stages}
+        self.data_dir = data_dir
+        self.db_file = db_file
+        self.workers = workers
+        for stage in stages:
+            for dep in stage.after:
+                if dep not in self.stages:
+                    raise ValueError(f"不明な依存ステージ: {stage.name} → {dep}")
+        self._order = self._topological_order()
+        self._init_tables()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"ステージの依存関係が循環しています: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].after:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    # --- 実行状態 ---
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _init_tables(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pipeline_state (
+                    stage TEXT,
+                    file_name TEXT,
+                    fingerprint TEXT,
+                    finished_at DATETIME,
+                    PRIMARY KEY (stage, file_name)
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _stored(self, stage: str) -> Dict[str, str]:
+        """記録済みフィンガープリント（ファイル単位でないステージは file_name = ''）"""
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT file_name, fingerprint FROM pipeline_state WHERE stage = ?", (stage,)))
+        finally:
+            conn.close()
+
+    def _record(self, stage: str, fingerprints: Dict[str, str], keep: Optional[Iterable[str]] = None) -> None:
+        """フィンガープリントを記録（keep を指定した場合はそれ以外のファイルの記録を削除）"""
+        finished_at = datetime.now().isoformat(timespec='seconds')
+        conn = self._connect()
+        try:
+            if keep is not None:
+                keep = set(keep)
+                stale = [(stage, name) for name in self._stored(stage) if name not in keep]
+                conn.executemany("DELETE FROM pipeline_state WHERE stage = ? AND file_name = ?", stale)
+            conn.executemany("INSERT OR REPLACE INTO pipeline_state VALUES (?, ?, ?, ?)",
+                             [(stage, name, fp, finished_at) for name, fp in fingerprints.items()])
+            conn.commit()
+        finally:
+            conn.close()
+
+    # --- フィンガープリント ---
+
+    def _physical_map(self, files: Iterable[str]) -> Dict[str, str]:
+        """圧縮ファイルのメンバー名 → 圧縮ファイル名"""
+        mapping = {}
+        for name in files:
+            if is_compressed(name):
+                try:
+                    for member_name, _ in list_members(os.path.join(self.data_dir, name)):
+                        mapping[member_name] = name
+                except Exception:
+                    continue
+        return mapping
+
+    def file_fingerprints(self, stage: Stage) -> Dict[str, str]:
+        """データファイル → そのファイルに関係する入力だけから求めたフィンガープリント"""
+        snapshot = scan_directory(self.data_dir)
+        physical = self._physical_map(snapshot)
+        parts: Dict[str, List[Any]] = {name: [list(signature)] for name, signature in snapshot.items()}
+        for artifact in stage.inputs:
+            by_file = artifact.fingerprints_by_file()
+            if by_file is None:
+                shared = artifact.fingerprint()
+                for items in parts.values():
+                    items.append(shared)
+                continue
+            grouped: Dict[str, List[Tuple[str, str]]] = {}
+            for logical_name, fp in by_file.items():
+                owner = physical.get(logical_name, split_logical_name(logical_name)[0])
+                grouped.setdefault(owner, []).append((logical_name, fp))
+            for name, items in parts.items():
+                items.append(sorted(grouped.get(name, [])))
+        return {name: _digest(items) for name, items in parts.items()}
+
+    def stage_fingerprint(self, stage: Stage) -> str:
+        return _digest([(artifact.name, artifact.fingerprint()) for artifact in stage.inputs])
+
+    # --- 実行 ---
+
+    def _execute(self, stage: Stage, force: bool) -> str:
+        """ステージを実行（入力が変わっていなければスキップ）し、'ran' / 'skipped' を返す"""
+        stored = self._stored(stage.name)
+        if not stage.per_file:
+            fingerprint = self.stage_fingerprint(stage)
+            if not force and stored.get('') == fingerprint:
+                print(f"[{stage.name}] 入力に変更なし → スキップ")
+                return 'skipped'
+            print(f"[{stage.name}] 実行")
+            stage.run()
+            self._record(stage.name, {'': fingerprint})
+            return 'ran'
+
+        fingerprints = self.file_fingerprints(stage)
+        stale = sorted(name for name, fp in fingerprints.items() if force or stored.get(name) != fp)
+        if not stale:
+            print(f"[{stage.name}] 入力に変更なし → スキップ")
+            self._record(stage.name, {}, keep=fingerprints)
+            return 'skipped'
+        print(f"[{stage.name}] 実行: {len(stale)}/{len(fingerprints)}ファイル")
+        failed = set(stage.run(None if len(stale) == len(fingerprints) else stale) or ())
+        if failed:
+            print(f"[{stage.name}] 失敗したファイルは次回も実行: {', '.join(sorted(failed))}")
+        self._record(stage.name, {name: fingerprints[name] for name in stale if name not in failed},
+                     keep=fingerprints)
+        return 'ran'
+
+    def run(self, force: bool = False) -> Dict[str, str]:
+        """DAGを実行し、ステージ名 → 'ran' / 'skipped' / 'failed' / 'blocked' を返す"""
+        status: Dict[str, str] = {}
+        pending = list(self._order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while pending or running:
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in list(pending):
+                        stage = self.stages[name]
+                        if any(dep not in status for dep in stage.after):
+                            continue
+                        if any(status[dep] in ('failed', 'blocked') for dep in stage.after):
+                            print(f"[{name}] 前段のステージが失敗したため実行しません")
+                            status[name] = 'blocked'
+                        elif any(stage.outputs & other.outputs for other in running.values()):
+                            continue  # 同じ出力を書くステージの完了を待つ
+                        else:
+                            running[executor.submit(self._execute, stage, force)] = stage
+                        pending.remove(name)
+                        progressed = True
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        status[stage.name] = future.result()
+                    except Exception as e:
+                        print(f"[{stage.name}] 失敗: {e}")
+                        status[stage.name] = 'failed'
+        return status
+
+
+# --- 既定のパイプライン ---
+
+def _analyze(files: Optional[List[str]]) -> List[str]:
+    from analyzer import analyze_files
+    failed: List[str] = []
+    analyze_files(DATA_DIR, CANDIDATE_CSV, DB_FILE, file_names=files, failed_files=failed)
+    return failed
+
+
+def _pattern_fix() -> None:
+    from t002_pattern_fixer import T002PatternFixer
+    T002PatternFixer(DB_FILE).save_fix_rules(PATTERN_RULES_FILE)
+
+
+def _rule_apply() -> None:
+    from t002_rule_applier import T002RuleApplier
+    # 再ロードは load ステージがファイル単位の差分で行う
+    T002RuleApplier(PATTERN_RULES_FILE).run_incremental_application(reload=False)
+
+
+def _sync_rules(pending: List[Any]) -> None:
+    from t003_rule_integration import RuleIntegrationManager
+    delta = RuleIntegrationManager().write_loader_updates()
+    if delta is None:
+        raise RuntimeError(f"{LOADER_UPDATES_FILE} の更新に失敗しました")
+    pending.append(delta)
+
+
+def _load(files: Optional[List[str]], pending: List[Any], db_file: str) -> List[str]:
+    from loader import includes_any, load_and_compare
+    from rule_versioning import RuleVersionStore
+    failed = load_and_compare(target_files=files)
+    # sync_rules で書き出した差分は、影響ファイルを load で再ロードした後に適用済みにする
+    # （影響ファイルのロードに失敗した差分は未適用のまま残し、sync_rules で再ロードできるようにする）
+    store = RuleVersionStore(db_file)
+    while pending:
+        delta = pending.pop(0)
+        if includes_any(failed, delta.affected_files):
+            print(f"[load] ロードに失敗したファイルがあるためルール差分を未適用のままにします ({delta.summary()})")
+        else:
+            store.mark_applied(delta)
+    return failed
+
+
+def build_default_pipeline(data_dir: str = DATA_DIR, db_file: str = DB_FILE) -> Pipeline:
+    column_master = ColumnMasterArtifact(db_file)
+    pattern_rules = JsonFileArtifact(PATTERN_RULES_FILE)
+    loader_updates = JsonFileArtifact(LOADER_UPDATES_FILE)
+    # rule_apply は data_type だけを書き換えるため、pattern_fix・sync_rules の入力には含めない
+    # （含めるとルールが変わった次の実行で両ステージがもう一度実行される）
+    inferred_columns = ColumnMasterArtifact(db_file, ['column_name', 'initial_inferred_type'])
+    column_names = ColumnMasterArtifact(db_file, ['column_name'])
+    synced_deltas: List[Any] = []
+    stages = [
+        Stage('analyze', [RuleStoreArtifact(db_file)], ['column_master'], _analyze, per_file=True),
+        Stage('pattern_fix', [inferred_columns], [PATTERN_RULES_FILE], _pattern_fix, after=['analyze']),
+        Stage('rule_apply', [pattern_rules], ['column_master', LOADER_UPDATES_FILE], _rule_apply,
+              after=['pattern_fix']),
+        Stage('sync_rules', [RuleStoreArtifact(db_file), column_names], [LOADER_UPDATES_FILE],
+              lambda: _sync_rules(synced_deltas), after=['analyze']),
+        Stage('load', [column_master, loader_updates, RuleStoreArtifact(db_file, ['sap_patterns'])], ['tables'],
+              lambda files: _load(files, synced_deltas, db_file), after=['rule_apply', 'sync_rules'],
+              per_file=True),
+    ]
+    return Pipeline(stages, data_dir, db_file)
+
+
+def run_pipeline(force: bool = False) -> Dict[str, str]:
+    os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+    status = build_default_pipeline().run(force=force)
+    print("=== パイプライン実行結果 ===")
+    for name, result in status.items():
+        print(f"  {name}: {result}")
+    return status
+
+
+if __name__ == "__main__":
+    import sys
+    run_pipeline(force='--force' in sys.argv[1:])
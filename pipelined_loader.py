@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+パイプライン型ロード
+1ファイルのロードを「読み込み → 解析・型変換 → SQLite書き込み」の3段に分け、段の間を
+上限付きキューでつないで並行に実行する。処理時間は各段の合計ではなく最も遅い段に近づく。
+
+- 読み込みスレッド: ファイル（.gz / zipメンバーは展開しながら）を LOAD_BLOCK_BYTES ごとに読み、
+  行の途中（引用符内の改行を含む）で切れないように区切ったバイト列のブロックを作る
+  引用符が閉じないまま LOAD_MAX_CARRY_BLOCKS ブロックを超えた場合は改行だけで区切る
+  Excelは openpyxl の行読み込み自体が解析のため、DataFrameのチャンクをそのまま流す
+- 解析ワーカー（LOAD_PARSE_WORKERS本）: ブロックをデコードして read_csv し、変換計画を適用
+- 書き込み: 呼び出し元のスレッド（SQLite接続を持つスレッド）がブロック順に書き込む
+- キューが満杯になると前段は待つ（メモリ使用量はキューの上限で頭打ちになる）
+- governor（MemoryGovernor）を指定すると、RSSが予算を超えている間は先頭以外の解析ワーカーが待つ
+- checkpoint を指定すると LOAD_CHECKPOINT_CHUNKS チャンクごとに読み込み位置を通知し、
+  resume_from で前回の位置から読み込みを再開できる（load_checkpoint 参照）
+"""
+
+import io
+import queue
+import re
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from config import (EXCEL_CHUNK_ROWS, LOAD_BLOCK_BYTES, LOAD_CHECKPOINT_CHUNKS, LOAD_MAX_CARRY_BLOCKS,
+                    LOAD_PARSE_WORKERS, LOAD_QUEUE_SIZE)
+from compressed_input import open_binary, open_text
+from excel_reader import iter_sheet_chunks
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+class InputSource:
+    """ロード対象（通常ファイル・.gz・zipメンバー・Excelシート）"""
+
+    def __init__(self, path: str, member: Optional[str] = None, sheet: Optional[str] = None,
+                 excel: bool = False, chunk_rows: int = EXCEL_CHUNK_ROWS):
+        self.path = path
+        self.member = member
+        self.sheet = sheet
+        self.excel = excel
+        self.chunk_rows = chunk_rows  # Excelの1チャンクの行数
+
+
+def _byte_splittable(encoding: str) -> bool:
+    """改行(0x0A)がそのまま行区切りになる文字コードか（UTF-16/32は不可）"""
+    return not encoding.lower().replace('_', '-').startswith(('utf-16', 'utf16', 'utf-32', 'utf32'))
+
+
+def _text(value) -> str:
+    return value.decode('latin-1') if isinstance(value, bytes) else value
+
+
+def _compile(pattern: str, like):
+    """str の正規表現を like（bytes / str）に合わせてコンパイル"""
+    return re.compile(pattern.encode('latin-1') if isinstance(like, bytes) else pattern)
+
+
+class _RowScanner:
+    """断片をまたいで引用符の状態を持ち越し、引用符の外にある改行を探す（bytes / str 共通）
+
+    read_csv と同じく、フィールドの先頭（行頭・区切り文字の直後）の " だけを引用符の開始とみなす。
+    値の途中の " （12" pipe のようなインチ記号）は文字として扱い、引用符内の "" はエスケープとする。
+    改行・引用符・区切り文字はいずれも1文字。
+    """
+
+    def __init__(self, newline, quote, delimiter=None):
+        self.newline = newline
+        self.quote = quote
+        self.field_starts = (newline,) if delimiter is None else (newline, delimiter)
+        starts = ''.join(re.escape(_text(c)) for c in self.field_starts)
+        q = re.escape(_text(quote))
+        self._opening = _compile(f'{q}(?<=[{starts}]{q})', quote)  # 先頭の " で高速に検索してから直前の文字を確認
+        self._closing = _compile(f'[^{q}]*(?:{q}{q}[^{q}]*)*{q}', quote)  # 引用符の中身と閉じる引用符
+        self.reset()
+
+    def reset(self) -> None:
+        self.in_quote = False
+        self.quote_pending = False  # 引用符内の " が断片の末尾にあった（次が " ならエスケープ）
+        self.previous = self.newline  # 直前の文字（先頭は行頭扱い）
+
+    def last_newline(self, data) -> int:
+        """data（前の断片の続き）の中で、引用符の外にある最後の改行の位置（なければ -1）"""
+        cut = -1
+        pos = 0
+        size = len(data)
+        if self.quote_pending:
+            self.quote_pending = False
+            if data[:1] == self.quote:
+                pos = 1
+            else:
+                self.in_quote = False
+        while pos < size:
+            if self.in_quote:
+                m = self._closing.match(data, pos)
+                if m is None:
+                    break
+                pos = m.end()
+                if pos == size:
+                    self.quote_pending = True
+                elif data[pos:pos + 1] == self.quote:
+                    pos += 1  # "" のエスケープ
+                else:
+                    self.in_quote = False
+                continue
+            if pos == 0 and data[:1] == self.quote and self.previous in self.field_starts:
+                opening = 0
+            else:
+                m = self._opening.search(data, pos)
+                opening = -1 if m is None else m.start()
+            newline = data.rfind(self.newline, pos, size if opening < 0 else opening)
+            if newline >= 0:
+                cut = newline
+            if opening < 0:
+                break
+            self.in_quote = True
+            pos = opening + 1
+        if size:
+            self.previous = data[-1:]
+        return cut
+
+
+def split_blocks(chunks: Iterable, newline, quote, delimiter=None,
+                 max_carry: Optional[int] = None) -> Iterator:
+    """読み込んだ断片を、行の途中で切れないブロックにまとめ直す（bytes / str 共通）
+
+    引用符が閉じないまま持ち越しが max_carry を超えた場合は、その引用符を文字とみなして
+    改行だけで区切る（メモリ使用量を抑えるため）。
+    """
+    scanner = _RowScanner(newline, quote, delimiter)
+    carry = []  # 前の断片から持ち越した行の途中
+    carried = 0
+    for chunk in chunks:
+        cut = scanner.last_newline(chunk)
+        if cut < 0:
+            carry.append(chunk)
+            carried += len(chunk)
+            if max_carry is None or carried <= max_carry:
+                continue
+            data = chunk[:0].join(carry)
+            cut = data.rfind(newline)
+            if cut < 0:
+                carry = [data]
+                continue
+            print(f"警告: 引用符が閉じないまま持ち越しが上限（{max_carry}）を超えたため、改行で区切ります")
+            carry = [data[cut + 1:]]
+            carried = len(carry[0])
+            scanner.reset()
+            scanner.last_newline(carry[0])
+            yield data[:cut + 1]
+            continue
+        yield chunk[:0].join(carry + [chunk[:cut + 1]])
+        carry = [chunk[cut + 1:]]
+        carried = len(carry[0])
+    if carried:
+        yield carry[0][:0].join(carry)
+
+
+def _skip_text(f, count: int, size: int) -> None:
+    """テキストストリームを count 文字読み飛ばす"""
+    while count > 0:
+        skipped = len(f.read(min(count, size)))
+        if not skipped:
+            break
+        count -= skipped
+
+
+def read_blocks(source: InputSource, encoding: Optional[str], block_bytes: int = LOAD_BLOCK_BYTES,
+                start: Optional[int] = None, delimiter: Optional[str] = None) -> Iterator[Tuple[object, int]]:
+    """ヘッダー行を除いたデータ部分を (ブロック, ブロック末尾の読み込み位置) で返す
+
+    ブロックは bytes / str / DataFrame（Excel）。start を指定した場合はその位置から読む。
+    """
+    if source.excel:
+        position = 0
+        for chunk in iter_sheet_chunks(source.path, source.sheet, chunksize=source.chunk_rows):
+            if start is not None and position + len(chunk) <= start:
+                position += len(chunk)
+                continue
+            if start is not None and position < start:
+                chunk = chunk.iloc[start - position:].reset_index(drop=True)
+                position = start
+            position += len(chunk)
+            yield chunk, position
+        return
+    max_carry = block_bytes * LOAD_MAX_CARRY_BLOCKS
+    if _byte_splittable(encoding):
+        with open_binary(source.path, source.member) as f:
+            position = len(f.readline())  # ヘッダー
+            if start is not None and start > position:
+                f.seek(start)  # .gz / zipメンバーは展開しながら読み飛ばす
+                position = start
+            separator = delimiter.encode(encoding) if delimiter else None
+            for block in split_blocks(iter(lambda: f.read(block_bytes), b''), b'\n', b'"', separator, max_carry):
+                position += len(block)
+                yield block, position
+    else:
+        with open_text(source.path, encoding, source.member) as f:
+            position = len(f.readline())
+            if start is not None and start > position:
+                _skip_text(f, start - position, block_bytes)
+                position = start
+            for block in split_blocks(iter(lambda: f.read(block_bytes // 2), ''), '\n', '"', delimiter,
+                                      max_carry // 2):
+                position += len(block)
+                yield block, position
+
+
+def parse_block(block, columns: Sequence[str], encoding: Optional[str], delimiter: Optional[str]) -> pd.DataFrame:
+    """ブロックを文字列のDataFrameに変換（列名はサンプル解析時のものを使う）"""
+    if isinstance(block, pd.DataFrame):
+        if len(block.columns) == len(columns):
+            block.columns = list(columns)
+        return block
+    text = block.decode(encoding) if isinstance(block, bytes) else block
+    return pd.read_csv(io.StringIO(text), sep=delimiter, header=None, names=list(columns), index_col=False,
+                       dtype=str, na_filter=False)
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """停止されるまで待ちながらキューに入れる（停止された場合はFalse）"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    """停止されるまで待ちながらキューから取り出す（停止された場合は _DONE）"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def load_pipelined(source: InputSource, columns: Sequence[str], encoding: Optional[str], delimiter: Optional[str],
+                   convert: Callable[[pd.DataFrame], pd.DataFrame],
+                   write: Callable[[pd.DataFrame, bool], None],
+                   max_rows: Optional[int] = None,
+                   workers: int = LOAD_PARSE_WORKERS,
+                   queue_size: int = LOAD_QUEUE_SIZE,
+                   block_bytes: int = LOAD_BLOCK_BYTES,
+                   resume_from: Optional[Tuple[int, int]] = None,
+                   checkpoint: Optional[Callable[[int, int], None]] = None,
+                   checkpoint_every: int = LOAD_CHECKPOINT_CHUNKS,
+                   governor=None) -> int:
+    """ファイル全体を並行にロードし、テーブルの行数を返す
+
+    Args:
+        convert: 文字列のDataFrameを型変換する関数（解析ワーカーで実行）
+        write: write(df, first) でチャンクを書き込む関数（呼び出し元スレッドで実行。
+               first=True のときはテーブルを作り直す）
+        max_rows: ロードする行数の上限（Noneは全行）
+        resume_from: 前回の (読み込み位置, 書き込み済み行数)。指定した場合はテーブルを作り直さずに追記する
+        checkpoint: checkpoint(読み込み位置, 行数) を checkpoint_every チャンクごとに呼ぶ（コミットは呼び出し側）
+        governor: MemoryGovernor。RSSが予算を超えている間は先頭以外のワーカーが新しいブロックを取らない
+    """
+    blocks: queue.Queue = queue.Queue(maxsize=queue_size)
+    typed: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    read_done = threading.Event()
+    errors: List[BaseException] = []
+
+    def fail(e: BaseException) -> None:
+        errors.append(e)
+        stop.set()
+
+    def reader() -> None:
+        try:
+            start = resume_from[0] if resume_from else None
+            for seq, (block, position) in enumerate(read_blocks(source, encoding, block_bytes, start, delimiter)):
+                if not _put(blocks, (seq, block, position), stop):
+                    return
+        except BaseException as e:
+            fail(e)
+        finally:
+            read_done.set()
+            for _ in range(workers):
+                if not _put(blocks, _DONE, stop):
+                    break
+
+    def parser(slot: int) -> None:
+        try:
+            while True:
+                if slot > 0 and governor is not None:
+                    # 予算超過中は先頭のワーカーだけで処理を続ける（読み込みが終われば残りを片付ける）
+                    while not stop.is_set() and not read_done.is_set() and governor.over_budget():
+                        stop.wait(_POLL_SECONDS)
+                item = _get(blocks, stop)
+                if item is _DONE:
+                    break
+                seq, block, position = item
+                df = convert(parse_block(block, columns, encoding, delimiter))
+                if not _put(typed, (seq, df, position), stop):
+                    return
+        except BaseException as e:
+            fail(e)
+        finally:
+            _put(typed, _DONE, stop)
+
+    threads = [threading.Thread(target=reader, name='load-reader', daemon=True)]
+    threads += [threading.Thread(target=parser, args=(i,), name=f'load-parser-{i}', daemon=True)
+                for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    # 書き込み（ブロック順に並べ直してから書く）
+    written = resume_from[1] if resume_from else 0
+    created = resume_from is not None
+    pending = {}
+    next_seq = 0
+    finished_workers = 0
+    try:
+        while finished_workers < workers and not stop.is_set():
+            item = _get(typed, stop)
+            if item is _DONE:
+                finished_workers += 1
+                continue
+            seq, df, position = item
+            pending[seq] = (df, position)
+            while next_seq in pending:
+                df, position = pending.pop(next_seq)
+                next_seq += 1
+                if max_rows is not None:
+                    df = df.iloc[:max_rows - written]
+                write(df, not created)
+                created = True
+                written += len(df)
+                if max_rows is not None and written >= max_rows:
+                    stop.set()  # 上限に達したので読み込み・解析を打ち切る
+                    break
+                if checkpoint is not None and next_seq % checkpoint_every == 0:
+                    checkpoint(position, written)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    if not created:
+        # データ行がない場合も列だけのテーブルを作る
+        write(convert(pd.DataFrame(columns=list(columns), dtype=object)), True)
+    return written
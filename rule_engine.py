@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+SQLプッシュダウン型ルール評価エンジン
+T002の問題パターン（宣言的な条件定義）をSQLに変換してSQLite内で評価し、
+一致した行だけを取り出す
+
+条件定義（dict）のキー:
+    inferred_types: 初期推定型（initial_inferred_type）の候補。None は NULL を表す
+    actual_types:   現在の型（data_type）の候補
+    files:          対象ファイル名の一覧
+    file_regex:     ファイル名の正規表現（REGEXP関数で評価）
+    column_regex:   列名の正規表現（REGEXP関数で評価）
+"""
+
+import re
+import sqlite3
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+# 取得列は T002PatternFixer.load_compare_report と同じ名前にそろえる
+SELECT_COLUMNS = """
+    SELECT file_name AS File, column_name AS Column,
+           initial_inferred_type AS Inferred_Type, data_type AS Actual_Type
+    FROM column_master
+"""
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern: str):
+    return re.compile(pattern)
+
+
+def regexp(pattern: str, value: Any) -> bool:
+    """SQLiteの `value REGEXP pattern` 用（部分一致: re.search）"""
+    if value is None:
+        return False
+    return _compile(pattern).search(str(value)) is not None
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    """REGEXP関数を登録"""
+    conn.create_function("REGEXP", 2, regexp, deterministic=True)
+
+
+def _in_clause(column: str, values: List[Any], params: List[Any]) -> str:
+    """IN句を生成（None は IS NULL として扱う）"""
+    clauses = []
+    non_null = [v for v in values if v is not None]
+    if non_null:
+        clauses.append(f"{column} IN ({', '.join('?' for _ in non_null)})")
+        params.extend(non_null)
+    if len(non_null) != len(values):
+        clauses.append(f"{column} IS NULL")
+    return "(" + " OR ".join(clauses) + ")"
+
+
+def compile_query(spec: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """条件定義をSQLとパラメータに変換"""
+    conditions = []
+    params: List[Any] = []
+
+    if spec.get("inferred_types") is not None:
+        conditions.append(_in_clause("initial_inferred_type", spec["inferred_types"], params))
+    if spec.get("actual_types") is not None:
+        conditions.append(_in_clause("data_type", spec["actual_types"], params))
+    if spec.get("files") is not None:
+        conditions.append(_in_clause("file_name", spec["files"], params))
+    if spec.get("file_regex"):
+        conditions.append("file_name REGEXP ?")
+        params.append(spec["file_regex"])
+    if spec.get("column_regex"):
+        conditions.append("column_name REGEXP ?")
+        params.append(spec["column_regex"])
+
+    sql = SELECT_COLUMNS
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY file_name, column_name"
+    return sql, params
+
+
+class RuleEngine:
+    """column_master に対して条件定義を評価するクラス"""
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file)
+        # 型条件での絞り込み用インデックス（idx_column_master_types）は column_master の初期化時に作成済み
+        register_functions(conn)
+        return conn
+
+    def fetch(self, spec: Dict[str, Any]) -> List[Tuple]:
+        """一致した行を (File, Column, Inferred_Type, Actual_Type) のタプルで返す"""
+        sql, params = compile_query(spec)
+        conn = self.connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def fetch_frame(self, spec: Dict[str, Any]) -> pd.DataFrame:
+        """一致した行をDataFrameで返す"""
+        sql, params = compile_query(spec)
+        conn = self.connect()
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
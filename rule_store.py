@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+ルールストア
+パターンルール（未登録ファイル・日付パターン・ビジネスロジック・SAPパターン）を
+master.db のテーブルで管理する
+
+- 1ルール = 1行。追加・編集・削除は行単位のトランザクションで行い、
+  複数のStreamlitセッションが同時に編集しても互いの変更を上書きしない
+- 変更のたびにバージョンカウンタを進める。TypeCorrectionRules はカウンタが
+  動いたときだけルールを読み直す
+- pattern_rules_data.json と同じ形式でインポート・エクスポートできる
+"""
+
+import copy
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import DB_FILE
+
+DEFAULT_RULES_FILE = "pattern_rules_data.json"
+
+# キーワード・パターンの一覧として持つカテゴリ（値はキーそのもの）
+LIST_CATEGORIES = ['datetime_patterns', 'code_fields', 'amount_fields', 'quantity_fields']
+# 名前 -> 設定 の辞書として持つカテゴリ
+MAP_CATEGORIES = ['unregistered_files', 'sap_patterns']
+BUSINESS_LOGIC_CATEGORIES = ['code_fields', 'amount_fields', 'quantity_fields']
+CATEGORIES = LIST_CATEGORIES + MAP_CATEGORIES
+
+# snapshot() のキャッシュ: DBファイル -> ((バージョン, 更新日時), ルールデータ)
+_snapshot_cache: Dict[str, Tuple[Tuple[int, str], Dict[str, Any]]] = {}
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def flatten_rules_data(rules_data: Dict[str, Any]) -> List[Tuple[str, str, Any]]:
+    """JSON形式のルールデータを (カテゴリ, キー, 値) の行に展開"""
+    rows = []
+    for pattern in rules_data.get('datetime_patterns', []):
+        rows.append(('datetime_patterns', pattern, None))
+    business_rules = rules_data.get('business_logic_rules', {})
+    for category in BUSINESS_LOGIC_CATEGORIES:
+        for keyword in business_rules.get(category, []):
+            rows.append((category, keyword, None))
+    for category in MAP_CATEGORIES:
+        for key, value in rules_data.get(category, {}).items():
+            rows.append((category, key, value))
+    return rows
+
+
+class RuleStore:
+    """パターンルールを master.db で管理するクラス"""
+
+    def __init__(self, db_file: str = DB_FILE):
+        self.db_file = db_file
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rule_store_entries (
+                    category TEXT,
+                    rule_key TEXT,
+                    rule_value TEXT,
+                    position INTEGER,
+                    created_at DATETIME,
+                    updated_at DATETIME,
+                    PRIMARY KEY (category, rule_key)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rule_store_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL,
+                    updated_at DATETIME
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO rule_store_version (id, version, updated_at) VALUES (1, 0, ?)",
+                         (_now(),))
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # トランザクションは _transaction() で明示的に開始する
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """書き込みトランザクション（BEGIN IMMEDIATEで他セッションの書き込みと直列化）"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection) -> None:
+        conn.execute("UPDATE rule_store_version SET version = version + 1, updated_at = ? WHERE id = 1",
+                     (_now(),))
+
+    @staticmethod
+    def _check_category(category: str) -> None:
+        if category not in CATEGORIES:
+            raise ValueError(f"不明なルールカテゴリ: {category}")
+
+    # --- 読み込み ---
+
+    def version(self) -> int:
+        """バージョンカウンタ（ルールが変更されるたびに増える）"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT version FROM rule_store_version WHERE id = 1").fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+    def is_empty(self) -> bool:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT 1 FROM rule_store_entries LIMIT 1").fetchone() is None
+        finally:
+            conn.close()
+
+    def entries(self, category: str) -> List[Tuple[str, Any]]:
+        """カテゴリ内のルールを登録順に (キー, 値) で取得"""
+        self._check_category(category)
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT rule_key, rule_value FROM rule_store_entries
+                WHERE category = ? ORDER BY position, rule_key
+            """, (category,)).fetchall()
+        finally:
+            conn.close()
+        return [(key, json.loads(value) if value is not None else None) for key, value in rows]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """全ルールを pattern_rules_data.json と同じ形式で取得（バージョンが同じならキャッシュを返す）"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            # DBを作り直した場合にカウンタが同じ値に戻ることがあるため更新日時もキーに含める
+            version = conn.execute("SELECT version, updated_at FROM rule_store_version WHERE id = 1").fetchone()
+            cached = _snapshot_cache.get(self.db_file)
+            if cached and cached[0] == version:
+                conn.execute("COMMIT")
+                return copy.deepcopy(cached[1])
+            rows = conn.execute("""
+                SELECT category, rule_key, rule_value FROM rule_store_entries
+                ORDER BY category, position, rule_key
+            """).fetchall()
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        data: Dict[str, Any] = {
+            'unregistered_files': {},
+            'datetime_patterns': [],
+            'business_logic_rules': {category: [] for category in BUSINESS_LOGIC_CATEGORIES},
+            'sap_patterns': {},
+        }
+        for category, key, value in rows:
+            if category == 'datetime_patterns':
+                data['datetime_patterns'].append(key)
+            elif category in BUSINESS_LOGIC_CATEGORIES:
+                data['business_logic_rules'][category].append(key)
+            elif category in MAP_CATEGORIES:
+                data[category][key] = json.loads(value) if value is not None else None
+
+        _snapshot_cache[self.db_file] = (version, data)
+        return copy.deepcopy(data)
+
+    # --- 行単位の編集 ---
+
+    def add(self, category: str, key: str, value: Any = None) -> bool:
+        """ルールを追加（既に存在する場合はFalse）"""
+        self._check_category(category)
+        now = _now()
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                INSERT OR IGNORE INTO rule_store_entries
+                    (category, rule_key, rule_value, position, created_at, updated_at)
+                SELECT ?, ?, ?, COALESCE(MAX(position), -1) + 1, ?, ?
+                FROM rule_store_entries WHERE category = ?
+            """, (category, key, self._dump(value), now, now, category))
+            if cursor.rowcount:
+                self._bump_version(conn)
+        return cursor.rowcount > 0
+
+    def update(self, category: str, key: str, new_key: Optional[str] = None, value: Any = None) -> bool:
+        """ルールを更新（キーの変更も可。対象がない・変更先キーが既存の場合はFalse）
+
+        value を省略した場合は値を変えない（キーの変更だけ）。
+        """
+        self._check_category(category)
+        new_key = key if new_key is None else new_key
+        with self._transaction() as conn:
+            if new_key != key and conn.execute(
+                    "SELECT 1 FROM rule_store_entries WHERE category = ? AND rule_key = ?",
+                    (category, new_key)).fetchone():
+                return False
+            cursor = conn.execute("""
+                UPDATE rule_store_entries SET rule_key = ?, rule_value = COALESCE(?, rule_value), updated_at = ?
+                WHERE category = ? AND rule_key = ?
+            """, (new_key, self._dump(value), _now(), category, key))
+            if cursor.rowcount:
+                self._bump_version(conn)
+        return cursor.rowcount > 0
+
+    def delete(self, category: str, key: str) -> bool:
+        """ルールを削除（対象がない場合はFalse）"""
+        self._check_category(category)
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM rule_store_entries WHERE category = ? AND rule_key = ?",
+                                  (category, key))
+            if cursor.rowcount:
+                self._bump_version(conn)
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _dump(value: Any) -> Optional[str]:
+        return json.dumps(value, ensure_ascii=False) if value is not None else None
+
+    # --- JSONとのインポート・エクスポート ---
+
+    def import_rules_data(self, rules_data: Dict[str, Any]) -> int:
+        """JSON形式のルールデータで全件を置き換え、取り込んだ件数を返す"""
+        now = _now()
+        rows = flatten_rules_data(rules_data)
+        positions: Dict[str, int] = {}
+        records = []
+        for category, key, value in rows:
+            position = positions.get(category, 0)
+            positions[category] = position + 1
+            records.append((category, key, self._dump(value), position, now, now))
+
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM rule_store_entries")
+            conn.executemany("""
+                INSERT OR IGNORE INTO rule_store_entries
+                    (category, rule_key, rule_value, position, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, records)
+            self._bump_version(conn)
+        return len(records)
+
+    def import_json(self, rules_file: str = DEFAULT_RULES_FILE) -> int:
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            return self.import_rules_data(json.load(f))
+
+    def export_json(self, rules_file: str = DEFAULT_RULES_FILE) -> None:
+        """現在のルールを pattern_rules_data.json 形式で書き出す"""
+        tmp_path = f"{rules_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, rules_file)
+
+
+def current_rules_data(db_file: str = DB_FILE, rules_file: str = DEFAULT_RULES_FILE) -> Dict[str, Any]:
+    """現在有効なルールデータ（ストアが空ならJSONファイル、どちらもなければ空）"""
+    store = RuleStore(db_file)
+    if not store.is_empty():
+        return store.snapshot()
+    if os.path.exists(rules_file):
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
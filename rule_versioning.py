@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+ルールのバージョン管理
+各ルール（pattern_rules.json の修正ルール、t002_loader_updates.json のオーバーライド）に
+内容ハッシュを付与し、適用日時とともに rule_versions テーブルへ記録する。
+前回適用時との差分から、再変換・再ロードが必要な (ファイル, 列) だけを特定する。
+修正ルールを適用する前の列の型は rule_previous_types テーブルに残し、ルール削除時に戻す。
+"""
+
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import DB_FILE
+
+
+def rule_target(rule: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """ルールの対象 (ファイル名, 列名) を取得（修正ルール・オーバーライド両形式に対応）"""
+    return (rule.get('file_name', rule.get('file')),
+            rule.get('field_name', rule.get('field')))
+
+
+def rule_hash(rule: Dict) -> str:
+    """ルール内容のハッシュ（キー順に依存しない）"""
+    payload = json.dumps(rule, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class RuleDelta:
+    """前回適用時からのルール差分"""
+
+    def __init__(self, source: str, added: Dict[str, Dict], removed: Dict[str, Dict]):
+        self.source = source
+        self.added = added      # ハッシュ -> 新規（または内容が変わった）ルール
+        self.removed = removed  # ハッシュ -> 削除された（または内容が変わる前の）ルール
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.added and not self.removed
+
+    @property
+    def affected_pairs(self) -> Set[Tuple[str, str]]:
+        return {rule_target(rule) for rule in list(self.added.values()) + list(self.removed.values())}
+
+    @property
+    def affected_files(self) -> List[str]:
+        return sorted({file_name for file_name, _ in self.affected_pairs if file_name})
+
+    def summary(self) -> str:
+        return f"追加/変更 {len(self.added)}件, 削除 {len(self.removed)}件, 影響ファイル {len(self.affected_files)}件"
+
+
+class RuleVersionStore:
+    """適用済みルールのハッシュを master.db に保存するクラス"""
+
+    def __init__(self, db_file: str = DB_FILE):
+        self.db_file = db_file
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rule_versions (
+                    source TEXT,
+                    rule_hash TEXT,
+                    file_name TEXT,
+                    column_name TEXT,
+                    payload TEXT,
+                    applied_at DATETIME,
+                    PRIMARY KEY (source, rule_hash)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rule_previous_types (
+                    source TEXT,
+                    file_name TEXT,
+                    column_name TEXT,
+                    previous_type TEXT,
+                    PRIMARY KEY (source, file_name, column_name)
+                )
+            """)
+
+    def applied_rules(self, source: str) -> Dict[str, Dict]:
+        """適用済みルールを {ハッシュ: ルール} で取得"""
+        with sqlite3.connect(self.db_file) as conn:
+            rows = conn.execute(
+                "SELECT rule_hash, payload FROM rule_versions WHERE source = ?", (source,)
+            ).fetchall()
+        return {h: json.loads(payload) for h, payload in rows}
+
+    def compute_delta(self, source: str, rules: Iterable[Dict]) -> RuleDelta:
+        """現在のルール一覧と適用済みルールの差分を計算"""
+        current = {rule_hash(rule): rule for rule in rules}
+        applied = self.applied_rules(source)
+        added = {h: rule for h, rule in current.items() if h not in applied}
+        removed = {h: rule for h, rule in applied.items() if h not in current}
+        return RuleDelta(source, added, removed)
+
+    def mark_applied(self, delta: RuleDelta) -> None:
+        """差分を適用済みとして記録"""
+        applied_at = datetime.now().isoformat(timespec='seconds')
+        with sqlite3.connect(self.db_file) as conn:
+            conn.executemany(
+                "DELETE FROM rule_versions WHERE source = ? AND rule_hash = ?",
+                [(delta.source, h) for h in delta.removed]
+            )
+            conn.executemany("""
+                INSERT OR REPLACE INTO rule_versions (source, rule_hash, file_name, column_name, payload, applied_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (delta.source, h, *rule_target(rule), json.dumps(rule, ensure_ascii=False), applied_at)
+                for h, rule in delta.added.items()
+            ])
+
+    def previous_types(self, source: str) -> Dict[Tuple[str, str], str]:
+        """ルール適用前の列の型を {(ファイル名, 列名): 型} で取得"""
+        with sqlite3.connect(self.db_file) as conn:
+            rows = conn.execute(
+                "SELECT file_name, column_name, previous_type FROM rule_previous_types WHERE source = ?", (source,)
+            ).fetchall()
+        return {(file_name, column_name): previous_type for file_name, column_name, previous_type in rows}
+
+    def remember_previous_types(self, source: str, types: Dict[Tuple[str, str], str]) -> None:
+        """ルール適用前の列の型を記録（記録済みの列は最初の値を残す）"""
+        with sqlite3.connect(self.db_file) as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO rule_previous_types VALUES (?, ?, ?, ?)",
+                [(source, file_name, column_name, previous_type)
+                 for (file_name, column_name), previous_type in types.items()]
+            )
+
+    def forget_previous_types(self, source: str, pairs: Iterable[Tuple[str, str]]) -> None:
+        """元の型に戻した列の記録を削除"""
+        with sqlite3.connect(self.db_file) as conn:
+            conn.executemany(
+                "DELETE FROM rule_previous_types WHERE source = ? AND file_name = ? AND column_name = ?",
+                [(source, file_name, column_name) for file_name, column_name in pairs]
+            )
+
+    def replace_all(self, source: str, rules: Iterable[Dict]) -> None:
+        """全件適用後に、適用済みルールを現在のルール一覧で置き換える"""
+        self.mark_applied(self.compute_delta(source, rules))
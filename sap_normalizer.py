@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+SAP値正規化エンジン
+pattern_rules_data.json の sap_patterns（後ろマイナス・ゼロパディング・カンマ小数点）を
+コンパイル済み正規表現でチャンク全体（pandas Series）に一括適用する
+"""
+
+import json
+import os
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+# pattern_rules.py のデフォルト値と共通
+DEFAULT_SAP_PATTERNS = {
+    'trailing_minus': r'^(\d+(?:[.,]\d+)?)-$',
+    'zero_padding': r'^0+(\d+)$',
+    'decimal_comma': r'^(-?\d+),(\d+)$'
+}
+
+# ルール名 -> 置換テンプレート（適用順）
+SAP_RULE_REPLACEMENTS = {
+    'trailing_minus': r'-\1',
+    'zero_padding': r'\1',
+    'decimal_comma': r'\1.\2'
+}
+SAP_RULE_ORDER = tuple(SAP_RULE_REPLACEMENTS)
+
+# column_master.sap_rules が未設定（NULL）の場合に数値列へ適用するルール
+DEFAULT_NUMERIC_RULES = ('trailing_minus', 'decimal_comma')
+
+# ゼロパディングは3桁超のみ対象（normalize_sap_data と同じ条件）
+ZERO_PADDING_MIN_LENGTH = 4
+
+
+def parse_rule_spec(spec: Optional[str], data_type: Optional[str]) -> Tuple[str, ...]:
+    """column_master.sap_rules の値を適用ルールのタプルに変換
+
+    - NULL: INTEGER/REAL列は DEFAULT_NUMERIC_RULES、それ以外は適用なし
+    - '' または 'none': 適用なし
+    - 'trailing_minus,decimal_comma' のようなカンマ区切り: 指定ルールのみ（適用順は固定）
+    """
+    if spec is None:
+        return DEFAULT_NUMERIC_RULES if data_type in ("INTEGER", "REAL") else ()
+    names = {name.strip() for name in spec.split(',') if name.strip()}
+    if not names or names == {'none'}:
+        return ()
+    return tuple(name for name in SAP_RULE_ORDER if name in names)
+
+
+class SapNormalizer:
+    """SAP値の一括正規化クラス"""
+
+    def __init__(self, sap_patterns: Optional[Dict[str, str]] = None):
+        patterns = dict(DEFAULT_SAP_PATTERNS)
+        patterns.update(sap_patterns or {})
+        # 値全体に一致した場合のみ置換する（末尾の $ が欠けたパターンでも部分置換しない）
+        self._compiled = {
+            name: re.compile(f"(?:{patterns[name]})$") for name in SAP_RULE_ORDER if name in patterns
+        }
+
+    @classmethod
+    def from_rules_file(cls, rules_file: str = "pattern_rules_data.json") -> "SapNormalizer":
+        """pattern_rules_data.json の sap_patterns から生成（ファイルがなければデフォルト）"""
+        if os.path.exists(rules_file):
+            try:
+                with open(rules_file, 'r', encoding='utf-8') as f:
+                    return cls(json.load(f).get('sap_patterns'))
+            except Exception as e:
+                print(f"警告: {rules_file} のsap_patterns読み込みに失敗しました: {e}")
+        return cls()
+
+    @classmethod
+    def from_rule_store(cls, db_file: Optional[str] = None) -> "SapNormalizer":
+        """ルールストア（master.db、空ならpattern_rules_data.json）の sap_patterns から生成"""
+        from rule_store import current_rules_data
+        try:
+            rules_data = current_rules_data(db_file) if db_file else current_rules_data()
+            return cls(rules_data.get('sap_patterns'))
+        except Exception as e:
+            print(f"警告: ルールストアのsap_patterns読み込みに失敗しました: {e}")
+            return cls.from_rules_file()
+
+    def normalize_series(self, series: pd.Series, rules: Iterable[str] = DEFAULT_NUMERIC_RULES) -> pd.Series:
+        """Series全体にルールを順番に適用（一致しない値は元の値のまま）"""
+        rules = [name for name in SAP_RULE_ORDER if name in set(rules) and name in self._compiled]
+        if not rules or len(series) == 0:
+            return series
+
+        original = series.astype(str)
+        values = original.str.strip()
+        for name in rules:
+            replaced = values.str.replace(self._compiled[name], SAP_RULE_REPLACEMENTS[name], regex=True)
+            if name == 'zero_padding':
+                replaced = replaced.where(values.str.len() >= ZERO_PADDING_MIN_LENGTH, values)
+            values = replaced
+
+        # 正規化されなかった値は前後空白も含めて元のまま残す（欠損値も維持）
+        changed = values != original.str.strip()
+        return values.where(changed, series)
+
+    def normalize_frame(self, df: pd.DataFrame, column_rules: Dict[str, Tuple[str, ...]]) -> pd.DataFrame:
+        """列ごとのルール指定に従ってDataFrameを正規化（対象列のみ置き換え）"""
+        for col_name, rules in column_rules.items():
+            if rules and col_name in df.columns:
+                df[col_name] = self.normalize_series(df[col_name], rules)
+        return df
+
+    def normalize_value(self, value, rules: Iterable[str] = SAP_RULE_ORDER):
+        """単一値の正規化（TypeCorrectionRules.normalize_sap_data 用）"""
+        if pd.isna(value):
+            return value
+        return self.normalize_series(pd.Series([str(value).strip()]), rules).iloc[0]
+
+
+_default_normalizer: Optional[SapNormalizer] = None
+
+
+def get_default_normalizer() -> SapNormalizer:
+    """pattern_rules_data.json から生成した共有インスタンスを取得"""
+    global _default_normalizer
+    if _default_normalizer is None:
+        _default_normalizer = SapNormalizer.from_rules_file()
+    return _default_normalizer
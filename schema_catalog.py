@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+スキーマメタデータカタログ
+sqlite_master と pragma_table_info をJOINした1回のクエリで全テーブルの列情報を読み込み、
+プロセス内にキャッシュする。PRAGMA schema_version が変わったとき（テーブルの作成・削除・
+列追加など）だけ読み直す。
+
+テーブル一覧・列の型の取得はすべてこのカタログ経由で行う（テーブルごとの PRAGMA table_info は使わない）。
+ただしロード中のように1テーブルずつ作成・削除しながら列を調べる場合は、schema_version が
+毎回変わるため table_columns でそのテーブルだけを読む（全テーブルの読み直しを繰り返さない）。
+"""
+
+import sqlite3
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# 1回のクエリで全テーブルの列情報を取得（pragma_table_info はテーブル値関数、SQLite 3.16+）
+CATALOG_QUERY = """
+    SELECT m.name, p.cid, p.name, p.type, p."notnull", p.pk
+    FROM sqlite_master AS m
+    JOIN pragma_table_info(m.name) AS p
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+    ORDER BY m.name, p.cid
+"""
+
+# 1テーブルの列情報（カタログが古い場合の table_columns 用）
+TABLE_QUERY = "SELECT name, type FROM pragma_table_info(?) ORDER BY cid"
+
+
+class ColumnInfo:
+    """列のメタデータ"""
+
+    __slots__ = ('name', 'type', 'notnull', 'pk')
+
+    def __init__(self, name: str, type_: str, notnull: bool, pk: int):
+        self.name = name
+        self.type = type_
+        self.notnull = notnull
+        self.pk = pk
+
+
+class SchemaCatalog:
+    """1つのデータベースのテーブル・列情報"""
+
+    def __init__(self, schema_version: int, rows: List[Tuple]):
+        self.schema_version = schema_version
+        self._tables: Dict[str, List[ColumnInfo]] = {}
+        for table_name, _cid, column_name, column_type, notnull, pk in rows:
+            self._tables.setdefault(table_name, []).append(
+                ColumnInfo(column_name, column_type or '', bool(notnull), pk))
+
+    def tables(self, exclude: Tuple[str, ...] = ()) -> List[str]:
+        """テーブル名の一覧"""
+        return [name for name in self._tables if name not in exclude]
+
+    def has_table(self, table_name: str) -> bool:
+        return table_name in self._tables
+
+    def column_infos(self, table_name: str) -> List[ColumnInfo]:
+        return list(self._tables.get(table_name, []))
+
+    def columns(self, table_name: str) -> Dict[str, str]:
+        """{列名: 型} （PRAGMA table_info の name/type と同じ。テーブルがなければ空）"""
+        return {col.name: col.type for col in self._tables.get(table_name, [])}
+
+    def schema(self, exclude: Tuple[str, ...] = ()) -> Dict[str, Dict[str, str]]:
+        """{テーブル名: {列名: 型}}"""
+        return {name: self.columns(name) for name in self.tables(exclude)}
+
+    def type_distribution(self, exclude: Tuple[str, ...] = ()) -> Dict[str, int]:
+        """列の型（大文字）ごとの件数"""
+        return dict(Counter(col.type.upper() for name in self.tables(exclude) for col in self._tables[name]))
+
+
+# DBファイルパス -> カタログ
+_catalogs: Dict[str, SchemaCatalog] = {}
+
+
+def _database_path(conn: sqlite3.Connection) -> Optional[str]:
+    """接続先DBファイルのパス（メモリDB・一時DBはNone）"""
+    for _seq, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return path or None
+    return None
+
+
+def get_catalog(conn: sqlite3.Connection) -> SchemaCatalog:
+    """接続先DBのカタログを取得（schema_version が変わっていなければキャッシュを返す）"""
+    schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    path = _database_path(conn)
+    cached = _catalogs.get(path) if path else None
+    if cached is not None and cached.schema_version == schema_version:
+        return cached
+
+    catalog = SchemaCatalog(schema_version, conn.execute(CATALOG_QUERY).fetchall())
+    if path:
+        _catalogs[path] = catalog
+    return catalog
+
+
+def table_columns(conn: sqlite3.Connection, table_name: str) -> Dict[str, str]:
+    """1テーブルの {列名: 型}（カタログが最新ならカタログから、古ければそのテーブルだけを読む）"""
+    path = _database_path(conn)
+    cached = _catalogs.get(path) if path else None
+    if cached is not None and cached.schema_version == conn.execute("PRAGMA schema_version").fetchone()[0]:
+        return cached.columns(table_name)
+    return {name: column_type or '' for name, column_type in conn.execute(TABLE_QUERY, (table_name,))}
+
+
+def invalidate(path: Optional[str] = None) -> None:
+    """キャッシュを破棄（pathを省略した場合はすべて）"""
+    if path is None:
+        _catalogs.clear()
+    else:
+        _catalogs.pop(path, None)
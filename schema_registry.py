@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+スキーマレジストリ
+日次ファイルの大半は前日と同じヘッダーのため、正規化したヘッダー・エンコーディング・区切り文字の
+ハッシュ（レイアウトのフィンガープリント）ごとに推定済みの列の型を master.db に記録し、
+同じレイアウトのファイルは型推定（infer_sqlite_type / correct_type）を省略して型を再利用する。
+
+- 既知のレイアウト: 記録済みの型をそのまま使う（ルールストアのバージョンが変わった場合は無効）
+- 新しいレイアウト: 同じファイル名の直前のレイアウトにある列は型を引き継ぎ、新しい列だけ推定する
+- ドリフト確認（SCHEMA_DRIFT_CHECK_ROWS）: 再利用する INTEGER / REAL / DATETIME 列の先頭数行が
+  その型として解釈できるかだけを確認し、解釈できない列は推定し直す
+"""
+
+import hashlib
+import json
+import sqlite3
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from sap_normalizer import SapNormalizer
+
+
+def init_tables(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_layouts (
+            fingerprint TEXT PRIMARY KEY,
+            file_name TEXT,
+            encoding TEXT,
+            delimiter TEXT,
+            rules_version INTEGER,
+            hit_count INTEGER DEFAULT 0,
+            last_seen DATETIME
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_layout_columns (
+            fingerprint TEXT,
+            position INTEGER,
+            column_name TEXT,
+            data_type TEXT,
+            initial_inferred_type TEXT,
+            date_format TEXT,
+            PRIMARY KEY (fingerprint, position)
+        )
+    """)
+
+
+def normalize_header(columns: Sequence[str]) -> List[str]:
+    """全角・半角と前後の空白の違いを吸収したヘッダー"""
+    return [unicodedata.normalize('NFKC', str(col)).strip() for col in columns]
+
+
+def layout_fingerprint(columns: Sequence[str], encoding: Optional[str], delimiter: Optional[str]) -> str:
+    payload = json.dumps([normalize_header(columns), encoding, delimiter], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class SchemaRegistry:
+    """レイアウトごとの列の型の記録（analyze_files と同じ接続を使う）"""
+
+    def __init__(self, conn: sqlite3.Connection, rules_version: int = 0,
+                 normalizer: Optional[SapNormalizer] = None):
+        self.conn = conn
+        self.rules_version = rules_version
+        self.normalizer = normalizer or SapNormalizer()
+        init_tables(conn)
+
+    def _columns(self, fingerprint: str) -> Dict[str, Dict]:
+        rows = self.conn.execute(
+            "SELECT column_name, data_type, initial_inferred_type, date_format FROM schema_layout_columns "
+            "WHERE fingerprint = ? ORDER BY position", (fingerprint,)).fetchall()
+        return {row[0]: {"Inferred_Type": row[1], "Initial_Inferred_Type": row[2], "Date_Format": row[3]}
+                for row in rows}
+
+    def lookup(self, file_name: str, columns: Sequence[str], encoding: Optional[str],
+               delimiter: Optional[str]) -> Dict[str, Dict]:
+        """再利用できる列の型 {正規化前の列名: {Inferred_Type, Initial_Inferred_Type, Date_Format}}
+
+        既知のレイアウトなら全列、そうでなければ同じファイル名の直前のレイアウトと共通の列だけ。
+        """
+        fingerprint = layout_fingerprint(columns, encoding, delimiter)
+        row = self.conn.execute("SELECT rules_version FROM schema_layouts WHERE fingerprint = ?",
+                                (fingerprint,)).fetchone()
+        if row is None or row[0] != self.rules_version:
+            row = self.conn.execute(
+                "SELECT fingerprint FROM schema_layouts WHERE file_name = ? AND rules_version = ? "
+                "AND encoding IS ? AND delimiter IS ? ORDER BY last_seen DESC, rowid DESC LIMIT 1",
+                (file_name, self.rules_version, encoding, delimiter)).fetchone()
+            if row is None:
+                return {}
+            fingerprint = row[0]
+        known = self._columns(fingerprint)
+        return {col: known[name] for col, name in zip(columns, normalize_header(columns)) if name in known}
+
+    def drifted(self, series: pd.Series, info: Dict, rows: Optional[int]) -> bool:
+        """記録済みの型で先頭 rows 行の値を解釈できないか（rows=None は確認しない）"""
+        if rows is None or info["Inferred_Type"] not in ("INTEGER", "REAL", "DATETIME"):
+            return False
+        values = series.dropna().astype(str).str.strip()
+        values = values[values != ''].head(rows)
+        if values.empty:
+            return False
+        if info["Inferred_Type"] == "DATETIME":
+            parsed = pd.to_datetime(values, format=info["Date_Format"], errors='coerce') \
+                if info["Date_Format"] else pd.to_datetime(values, errors='coerce')
+        else:
+            parsed = pd.to_numeric(self.normalizer.normalize_series(values), errors='coerce')
+            if info["Inferred_Type"] == "INTEGER":
+                parsed = parsed.where(parsed.isna() | (parsed % 1 == 0))
+        return bool(parsed.isna().any())
+
+    def record(self, file_name: str, columns: Sequence[str], encoding: Optional[str], delimiter: Optional[str],
+               types: Dict[str, Dict], hit: bool = False) -> None:
+        """レイアウトと列の型を記録（コミットは呼び出し側）"""
+        fingerprint = layout_fingerprint(columns, encoding, delimiter)
+        self.conn.execute("""
+            INSERT INTO schema_layouts (fingerprint, file_name, encoding, delimiter, rules_version, hit_count, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(fingerprint) DO UPDATE SET
+                file_name=excluded.file_name,
+                rules_version=excluded.rules_version,
+                hit_count=schema_layouts.hit_count + excluded.hit_count,
+                last_seen=excluded.last_seen
+        """, (fingerprint, file_name, encoding, delimiter, self.rules_version, int(hit),
+              datetime.now().isoformat(timespec='seconds')))
+        self.conn.execute("DELETE FROM schema_layout_columns WHERE fingerprint = ?", (fingerprint,))
+        self.conn.executemany(
+            "INSERT INTO schema_layout_columns VALUES (?, ?, ?, ?, ?, ?)",
+            [(fingerprint, position, name, types[col]["Inferred_Type"], types[col]["Initial_Inferred_Type"],
+              types[col]["Date_Format"])
+             for position, (col, name) in enumerate(zip(columns, normalize_header(columns))) if col in types])
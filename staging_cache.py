@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+ステージングキャッシュ
+解析済みファイル（文字列のままのDataFrame）をArrow IPC形式で保存し、
+analyze / load / file_analyzer の2回目以降はメモリマップで読み込む
+
+- キー: ファイル内容のハッシュ（BLAKE2b）
+- 値: 生の文字列値（na_filter=False相当）＋ 検出したエンコーディング・区切り文字
+  （analyze と load が同じエントリを使うため、区切り文字は detect_delimiter の1つの方法で検出する）
+- 追い出し: 最終利用からの経過日数と合計サイズ（古いものから削除）
+- pyarrowがない環境ではキャッシュは無効（常にミス）
+"""
+
+import hashlib
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+from compressed_input import open_text
+from config import (DELIMITERS, STAGING_CACHE_DIR, STAGING_CACHE_MAX_BYTES,
+                    STAGING_CACHE_MAX_AGE_DAYS)
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pyarrowは任意依存
+    pa = None
+
+HASH_BLOCK_SIZE = 1024 * 1024
+# エントリの形式・解析方法（区切り文字の検出など）を変えたら上げる（古いエントリは使わない）
+ENTRY_VERSION = 2
+
+# pandasのread_csvが既定で欠損値とみなす文字列
+DEFAULT_NA_STRINGS = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+
+def detect_delimiter(file_path: str, encoding: str, member: Optional[str] = None,
+                     sample_lines: int = 5) -> str:
+    """先頭の数行で最も多い区切り文字を返す（見つからない・読めない場合はタブ）
+
+    空白は値（品目テキストなど）の中にも現れるため、ほかの区切り文字がない場合だけ使う。
+    """
+    try:
+        with open_text(file_path, encoding, member, errors='ignore') as f:
+            text = ''.join(f.readline() for _ in range(sample_lines))
+    except Exception:
+        return '\t'
+    counts = {d: text.count(d) for d in DELIMITERS if d != ' '}
+    best = max(counts, key=counts.get, default=None)
+    if best is not None and counts[best] > 0:
+        return best
+    return ' ' if ' ' in DELIMITERS and ' ' in text else '\t'
+
+
+def with_missing_values(df: pd.DataFrame) -> pd.DataFrame:
+    """生の文字列値のDataFrameを read_csv 既定（na_filter=True）相当の欠損値表現に変換"""
+    return df.mask(df.isin(DEFAULT_NA_STRINGS))
+
+
+class StagingCache:
+    """解析済みファイルのArrow IPCキャッシュ"""
+
+    def __init__(self, cache_dir: str = STAGING_CACHE_DIR,
+                 max_bytes: int = STAGING_CACHE_MAX_BYTES,
+                 max_age_days: float = STAGING_CACHE_MAX_AGE_DAYS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 24 * 3600
+        # (path, size, mtime) -> ハッシュ（同一実行内で同じファイルを何度もハッシュしない）
+        self._digests: Dict[Tuple[str, int, float], str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None
+
+    def file_digest(self, file_path: str) -> str:
+        """ファイル内容のハッシュを計算"""
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+        if key not in self._digests:
+            h = hashlib.blake2b(digest_size=20)
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                    h.update(block)
+            self._digests[key] = h.hexdigest()
+        return self._digests[key]
+
+    def _entry_path(self, digest: str, member: Optional[str] = None) -> str:
+        if member is not None:
+            # 1ファイル内の複数データ（Excelのシートなど）はメンバー名ごとに別エントリ
+            digest = f"{digest}-{hashlib.blake2b(member.encode('utf-8'), digest_size=8).hexdigest()}"
+        return os.path.join(self.cache_dir, f"{digest}.v{ENTRY_VERSION}.arrow")
+
+    def get(self, file_path: str, nrows: Optional[int] = None, member: Optional[str] = None
+            ) -> Optional[Tuple[pd.DataFrame, str, Optional[str]]]:
+        """キャッシュから (df, encoding, delimiter) を取得。nrows行に満たない場合はミス"""
+        if not self.enabled:
+            return None
+        try:
+            entry_path = self._entry_path(self.file_digest(file_path), member)
+            if not os.path.exists(entry_path):
+                return None
+
+            with pa.memory_map(entry_path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+            meta = table.schema.metadata or {}
+            complete = meta.get(b'complete') == b'1'
+            if nrows is not None and not complete and table.num_rows < nrows:
+                return None
+            if nrows is not None:
+                table = table.slice(0, nrows)
+
+            # 最終利用時刻として更新（追い出し順に使用）
+            os.utime(entry_path, None)
+            encoding = meta.get(b'encoding', b'').decode('utf-8') or None
+            delimiter = meta[b'delimiter'].decode('utf-8') if b'delimiter' in meta else None
+            return table.to_pandas(), encoding, delimiter
+        except Exception as e:
+            print(f"警告: ステージングキャッシュ読み込み失敗: {os.path.basename(file_path)} - {e}")
+            return None
+
+    def put(self, file_path: str, df: pd.DataFrame, encoding: str, delimiter: Optional[str],
+            complete: bool = False, member: Optional[str] = None) -> None:
+        """解析結果を保存（同じファイル・メンバーの既存エントリは上書き）"""
+        if not self.enabled or df is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry_path = self._entry_path(self.file_digest(file_path), member)
+
+            arrays = [pa.array(df[col].astype(object).where(df[col].notna(), None), type=pa.string())
+                      for col in df.columns]
+            metadata = {
+                b'source': os.path.basename(file_path).encode('utf-8'),
+                b'encoding': (encoding or '').encode('utf-8'),
+                b'rows': str(len(df)).encode('utf-8'),
+                b'complete': b'1' if complete else b'0',
+            }
+            if delimiter is not None:
+                metadata[b'delimiter'] = delimiter.encode('utf-8')
+            table = pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns]).replace_schema_metadata(metadata)
+
+            # 書き込み途中のファイルを読まれないよう一時ファイル経由で置き換え
+            tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, entry_path)
+        except Exception as e:
+            print(f"警告: ステージングキャッシュ書き込み失敗: {os.path.basename(file_path)} - {e}")
+            return
+
+        self.evict()
+
+    def evict(self) -> int:
+        """期限切れ・サイズ超過のエントリを削除し、削除件数を返す"""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+
+        now = time.time()
+        entries = []
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not name.endswith('.arrow') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            if now - stat.st_mtime > self.max_age_seconds:
+                os.remove(path)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        # 合計サイズが上限を超えていれば最終利用が古い順に削除
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
@@ -8,14 +8,9 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from config import DATA_DIR, CANDIDATE_CSV, DB_FILE
 from init_dev import init_db_dev
 from init_prod import init_db_prod
-from analyzer import analyze_files
-from loader import load_and_compare
 import pattern_rules # パターンルール管理のためにインポート
-from t002_pattern_fixer import T002PatternFixer # 追加
-from t002_rule_applier import T002RuleApplier # 追加
-import master_manager # 追加
-import mapper # 追加
-from t003_rule_integration import RuleIntegrationManager # T003統合機能
+# analyzer / loader / T002 / master_manager / mapper はボタン押下時に遅延import
+# （Streamlitは操作のたびにスクリプト全体を再実行するため）
 
 st.set_page_config(layout="wide", page_title="SQLite Data Manager GUI")
 
@@ -25,6 +20,9 @@ st.title("SQLite Data Manager GUI")
 # Streamlitのセッションステートに保存して、再実行時に再初期化されないようにする
 if 'corrector' not in st.session_state:
     st.session_state.corrector = pattern_rules.TypeCorrectionRules()
+# 他のセッションでルールが変更されていれば読み直す（ストアのバージョンが同じなら何もしない）
+st.session_state.corrector.refresh()
+rule_store = st.session_state.corrector.store
 
 # --- サイドバー ---
 st.sidebar.header("操作メニュー")
@@ -66,12 +64,10 @@ with st.sidebar.expander("未登録ファイルルール"):
     
     if st.button("ルール追加", key="add_unregistered_rule_button"):
         if new_file_name and new_encoding and new_separator:
-            if new_file_name not in st.session_state.corrector._rules_data['unregistered_files']:
-                st.session_state.corrector._rules_data['unregistered_files'][new_file_name] = {
-                    "encoding": new_encoding,
-                    "separator": new_separator
-                }
-                st.session_state.corrector._save_rules_data()
+            if rule_store.add('unregistered_files', new_file_name, {
+                "encoding": new_encoding,
+                "separator": new_separator
+            }):
                 st.success(f"ファイル '{new_file_name}' のルールを追加しました。")
                 st.rerun()
             else:
@@ -98,8 +94,7 @@ with st.sidebar.expander("未登録ファイルルール"):
                     st.rerun()
             with col4:
                 if st.button("削除", key=f"delete_unregistered_rule_{file_name}"):
-                    del st.session_state.corrector._rules_data['unregistered_files'][file_name]
-                    st.session_state.corrector._save_rules_data()
+                    rule_store.delete('unregistered_files', file_name)
                     st.success(f"ファイル '{file_name}' のルールを削除しました。")
                     st.rerun()
             st.markdown("---")
@@ -119,11 +114,10 @@ with st.sidebar.expander("未登録ファイルルール"):
         with col_edit_save:
             if st.button("変更を保存", key="save_edited_unregistered_rule_button"):
                 if edited_encoding and edited_separator:
-                    st.session_state.corrector._rules_data['unregistered_files'][st.session_state.editing_unregistered_file_name] = {
+                    rule_store.update('unregistered_files', st.session_state.editing_unregistered_file_name, value={
                         "encoding": edited_encoding,
                         "separator": edited_separator
-                    }
-                    st.session_state.corrector._save_rules_data()
+                    })
                     st.success(f"ファイル '{st.session_state.editing_unregistered_file_name}' のルールを更新しました。")
                     del st.session_state.editing_unregistered_file_name
                     del st.session_state.editing_unregistered_encoding
@@ -144,9 +138,7 @@ with st.sidebar.expander("日付パターンルール"):
     # 新しいパターンを追加
     new_datetime_pattern = st.text_input("新しい日付パターンを追加", key="new_datetime_pattern_input")
     if st.button("パターン追加", key="add_datetime_pattern_button"):
-        if new_datetime_pattern and new_datetime_pattern not in st.session_state.corrector._rules_data['datetime_patterns']:
-            st.session_state.corrector._rules_data['datetime_patterns'].append(new_datetime_pattern)
-            st.session_state.corrector._save_rules_data()
+        if new_datetime_pattern and rule_store.add('datetime_patterns', new_datetime_pattern):
             st.success(f"パターン '{new_datetime_pattern}' を追加しました。")
             st.rerun() # 変更を反映するために再実行
         elif new_datetime_pattern in st.session_state.corrector._rules_data['datetime_patterns']:
@@ -169,8 +161,7 @@ with st.sidebar.expander("日付パターンルール"):
                 st.rerun()
         with col3:
             if st.button("削除", key=f"delete_datetime_pattern_{i}"):
-                st.session_state.corrector._rules_data['datetime_patterns'].pop(i)
-                st.session_state.corrector._save_rules_data()
+                rule_store.delete('datetime_patterns', pattern)
                 st.success(f"パターン '{pattern}' を削除しました。")
                 st.rerun() # 変更を反映するために再実行
 
@@ -184,8 +175,7 @@ with st.sidebar.expander("日付パターンルール"):
         with col_edit_save:
             if st.button("変更を保存", key="save_edited_datetime_pattern_button"):
                 if edited_pattern:
-                    st.session_state.corrector._rules_data['datetime_patterns'][st.session_state.editing_datetime_pattern_index] = edited_pattern
-                    st.session_state.corrector._save_rules_data()
+                    rule_store.update('datetime_patterns', st.session_state.editing_datetime_pattern_value, new_key=edited_pattern)
                     st.success(f"パターンを '{edited_pattern}' に更新しました。")
                     del st.session_state.editing_datetime_pattern_index
                     del st.session_state.editing_datetime_pattern_value
@@ -212,9 +202,7 @@ with st.sidebar.expander("ビジネスロジックルール"):
             add_button = st.form_submit_button(f"キーワード追加 ({category})")
 
             if add_button:
-                if new_keyword and new_keyword not in st.session_state.corrector._rules_data['business_logic_rules'][category]:
-                    st.session_state.corrector._rules_data['business_logic_rules'][category].append(new_keyword)
-                    st.session_state.corrector._save_rules_data()
+                if new_keyword and rule_store.add(category, new_keyword):
                     st.success(f"キーワード '{new_keyword}' を {category} に追加しました。")
                     st.rerun()
                 elif new_keyword in st.session_state.corrector._rules_data['business_logic_rules'][category]:
@@ -238,8 +226,7 @@ with st.sidebar.expander("ビジネスロジックルール"):
                         st.rerun()
                 with col3:
                     if st.button("削除", key=f"delete_keyword_{category}_{i}"):
-                        st.session_state.corrector._rules_data['business_logic_rules'][category].pop(i)
-                        st.session_state.corrector._save_rules_data()
+                        rule_store.delete(category, keyword)
                         st.success(f"キーワード '{keyword}' を {category} から削除しました。")
                         st.rerun()
             st.markdown("---")
@@ -256,8 +243,7 @@ with st.sidebar.expander("ビジネスロジックルール"):
             with col_edit_save:
                 if st.button("変更を保存", key=f"save_edited_business_logic_keyword_button_inline_{category}"):
                     if edited_keyword:
-                        st.session_state.corrector._rules_data['business_logic_rules'][category_to_edit][index_to_edit] = edited_keyword
-                        st.session_state.corrector._save_rules_data()
+                        rule_store.update(category_to_edit, st.session_state.editing_business_logic_value, new_key=edited_keyword)
                         st.success(f"キーワードを '{edited_keyword}' に更新しました。")
                         del st.session_state.editing_business_logic_category
                         del st.session_state.editing_business_logic_index
@@ -282,6 +268,7 @@ if st.sidebar.button("マスタDB初期化"):
     status_message = st.sidebar.empty()
     status_message.info("マスタDBを初期化中...")
     try:
+        import master_manager
         master_manager.init_master()
         status_message.success("マスタDBの初期化が完了しました。")
     except Exception as e:
@@ -289,19 +276,30 @@ if st.sidebar.button("マスタDB初期化"):
 
 if st.sidebar.button("マスタデータ表示"):
     try:
+        import master_manager
         master_df = master_manager.load_master()
         st.sidebar.write("### 現在のマスタデータ")
         st.sidebar.dataframe(master_df)
     except Exception as e:
         st.sidebar.error(f"マスタデータの読み込み中にエラーが発生しました: {e}")
 
-# ルール変更を保存するボタン
-if st.sidebar.button("ルール変更を保存"):
+# ルールの編集は行単位でルールストア（master.db）に即時保存される。
+# pattern_rules_data.json は取り込み・書き出し用の形式として扱う
+if st.sidebar.button("ルールをJSONにエクスポート"):
     try:
-        st.session_state.corrector._save_rules_data()
-        st.sidebar.success("ルールが正常に保存されました。")
+        st.session_state.corrector.export_rules()
+        st.sidebar.success(f"ルールを {st.session_state.corrector.rules_file} に書き出しました。")
     except Exception as e:
-        st.sidebar.error(f"ルールの保存中にエラーが発生しました: {e}")
+        st.sidebar.error(f"ルールの書き出し中にエラーが発生しました: {e}")
+
+if st.sidebar.button("JSONからルールをインポート"):
+    try:
+        count = rule_store.import_json(st.session_state.corrector.rules_file)
+        st.session_state.corrector.refresh()
+        st.sidebar.success(f"{count}件のルールを取り込みました。")
+        st.rerun()
+    except Exception as e:
+        st.sidebar.error(f"ルールの取り込み中にエラーが発生しました: {e}")
 
 # --- メインコンテンツ ---
 st.header("データ処理")
@@ -317,6 +315,7 @@ with col_fixer:
         status_message = st.empty()
         status_message.info("パターン修正ルールを生成中... (compare_report.csvが必要です)")
         try:
+            from t002_pattern_fixer import T002PatternFixer
             fixer = T002PatternFixer()
             fixer.run_full_analysis()
             status_message.success("パターン修正ルールの生成が完了しました。 (pattern_rules.json)")
@@ -328,12 +327,25 @@ with col_applier:
         status_message = st.empty()
         status_message.info("生成されたルールを適用中... (t002_loader_updates.jsonを生成)")
         try:
+            from t002_rule_applier import T002RuleApplier
             applier = T002RuleApplier()
             applier.run_full_application()
             status_message.success("ルールの適用が完了しました。 (t002_loader_updates.json)")
         except Exception as e:
             status_message.error(f"ルールの適用中にエラーが発生しました: {e}")
 
+if st.button("GUI設定をloaderに同期（変更ファイルのみ再ロード）"):
+    status_message = st.empty()
+    status_message.info("ルール差分を計算し、影響ファイルを再ロード中...")
+    try:
+        from t003_rule_integration import RuleIntegrationManager
+        if RuleIntegrationManager(st.session_state.corrector).sync_gui_to_loader(reload=True):
+            status_message.success("ルールの同期が完了しました。")
+        else:
+            status_message.error("ルールの同期に失敗しました。ログを確認してください。")
+    except Exception as e:
+        status_message.error(f"ルールの同期中にエラーが発生しました: {e}")
+
 st.markdown("---")
 
 # ファイル分析セクション
@@ -344,6 +356,7 @@ if st.button("ファイル分析実行"):
     status_message = st.empty()
     status_message.info("ファイル分析を実行中...")
     try:
+        from analyzer import analyze_files
         # analyze_files関数は結果を返すので、それを表示
         analysis_df = analyze_files(DATA_DIR, CANDIDATE_CSV, DB_FILE)
         status_message.success("ファイル分析が完了しました。")
@@ -353,12 +366,28 @@ if st.button("ファイル分析実行"):
     except Exception as e:
         status_message.error(f"ファイル分析中にエラーが発生しました: {e}")
 
+# パイプライン一括実行セクション
+st.subheader("パイプライン一括実行")
+st.write("analyze → 修正ルール生成 → ルール適用 / GUIルール同期 → load のうち、入力が変わったステージ・ファイルだけを実行します。")
+if st.button("差分パイプライン実行"):
+    status_message = st.empty()
+    status_message.info("パイプラインを実行中...")
+    try:
+        import pandas as pd
+        from pipeline import run_pipeline
+        pipeline_status = run_pipeline()
+        status_message.success("パイプラインが完了しました。")
+        st.table(pd.DataFrame(list(pipeline_status.items()), columns=["ステージ", "結果"]))
+    except Exception as e:
+        status_message.error(f"パイプライン実行中にエラーが発生しました: {e}")
+
 # データロードと比較セクション
 st.subheader("データロードと比較")
 if st.button("データロードと比較実行"):
     status_message = st.empty()
     status_message.info("データロードと比較を実行中...")
     try:
+        from loader import load_and_compare
         load_and_compare()
         status_message.success("データロードと比較が完了しました。")
     except Exception as e:
@@ -374,6 +403,8 @@ if st.button("マスタと比較して差分を検出"):
     if 'analysis_df' in st.session_state and not st.session_state.analysis_df.empty:
         status_message.info("マスタデータとの比較を実行中...")
         try:
+            import mapper
+            import master_manager
             new_cols, type_mismatch = mapper.compare_with_master(st.session_state.analysis_df)
             status_message.success("マスタデータとの比較が完了しました。")
             
@@ -402,5 +433,38 @@ if st.button("マスタと比較して差分を検出"):
         status_message.warning("先にファイル分析を実行してください。")
         st.warning("先にファイル分析を実行してください。")
 
+st.markdown("---")
+
+# 列名検索セクション
+st.header("列名検索")
+st.write("指定した列名（1行に1つ）を持つファイルを検索します。全角/半角・大文字/小文字の違いは無視します。")
+search_names_text = st.text_area("列名", key="column_search_names")
+search_partial = st.checkbox("部分一致で検索", key="column_search_partial")
+
+if st.button("列名を検索"):
+    search_names = [name.strip() for name in search_names_text.splitlines() if name.strip()]
+    if search_names:
+        try:
+            import sqlite3
+            import pandas as pd
+            from column_index import find_columns
+            conn = sqlite3.connect(DB_FILE)
+            try:
+                matches = find_columns(conn, search_names, 'partial' if search_partial else 'normalized')
+            finally:
+                conn.close()
+            result_rows = [
+                {"検索語": name, "ファイル名": file_name, "列名": column_name}
+                for name, columns in matches.items() for file_name, column_name in columns
+            ]
+            if result_rows:
+                st.dataframe(pd.DataFrame(result_rows))
+            else:
+                st.info("該当する列はありませんでした。")
+        except Exception as e:
+            st.error(f"列名の検索中にエラーが発生しました: {e}")
+    else:
+        st.warning("検索する列名を入力してください。")
+
 st.markdown("---")
 st.write("アプリケーションの状態やログはここに表示されます。")
@@ -1,54 +1,70 @@
 #!/usr/bin/env python3
 """
-T001: compare_report.csv詳細分析ツール
+T001: 比較レポート（compare_report テーブル）詳細分析ツール
 
 Type推定の問題を詳細に調査し、修正方針を決定する
+各ファイルの最新の比較結果（compare_report_latest ビュー）をSQLで集計する
 """
 
-import pandas as pd
-import os
-import numpy as np
-from config import OUTPUT_DIR
+import sqlite3
+from config import DB_FILE
+import compare_report
 
-def analyze_compare_report():
-    """compare_report.csvの詳細分析を実行"""
+
+def _value_counts(conn, column, where=""):
+    """列の値ごとの件数（件数の多い順）"""
+    return conn.execute(f"""
+        SELECT {column}, COUNT(*) FROM compare_report_latest {where}
+        GROUP BY {column} ORDER BY COUNT(*) DESC
+    """).fetchall()
+
+
+def analyze_compare_report(db_file: str = DB_FILE):
+    """比較レポートの詳細分析を実行"""
     
-    print(" T001: compare_report.csv 詳細分析開始")
+    print(" T001: compare_report 詳細分析開始")
     print("=" * 60)
     
-    # ファイル読み込み
-    compare_file = os.path.join(OUTPUT_DIR, 'compare_report.csv')
-    if not os.path.exists(compare_file):
-        print(f" compare_report.csvが見つかりません: {compare_file}")
+    conn = sqlite3.connect(db_file)
+    try:
+        compare_report.init_tables(conn)
+        _analyze(conn)
+    finally:
+        conn.close()
+
+
+def _analyze(conn):
+    total, file_count, column_count = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT File), COUNT(DISTINCT Column) FROM compare_report_latest"
+    ).fetchone()
+    if total == 0:
+        print(" compare_reportに比較結果がありません（先にloadを実行してください）")
         return
     
-    df = pd.read_csv(compare_file, encoding='utf-8')
-    
     # 基本情報
     print(f" 基本情報")
-    print(f"  総フィールド数: {len(df):,}")
-    print(f"  処理ファイル数: {df['File'].nunique()}")
-    print(f"  ユニーク列名数: {df['Column'].nunique()}")
+    print(f"  総フィールド数: {total:,}")
+    print(f"  処理ファイル数: {file_count}")
+    print(f"  ユニーク列名数: {column_count}")
     print()
     
     # 重大な問題：Actual_Typeの調査
     print(f" 重大な問題発見")
     print(f"  Actual_Type の分布:")
-    actual_types = df['Actual_Type'].value_counts()
-    for dtype, count in actual_types.items():
-        print(f"    {dtype}: {count:,} ({count/len(df)*100:.1f}%)")
+    actual_types = _value_counts(conn, "Actual_Type")
+    for dtype, count in actual_types:
+        print(f"    {dtype}: {count:,} ({count/total*100:.1f}%)")
     print()
     
-    if len(actual_types) == 1 and 'TEXT' in actual_types.index:
+    if len(actual_types) == 1 and actual_types[0][0] == 'TEXT':
         print("    全てのActual_TypeがTEXTになっています！")
         print("   型推定ロジックに致命的な問題があります")
         print()
     
     # 型一致率の詳細
     print(f" 型一致状況")
-    match_dist = df['Match'].value_counts()
-    total = len(df)
-    match_rate = (df['Match'] == '○').sum() / total * 100
+    match_dist = dict(_value_counts(conn, "Match"))
+    match_rate = match_dist.get('○', 0) / total * 100
     print(f"  一致: {match_dist.get('○', 0):,} ({match_dist.get('○', 0)/total*100:.1f}%)")
     print(f"  不一致: {match_dist.get('×', 0):,} ({match_dist.get('×', 0)/total*100:.1f}%)")
     print(f"  一致率: {match_rate:.1f}%")
@@ -56,81 +72,86 @@ def analyze_compare_report():
     
     # 推定型の分布
     print(f" 推定型の分布")
-    inferred_dist = df['Inferred_Type'].value_counts()
-    for dtype, count in inferred_dist.items():
-        print(f"  {dtype}: {count:,} ({count/len(df)*100:.1f}%)")
+    for dtype, count in _value_counts(conn, "Inferred_Type"):
+        print(f"  {dtype}: {count:,} ({count/total*100:.1f}%)")
     print()
     
     # ファイル別分析
     print(f" ファイル別分析（上位10件）")
-    file_analysis = df.groupby('File').agg({
-        'Column': 'count',
-        'Match': lambda x: (x == '○').sum(),
-        'Encoding': lambda x: x.iloc[0],
-        'Delimiter': lambda x: x.iloc[0]
-    }).rename(columns={'Column': 'total_fields', 'Match': 'matched_fields'})
-    
-    file_analysis['match_rate'] = file_analysis['matched_fields'] / file_analysis['total_fields'] * 100
-    file_analysis = file_analysis.sort_values('match_rate')
+    file_analysis = conn.execute("""
+        SELECT File, COUNT(*) AS total_fields, SUM(Match = '○') AS matched_fields,
+               100.0 * SUM(Match = '○') / COUNT(*) AS match_rate, MIN(Encoding), MIN(Delimiter)
+        FROM compare_report_latest
+        GROUP BY File ORDER BY match_rate, File LIMIT 10
+    """).fetchall()
     
     print("  ワースト10ファイル (一致率順):")
-    for file, row in file_analysis.head(10).iterrows():
-        print(f"    {file[:30]:30} | {row['matched_fields']:3}/{row['total_fields']:3} ({row['match_rate']:5.1f}%) | {row['Encoding']} | {row['Delimiter']}")
+    for file, total_fields, matched_fields, rate, encoding, delimiter in file_analysis:
+        print(f"    {file[:30]:30} | {matched_fields:3}/{total_fields:3} ({rate:5.1f}%) | {encoding} | {delimiter}")
     print()
     
     # 型不一致パターンの詳細
     print(f" 型不一致パターンの詳細")
-    mismatch_df = df[df['Match'] != '○']
-    if len(mismatch_df) > 0:
-        patterns = mismatch_df.groupby(['Inferred_Type', 'Actual_Type']).size().sort_values(ascending=False)
+    mismatch_count = conn.execute("SELECT COUNT(*) FROM v_compare_mismatch").fetchone()[0]
+    if mismatch_count > 0:
+        patterns = conn.execute("""
+            SELECT Inferred_Type, Actual_Type, COUNT(*) FROM v_compare_mismatch
+            GROUP BY Inferred_Type, Actual_Type ORDER BY COUNT(*) DESC LIMIT 15
+        """).fetchall()
         print("  主要な不一致パターン:")
-        for (inferred, actual), count in patterns.head(15).items():
-            print(f"    {inferred:12}  {actual:12}: {count:4,} フィールド ({count/len(mismatch_df)*100:5.1f}%)")
+        for inferred, actual, count in patterns:
+            print(f"    {str(inferred):12}  {str(actual):12}: {count:4,} フィールド ({count/mismatch_count*100:5.1f}%)")
     print()
     
     # SAPデータ特殊パターンの検出
     print(f" SAPデータ特殊パターンの検出")
     # 0パディング可能性
-    zero_padding_candidates = df[
-        (df['Column'].str.contains('CODE|CD|NO|NUM', case=False, na=False)) &
-        (df['Inferred_Type'] == 'TEXT')
-    ]
-    print(f"  0パディング候補: {len(zero_padding_candidates)} フィールド")
+    # （LIKE は ASCII の大文字小文字を区別しない）
+    zero_padding_candidates = conn.execute("""
+        SELECT COUNT(*) FROM compare_report_latest
+        WHERE Inferred_Type = 'TEXT'
+          AND (Column LIKE '%CODE%' OR Column LIKE '%CD%' OR Column LIKE '%NO%' OR Column LIKE '%NUM%')
+    """).fetchone()[0]
+    print(f"  0パディング候補: {zero_padding_candidates} フィールド")
     
     # 後ろマイナス可能性（数値だが推定がTEXTのもの）
-    minus_candidates = df[
-        (df['Inferred_Type'] != 'TEXT') & 
-        (df['Actual_Type'] == 'TEXT')
-    ]
-    print(f"  後ろマイナス候補: {len(minus_candidates)} フィールド")
+    minus_candidates = conn.execute("""
+        SELECT COUNT(*) FROM compare_report_latest WHERE Inferred_Type != 'TEXT' AND Actual_Type = 'TEXT'
+    """).fetchone()[0]
+    print(f"  後ろマイナス候補: {minus_candidates} フィールド")
     print()
     
     # エンコーディング・区切り文字分析
     print(f" ファイル形式分析")
     print("  エンコーディング分布:")
-    enc_dist = df['Encoding'].value_counts()
-    for enc, count in enc_dist.items():
-        unique_files = df[df['Encoding'] == enc]['File'].nunique()
+    enc_dist = conn.execute("""
+        SELECT Encoding, COUNT(*), COUNT(DISTINCT File) FROM compare_report_latest
+        WHERE Encoding IS NOT NULL GROUP BY Encoding ORDER BY COUNT(*) DESC
+    """).fetchall()
+    for enc, count, unique_files in enc_dist:
         print(f"    {enc:10}: {count:4,} フィールド ({unique_files} ファイル)")
     
     print("  区切り文字分布:")
-    delim_dist = df['Delimiter'].value_counts()
-    for delim, count in delim_dist.items():
-        unique_files = df[df['Delimiter'] == delim]['File'].nunique()
+    delim_dist = conn.execute("""
+        SELECT Delimiter, COUNT(*), COUNT(DISTINCT File) FROM compare_report_latest
+        WHERE Delimiter IS NOT NULL GROUP BY Delimiter ORDER BY COUNT(*) DESC
+    """).fetchall()
+    for delim, count, unique_files in delim_dist:
         delim_display = repr(delim) if delim in ['\t', '\n', '\r'] else delim
         print(f"    {delim_display:10}: {count:4,} フィールド ({unique_files} ファイル)")
     print()
     
     # 重複フィールド名の検出
     print(f" 重複フィールド名の検出")
-    column_counts = df['Column'].value_counts()
-    duplicates = column_counts[column_counts > 1]
+    duplicates = conn.execute("""
+        SELECT Column, COUNT(*), COUNT(DISTINCT File) FROM compare_report_latest
+        GROUP BY Column HAVING COUNT(*) > 1 ORDER BY COUNT(*) DESC, Column
+    """).fetchall()
     
     print(f"  重複フィールド名数: {len(duplicates)}")
     if len(duplicates) > 0:
         print("  上位重複フィールド:")
-        for col, count in duplicates.head(10).items():
-            files_with_col = df[df['Column'] == col]['File'].nunique()
+        for col, count, files_with_col in duplicates[:10]:
             print(f"    {col:30}: {count:3} 回出現 ({files_with_col} ファイル)")
     print()
     
@@ -141,8 +162,8 @@ def analyze_compare_report():
     print("      実際のデータサンプルでテスト")
     print()
     print("  2.  SAPデータ特殊ルールの実装")
-    print(f"      0パディング候補: {len(zero_padding_candidates)} フィールド")
-    print(f"      後ろマイナス候補: {len(minus_candidates)} フィールド")
+    print(f"      0パディング候補: {zero_padding_candidates} フィールド")
+    print(f"      後ろマイナス候補: {minus_candidates} フィールド")
     print()
     print("  3.  重複フィールドの統合計画")
     print(f"      重複フィールド: {len(duplicates)} 種類")
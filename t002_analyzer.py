@@ -3,31 +3,49 @@
 """
 T002 Analyzer: データ型修正サポートツール
 4つの問題パターンを詳細分析し、修正ルールを特定する
+比較レポートは compare_report テーブルの問題パターン別ビュー（v_t002_*）から取得する
 """
 
-import pandas as pd
+import sqlite3
 import os
 import sys
-from collections import defaultdict, Counter
+from collections import Counter
+from config import DB_FILE
+import compare_report
 
 # Windows コンソール文字化け対策
 if sys.platform == "win32":
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-def analyze_compare_report(csv_path):
-    """compare_report.csvの詳細分析"""
+def analyze_compare_report(db_file=DB_FILE):
+    """比較レポート（compare_report テーブル）の詳細分析"""
     
     print("=== T002: データ型問題パターン分析 ===\n")
     
-    if not os.path.exists(csv_path):
-        print(f"❌ compare_report.csv が見つかりません: {csv_path}")
+    if not os.path.exists(db_file):
+        print(f"❌ データベースが見つかりません: {db_file}")
         return
     
-    df = pd.read_csv(csv_path)
-    total_records = len(df)
-    mismatches = df[df['Inferred_Type'] != df['Actual_Type']]
-    mismatch_count = len(mismatches)
+    conn = sqlite3.connect(db_file)
+    try:
+        compare_report.init_tables(conn)
+        return _analyze_patterns(conn)
+    finally:
+        conn.close()
+
+
+def _count(conn, sql):
+    return conn.execute(sql).fetchone()[0]
+
+
+def _analyze_patterns(conn):
+    total_records, mismatch_count = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(Inferred_Type IS NOT Actual_Type), 0) FROM compare_report_latest
+    """).fetchone()
+    if total_records == 0:
+        print("❌ compare_reportに比較結果がありません（先にloadを実行してください）")
+        return
     
     print(f"[DATA] 総レコード数: {total_records:,}")
     print(f"[DATA] 不一致件数: {mismatch_count:,} ({mismatch_count/total_records*100:.1f}%)")
@@ -35,56 +53,62 @@ def analyze_compare_report(csv_path):
     
     # === 問題1: 未登録型パターン ===
     print("[ISSUE1] Inferred_Type = '未登録' の分析")
-    unregistered = df[df['Inferred_Type'] == '未登録']
-    print(f"   件数: {len(unregistered)} 件")
+    unregistered_count = _count(conn, "SELECT COUNT(*) FROM v_t002_unregistered")
+    print(f"   件数: {unregistered_count} 件")
     
-    if len(unregistered) > 0:
+    if unregistered_count > 0:
         print("   ファイル別内訳:")
-        file_counts = unregistered['File'].value_counts()
-        for file_name, count in file_counts.items():
+        for file_name, count in conn.execute(
+                "SELECT File, COUNT(*) FROM v_t002_unregistered GROUP BY File ORDER BY COUNT(*) DESC"):
             print(f"     {file_name}: {count}件")
         
         print("   フィールド名パターン (上位10件):")
-        field_counts = unregistered['Column'].value_counts().head(10)
-        for field, count in field_counts.items():
+        for field, count in conn.execute(
+                "SELECT Column, COUNT(*) FROM v_t002_unregistered GROUP BY Column ORDER BY COUNT(*) DESC LIMIT 10"):
             print(f"     {field}: {count}件")
     print()
     
     # === 問題2: DATETIME → TEXT 変換問題 ===
     print("[ISSUE2] DATETIME -> TEXT 変換問題")
-    datetime_to_text = df[(df['Inferred_Type'] == 'DATETIME') & (df['Actual_Type'] == 'TEXT')]
-    datetime_to_datetime = df[(df['Inferred_Type'] == 'DATETIME') & (df['Actual_Type'] == 'DATETIME')]
+    datetime_to_text = _count(conn, "SELECT COUNT(*) FROM v_t002_datetime_to_text")
+    datetime_to_datetime = _count(conn, """
+        SELECT COUNT(*) FROM compare_report_latest WHERE Inferred_Type = 'DATETIME' AND Actual_Type = 'DATETIME'
+    """)
     
-    print(f"   DATETIME→TEXT: {len(datetime_to_text)} 件")
-    print(f"   DATETIME→DATETIME: {len(datetime_to_datetime)} 件")
+    print(f"   DATETIME→TEXT: {datetime_to_text} 件")
+    print(f"   DATETIME→DATETIME: {datetime_to_datetime} 件")
     
-    total_datetime = len(datetime_to_text) + len(datetime_to_datetime)
+    total_datetime = datetime_to_text + datetime_to_datetime
     if total_datetime > 0:
-        accuracy = len(datetime_to_datetime) / total_datetime * 100
+        accuracy = datetime_to_datetime / total_datetime * 100
         print(f"   正解率: {accuracy:.1f}%")
     else:
         print("   正解率: N/A (DATETIMEデータが存在しません)")
     
-    if len(datetime_to_text) > 0:
+    if datetime_to_text > 0:
         print("   失敗ファイル (上位5件):")
-        for file_name, count in datetime_to_text['File'].value_counts().head(5).items():
+        for file_name, count in conn.execute(
+                "SELECT File, COUNT(*) FROM v_t002_datetime_to_text GROUP BY File ORDER BY COUNT(*) DESC LIMIT 5"):
             print(f"     {file_name}: {count}件")
     print()
     
     # === 問題3: INTEGER判定問題 ===
     print("[ISSUE3] INTEGER判定問題")
-    int_to_text = df[(df['Inferred_Type'] == 'INTEGER') & (df['Actual_Type'] == 'TEXT')]
-    int_to_int = df[(df['Inferred_Type'] == 'INTEGER') & (df['Actual_Type'] == 'INTEGER')]
-    text_to_int = df[(df['Inferred_Type'] == 'TEXT') & (df['Actual_Type'] == 'INTEGER')]
+    int_to_text = [row[0] for row in conn.execute("SELECT Column FROM v_t002_integer_to_text")]
+    type_pairs = dict(((inferred, actual), count) for inferred, actual, count in conn.execute("""
+        SELECT Inferred_Type, Actual_Type, COUNT(*) FROM compare_report_latest
+        WHERE Inferred_Type IN ('INTEGER', 'TEXT') AND Actual_Type IN ('INTEGER', 'TEXT')
+        GROUP BY Inferred_Type, Actual_Type
+    """))
     
     print(f"   INTEGER→TEXT: {len(int_to_text)} 件 (本来INTEGER)")
-    print(f"   INTEGER→INTEGER: {len(int_to_int)} 件 (正解)")
-    print(f"   TEXT→INTEGER: {len(text_to_int)} 件 (本来TEXT)")
+    print(f"   INTEGER→INTEGER: {type_pairs.get(('INTEGER', 'INTEGER'), 0)} 件 (正解)")
+    print(f"   TEXT→INTEGER: {type_pairs.get(('TEXT', 'INTEGER'), 0)} 件 (本来TEXT)")
     
     if len(int_to_text) > 0:
         print("   INTEGER→TEXT フィールド名パターン (原価・単価系チェック):")
         suspect_fields = []
-        for field in int_to_text['Column'].values:
+        for field in int_to_text:
             field_lower = field.lower()
             if any(keyword in field_lower for keyword in ['原価', '単価', 'genka', 'tanka', 'price', 'cost', 'amount']):
                 suspect_fields.append(field)
@@ -99,16 +123,25 @@ def analyze_compare_report(csv_path):
     
     # === 問題4: 保管場所コード問題 ===
     print("[ISSUE4] 保管場所コード問題")
-    storage_issues = df[
-        (df['File'].str.contains('zm114', case=False, na=False)) &
-        (df['Column'].str.contains('保管場所', case=False, na=False)) &
-        (df['Inferred_Type'] == 'INTEGER')
-    ]
+    storage_issues = conn.execute(
+        "SELECT File, Column, Inferred_Type, Actual_Type FROM v_t002_storage_location ORDER BY File, Column"
+    ).fetchall()
     
     print(f"   zm114.txtの保管場所フィールド: {len(storage_issues)} 件")
-    if len(storage_issues) > 0:
-        for _, row in storage_issues.iterrows():
-            print(f"     {row['File']}: {row['Column']} ({row['Inferred_Type']}→{row['Actual_Type']})")
+    for file_name, column, inferred, actual in storage_issues:
+        print(f"     {file_name}: {column} ({inferred}→{actual})")
+    print()
+    
+    # === 問題5: 宣言型と格納型の不一致（typeof プロファイル） ===
+    print("[ISSUE5] 宣言型と実際の格納型の不一致")
+    value_mismatches = conn.execute("""
+        SELECT File, Column, Actual_Type, Stored_Type, Foreign_Count, Profiled_Rows
+        FROM v_t002_value_type_mismatch ORDER BY Foreign_Count DESC LIMIT 10
+    """).fetchall()
+    value_mismatch_count = _count(conn, "SELECT COUNT(*) FROM v_t002_value_type_mismatch")
+    print(f"   件数: {value_mismatch_count} 件")
+    for file_name, column, declared, stored, foreign, profiled in value_mismatches:
+        print(f"     {file_name}: {column} (宣言 {declared} / 格納 {stored}, 異質な値 {foreign}/{profiled}行)")
     print()
     
     # === 全体的な改善提案 ===
@@ -132,10 +165,11 @@ def analyze_compare_report(csv_path):
     return {
         'total_records': total_records,
         'mismatch_count': mismatch_count,
-        'unregistered_count': len(unregistered),
-        'datetime_text_count': len(datetime_to_text),
+        'unregistered_count': unregistered_count,
+        'datetime_text_count': datetime_to_text,
         'integer_text_count': len(int_to_text),
-        'storage_issues_count': len(storage_issues)
+        'storage_issues_count': len(storage_issues),
+        'value_type_mismatch_count': value_mismatch_count
     }
 
 def generate_fix_rules(analysis_result):
@@ -170,13 +204,13 @@ def generate_fix_rules(analysis_result):
     return rules
 
 if __name__ == "__main__":
-    # compare_report.csvのパス
-    csv_path = "C:/Projects_workspace/03_python/output/compare_report.csv"
+    # 比較レポートを保存したDBのパス
+    db_path = DB_FILE
     if len(sys.argv) > 1:
-        csv_path = sys.argv[1]
+        db_path = sys.argv[1]
     
     # 分析実行
-    analysis_result = analyze_compare_report(csv_path)
+    analysis_result = analyze_compare_report(db_path)
     
     if analysis_result:
         # 修正ルール生成
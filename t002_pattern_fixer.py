@@ -21,6 +21,7 @@ import logging
 import os # 追加
 import sqlite3 # 追加
 from config import OUTPUT_DIR # 追加
+from rule_engine import RuleEngine
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
@@ -29,15 +30,18 @@ logger = logging.getLogger(__name__)
 class T002PatternFixer:
     """T002問題パターン修正クラス"""
     
-    def __init__(self, db_file: str = os.path.join(OUTPUT_DIR, "master.db")):
+    def __init__(self, db_file: str = os.path.join(OUTPUT_DIR, "master.db"), debug_csv: bool = False):
         """
         初期化
         
         Args:
             db_file: SQLiteデータベースファイルのパス
+            debug_csv: load_compare_report でデバッグ用CSVを出力するか
         """
         self.db_file = db_file
+        self.debug_csv = debug_csv
         self.pattern_rules = self._load_pattern_rules()
+        self.engine = RuleEngine(db_file)
         self.df_compare = None
         
     def _load_pattern_rules(self) -> Dict[str, Any]:
@@ -51,7 +55,8 @@ class T002PatternFixer:
                     "zs65.txt",
                     "zs65_sss.txt"
                 ],
-                "rule": "register_missing_fields"
+                "rule": "register_missing_fields",
+                "query": {"inferred_types": [None, "", "Unknown"]}
             },
             
             # パターン2: DATETIME→TEXT修正
@@ -60,7 +65,8 @@ class T002PatternFixer:
                     "inferred_type": "DATETIME",
                     "actual_type_text_ratio": "> 50"
                 },
-                "action": "change_to_text"
+                "action": "change_to_text",
+                "query": {"inferred_types": ["DATETIME"], "actual_types": ["TEXT"]}
             },
             
             # パターン3: INTEGER→TEXT修正（特定フィールド）
@@ -75,7 +81,12 @@ class T002PatternFixer:
                     "inferred_type": "INTEGER",
                     "actual_type": "TEXT"
                 },
-                "action": "change_to_text"
+                "action": "change_to_text",
+                "query": {
+                    "inferred_types": ["INTEGER"],
+                    "actual_types": ["TEXT"],
+                    "column_regex": r"原価|単価|金額|価格|料金|費用"
+                }
             },
             
             # パターン4: 保管場所コード修正
@@ -86,7 +97,8 @@ class T002PatternFixer:
                     "inferred_type": "INTEGER",
                     "data_type": "numeric_code"
                 },
-                "action": "change_to_text"
+                "action": "change_to_text",
+                "query": {"files": ["zm114.txt"], "column_regex": "保管場所"}
             }
         }
         
@@ -100,27 +112,25 @@ class T002PatternFixer:
             # Actual_Typeは、analyzer.pyで推定されたInferred_Typeをそのまま使用
             self.df_compare = pd.read_sql_query("SELECT file_name AS File, column_name AS Column, initial_inferred_type AS Inferred_Type, data_type AS Actual_Type FROM column_master", conn)
             conn.close()
-            # デバッグ用: df_compareの内容をCSVに出力
-            debug_output_path = os.path.join(OUTPUT_DIR, "debug_df_compare.csv")
-            self.df_compare.to_csv(debug_output_path, index=False, encoding="utf-8-sig")
-            print(f"デバッグ: df_compareの内容を {debug_output_path} に出力しました。")
+            if self.debug_csv:
+                # デバッグ用: df_compareの内容をCSVに出力
+                debug_output_path = os.path.join(OUTPUT_DIR, "debug_df_compare.csv")
+                self.df_compare.to_csv(debug_output_path, index=False, encoding="utf-8-sig")
+                print(f"デバッグ: df_compareの内容を {debug_output_path} に出力しました。")
             print(f"column_masterテーブル読み込み完了: {len(self.df_compare)}行")
             return self.df_compare
         except Exception as e:
             logger.error(f"column_masterテーブル読み込みエラー: {e}")
             raise
     
+    def _query(self, rule_name: str) -> Dict[str, Any]:
+        """パターンルールの条件定義（SQLで評価）を取得"""
+        return self.pattern_rules[rule_name]["query"]
+    
     def analyze_pattern1_unregistered(self) -> pd.DataFrame:
         """パターン1: 未登録型の分析"""
-        if self.df_compare is None:
-            self.load_compare_report()
-        
         # 未登録型（Inferred_Type_が空またはNaN）
-        unregistered = self.df_compare[
-            (self.df_compare['Inferred_Type'].isna()) | 
-            (self.df_compare['Inferred_Type'] == '') |
-            (self.df_compare['Inferred_Type'] == 'Unknown')
-        ]
+        unregistered = self.engine.fetch_frame(self._query("unregistered_types"))
         
         logger.info(f"未登録型フィールド: {len(unregistered)}件")
         
@@ -137,67 +147,32 @@ class T002PatternFixer:
     
     def analyze_pattern2_datetime_issues(self) -> pd.DataFrame:
         """パターン2: DATETIME型の問題分析"""
-        if self.df_compare is None:
-            self.load_compare_report()
-        
-        print(f"デバッグ: analyze_pattern2_datetime_issues - df_compare.columns: {self.df_compare.columns}")
-        print(f"デバッグ: analyze_pattern2_datetime_issues - df_compare.head():\n{self.df_compare.head()}")
-
         # DATETIME推論だが実際はTEXTになっている
-        condition = (
-            (self.df_compare['Inferred_Type'] == 'DATETIME') &
-            (self.df_compare['Actual_Type'] == 'TEXT')
-        )
-        print(f"デバッグ: analyze_pattern2_datetime_issues - condition.sum(): {condition.sum()}")
-        datetime_issues = self.df_compare[condition]
+        datetime_issues = self.engine.fetch_frame(self._query("datetime_to_text"))
         
         print(f"DATETIME問題フィールド: {len(datetime_issues)}件")
         
-        # 詳細分析
-        summary = datetime_issues[['File', 'Column', 'Inferred_Type', 'Actual_Type']].copy()
-        
         print("=== DATETIME→TEXT修正対象 ===")
-        print(summary.head(10))
+        print(datetime_issues.head(10))
         
         return datetime_issues
     
     def analyze_pattern3_integer_issues(self) -> pd.DataFrame:
         """パターン3: INTEGER型の問題分析"""
-        if self.df_compare is None:
-            self.load_compare_report()
-        
-        # INTEGER推論だが実際はTEXTが多い
-        integer_issues = self.df_compare[
-            (self.df_compare['Inferred_Type'] == 'INTEGER') &
-            (self.df_compare['Actual_Type'] == 'TEXT')
-        ]
-        
-        # 金額・価格・原価・単価関連フィールドをフィルタ
-        price_related = integer_issues[
-            integer_issues['Column'].str.contains(
-                r'原価|単価|金額|価格|料金|費用', 
-                regex=True, 
-                na=False
-            )
-        ]
+        # INTEGER推論だが実際はTEXT、かつ金額・価格・原価・単価関連フィールド
+        price_related = self.engine.fetch_frame(self._query("integer_to_text"))
         
         logger.info(f"INTEGER→TEXT修正対象: {len(price_related)}件")
         
         print("=== INTEGER→TEXT修正対象（価格関連） ===")
-        print(price_related[['File', 'Column', 'Inferred_Type', 'Actual_Type']].head(10))
+        print(price_related.head(10))
         
         return price_related
     
     def analyze_pattern4_storage_location(self) -> pd.DataFrame:
         """パターン4: 保管場所コード問題分析"""
-        if self.df_compare is None:
-            self.load_compare_report()
-        
         # zm114.txtの保管場所関連フィールド
-        storage_issues = self.df_compare[
-            (self.df_compare['File'] == 'zm114.txt') &
-            (self.df_compare['Column'].str.contains('保管場所', na=False))
-        ]
+        storage_issues = self.engine.fetch_frame(self._query("storage_location_fix"))
         
         logger.info(f"保管場所コード問題: {len(storage_issues)}件")
         
@@ -207,7 +182,7 @@ class T002PatternFixer:
         return storage_issues
     
     def generate_fix_rules(self) -> Dict[str, List[Dict]]:
-        """修正ルールを生成"""
+        """修正ルールを生成（一致した行だけをSQLiteから取得）"""
         fix_rules = {
             "pattern1_fixes": [],
             "pattern2_fixes": [],
@@ -216,54 +191,42 @@ class T002PatternFixer:
         }
         
         # パターン1: 未登録型修正
-        unregistered = self.analyze_pattern1_unregistered()
-        for _, row in unregistered.iterrows():
-            # 実際の型から最適型を判定
-            if row['Actual_Type'] == 'TEXT':
-                suggested_type = 'TEXT'
-            elif row['Actual_Type'] == 'INTEGER':
-                suggested_type = 'INTEGER'  
-            elif row['Actual_Type'] == 'REAL':
-                suggested_type = 'REAL'
-            else:
-                suggested_type = 'TEXT'  # デフォルト
-                
+        for file_name, column_name, _, actual_type in self.engine.fetch(self._query("unregistered_types")):
+            # 実際の型から最適型を判定（TEXT/INTEGER/REAL以外はTEXT）
+            suggested_type = actual_type if actual_type in ('TEXT', 'INTEGER', 'REAL') else 'TEXT'
             fix_rules["pattern1_fixes"].append({
-                "file_name": row['File'],
-                "field_name": row['Column'],
+                "file_name": file_name,
+                "field_name": column_name,
                 "from_type": "Unknown",
                 "to_type": suggested_type,
                 "confidence": 1.0  # 実際の型に基づくため確信度高
             })
         
         # パターン2: DATETIME→TEXT修正
-        datetime_issues = self.analyze_pattern2_datetime_issues()
-        for _, row in datetime_issues.iterrows():
+        for file_name, column_name, _, actual_type in self.engine.fetch(self._query("datetime_to_text")):
             fix_rules["pattern2_fixes"].append({
-                "file_name": row['File'],
-                "field_name": row['Column'],
+                "file_name": file_name,
+                "field_name": column_name,
                 "from_type": "DATETIME",
                 "to_type": "TEXT",
-                "reason": f"DATETIME推論エラー (実際は{row['Actual_Type']})"
+                "reason": f"DATETIME推論エラー (実際は{actual_type})"
             })
         
         # パターン3: INTEGER→TEXT修正
-        integer_issues = self.analyze_pattern3_integer_issues()
-        for _, row in integer_issues.iterrows():
+        for file_name, column_name, _, actual_type in self.engine.fetch(self._query("integer_to_text")):
             fix_rules["pattern3_fixes"].append({
-                "file_name": row['File'],
-                "field_name": row['Column'],
+                "file_name": file_name,
+                "field_name": column_name,
                 "from_type": "INTEGER",
                 "to_type": "TEXT",
-                "reason": f"価格関連フィールド (実際は{row['Actual_Type']})"
+                "reason": f"価格関連フィールド (実際は{actual_type})"
             })
         
         # パターン4: 保管場所コード修正
-        storage_issues = self.analyze_pattern4_storage_location()
-        for _, row in storage_issues.iterrows():
+        for file_name, column_name, _, _ in self.engine.fetch(self._query("storage_location_fix")):
             fix_rules["pattern4_fixes"].append({
-                "file_name": row['File'],
-                "field_name": row['Column'],
+                "file_name": file_name,
+                "field_name": column_name,
                 "from_type": "INTEGER",
                 "to_type": "TEXT",
                 "reason": "保管場所コードは文字列として扱う"
@@ -300,8 +263,6 @@ class T002PatternFixer:
         logger.info("=== T002 修正パターン分析開始 ===")
         
         try:
-            self.load_compare_report()
-            
             print("\n" + "="*50)
             print("T002 データ型修正パターン分析結果")
             print("="*50)
@@ -15,6 +15,8 @@ import pandas as pd
 from config import OUTPUT_DIR, DB_FILE
 import os
 import logging
+from rule_versioning import RuleVersionStore, rule_target
+from schema_catalog import get_catalog
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -39,24 +41,11 @@ class T002RuleApplier:
     def analyze_current_schema(self):
         """現在のSQLiteスキーマの分析"""
         conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        
-        # テーブル一覧取得
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        
-        schema_info = {}
-        for table_name in tables:
-            table_name = table_name[0]
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-            
-            schema_info[table_name] = {
-                col[1]: col[2] for col in columns  # column_name: type
-            }
-        
-        conn.close()
-        return schema_info
+        try:
+            # 全テーブルの {列名: 型} をカタログから取得
+            return get_catalog(conn).schema()
+        finally:
+            conn.close()
     
     def apply_datetime_fixes(self):
         """DATETIME修正ルールの適用"""
@@ -208,6 +197,114 @@ class T002RuleApplier:
         
         return update_info
     
+    # column_masterに適用する修正ルール（pattern3はloader側の対象外）
+    APPLIED_FIX_GROUPS = ('pattern1_fixes', 'pattern2_fixes', 'pattern4_fixes')
+    
+    def _current_fixes(self):
+        """適用対象の修正ルール一覧（グループ名付き、バージョン管理用）"""
+        if not self.rules_data:
+            return []
+        return [
+            {'group': group, **fix}
+            for group in self.APPLIED_FIX_GROUPS
+            for fix in self.rules_data['fix_rules'].get(group, [])
+        ]
+    
+    def _remember_previous_types(self, store, rules):
+        """ルールを適用する前の列の型（analyze時の修正後の型）を記録
+        
+        適用済みのルールの対象列は既にルールの型になっているため記録しない。
+        """
+        applied_targets = {rule_target(rule) for rule in store.applied_rules('pattern_rules').values()}
+        conn = sqlite3.connect(self.db_file)
+        try:
+            types = {}
+            for rule in rules:
+                target = rule_target(rule)
+                if target in applied_targets or target in types:
+                    continue
+                row = conn.execute(
+                    "SELECT data_type FROM column_master WHERE file_name = ? AND column_name = ?", target
+                ).fetchone()
+                if row:
+                    types[target] = row[0]
+        finally:
+            conn.close()
+        store.remember_previous_types('pattern_rules', types)
+    
+    def run_incremental_application(self, reload=False):
+        """前回適用時からの差分ルールだけを適用
+        
+        Args:
+            reload: Trueの場合、影響を受けたファイルだけをloaderで再ロードする
+        
+        Returns:
+            RuleDelta（差分なしの場合は is_empty）
+        """
+        logger.info("=== T002修正ルール差分適用開始 ===")
+        
+        store = RuleVersionStore(self.db_file)
+        fixes = self._current_fixes()
+        delta = store.compute_delta('pattern_rules', fixes)
+        
+        if delta.is_empty and os.path.exists('t002_loader_updates.json'):
+            logger.info("前回適用時からルールの変更はありません")
+            return delta
+        
+        logger.info(f"ルール差分: {delta.summary()}")
+        
+        self._remember_previous_types(store, delta.added.values())
+        previous_types = store.previous_types('pattern_rules')
+        
+        conn = sqlite3.connect(self.db_file)
+        cursor = conn.cursor()
+        
+        # 削除されたルール: 他のルールの対象でなければルール適用前の型に戻す
+        # （記録がない古いルールは初期推定型に戻す）
+        current_targets = {rule_target(fix) for fix in fixes}
+        restored = set()
+        for rule in delta.removed.values():
+            file_name, column_name = rule_target(rule)
+            if (file_name, column_name) in current_targets:
+                continue
+            cursor.execute("""
+                UPDATE column_master
+                SET data_type = COALESCE(?, initial_inferred_type)
+                WHERE file_name = ? AND column_name = ?
+            """, (previous_types.get((file_name, column_name)), file_name, column_name))
+            restored.add((file_name, column_name))
+            logger.info(f"column_master復元: {file_name}:{column_name} -> ルール適用前の型")
+        
+        # 追加・変更されたルール
+        for rule in delta.added.values():
+            file_name, column_name = rule_target(rule)
+            cursor.execute("""
+                UPDATE column_master
+                SET data_type = ?
+                WHERE file_name = ? AND column_name = ?
+            """, (rule['to_type'], file_name, column_name))
+            logger.info(f"column_master更新: {file_name}:{column_name} -> {rule['to_type']}")
+        
+        conn.commit()
+        conn.close()
+        
+        self.generate_loader_updates()
+        
+        # 再ロードする場合は、再ロードが終わってから適用済みにする（失敗・中断時は次回も差分になる）
+        failed = []
+        if reload and delta.affected_files:
+            from loader import load_and_compare
+            logger.info(f"影響ファイルのみ再ロード: {delta.affected_files}")
+            failed = load_and_compare(target_files=delta.affected_files)
+        if failed:
+            logger.warning(f"再ロードに失敗したファイルがあるためルール差分を未適用のままにします: {failed}")
+        else:
+            store.mark_applied(delta)
+            store.forget_previous_types('pattern_rules', restored)
+        
+        logger.info("=== T002修正ルール差分適用完了 ===")
+        return delta
+    
     def run_full_application(self):
         """全修正ルールの適用"""
         logger.info("=== T002修正ルール適用開始 ===")
@@ -218,6 +315,8 @@ class T002RuleApplier:
             logger.info(f"データベース内テーブル数: {len(schema_info)}")
             
             # 各修正ルールの適用
+            store = RuleVersionStore(self.db_file)
+            self._remember_previous_types(store, self._current_fixes())
             self.apply_datetime_fixes()
             self.apply_storage_code_fixes()
             self.apply_unregistered_fixes() # 未登録型修正の適用を追加
@@ -225,6 +324,9 @@ class T002RuleApplier:
             # loader.py更新情報生成
             update_info = self.generate_loader_updates()
             
+            # 適用済みルールとして記録（次回以降は差分適用できる）
+            store.replace_all('pattern_rules', self._current_fixes())
+            
             logger.info("=== T002修正ルール適用完了 ===")
             logger.info(f"総修正件数: {update_info['total_overrides']}件")
             
@@ -9,8 +9,11 @@ import pandas as pd
 from pathlib import Path
 from typing import Dict, List, Tuple
 import json
-from collections import defaultdict, Counter
-from config import DB_FILE
+from collections import Counter
+from config import DB_FILE, PROFILE_SAMPLE_ROWS
+from schema_catalog import get_catalog
+from loader import sanitize_table_name
+import type_profiler
 
 class IntegrationReportGenerator:
     """データ型統合レポート生成クラス"""
@@ -39,9 +42,7 @@ class IntegrationReportGenerator:
         if not self.conn:
             return []
         
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'column_master'")
-        return [row[0] for row in cursor.fetchall()]
+        return get_catalog(self.conn).tables(exclude=('column_master',))
     
     def get_column_master_summary(self) -> pd.DataFrame:
         """column_masterからの推定型サマリーを取得"""
@@ -64,29 +65,107 @@ class IntegrationReportGenerator:
         if not self.conn:
             return {}
         
-        tables = self.get_table_list()
-        type_count = defaultdict(int)
-        
-        for table in tables:
-            try:
-                cursor = self.conn.cursor()
-                cursor.execute(f"PRAGMA table_info({table})")
-                columns = cursor.fetchall()
-                
-                for col in columns:
-                    col_type = col[2].upper()  # 型情報
-                    type_count[col_type] += 1
-                    
-            except Exception as e:
-                print(f"テーブル {table} の情報取得失敗: {e}")
-                continue
-        
-        return dict(type_count)
+        try:
+            return get_catalog(self.conn).type_distribution(exclude=('column_master',))
+        except Exception as e:
+            print(f"テーブル情報の取得失敗: {e}")
+            return {}
     
-    def analyze_type_consistency(self) -> pd.DataFrame:
-        """推定型と実際の型の整合性分析"""
+    def analyze_type_consistency(self, sample_rows: int = PROFILE_SAMPLE_ROWS) -> pd.DataFrame:
+        """推定型と実際の型の整合性分析
+        
+        宣言型（テーブル定義）に加え、typeof() による実際の格納型の分布で比較する。
+        プロファイル未作成のテーブルはここで作成する（sample_rows を超えるテーブルはサンプリング）。
+        """
         if not self.conn:
             return pd.DataFrame()
         
         # テーブル一覧を取得
-        tables = self.get_table_list
\ No newline at end of file
+        tables = set(self.get_table_list())
+        type_profiler.init_tables(self.conn)
+        profiled = {row[0] for row in self.conn.execute("SELECT DISTINCT table_name FROM column_type_profile")}
+        
+        for (file_name,) in self.conn.execute("SELECT DISTINCT file_name FROM column_master").fetchall():
+            table = sanitize_table_name(file_name)
+            if table in tables and table not in profiled:
+                try:
+                    type_profiler.profile_and_save(self.conn, table, file_name, sample_rows)
+                except Exception as e:
+                    print(f"テーブル {table} のプロファイル失敗: {e}")
+        
+        df = pd.read_sql_query("""
+            SELECT m.file_name AS File, p.table_name AS "Table", m.column_name AS Column,
+                   m.data_type AS Inferred_Type, p.declared_type AS Declared_Type,
+                   p.dominant_type AS Stored_Type, p.total AS Profiled_Rows, p.null_count AS Null_Count,
+                   p.foreign_count AS Foreign_Count, p.sampled AS Sampled
+            FROM column_master AS m
+            JOIN column_type_profile AS p ON p.file_name = m.file_name AND p.column_name = m.column_name
+            ORDER BY m.file_name, m.column_name
+        """, self.conn)
+        if df.empty:
+            return df
+        
+        non_null = (df['Profiled_Rows'] - df['Null_Count']).where(lambda x: x > 0)
+        df['Foreign_Ratio'] = (df['Foreign_Count'] / non_null).fillna(0.0).round(4)
+        df['Consistent'] = (
+            (df['Inferred_Type'].fillna('').str.upper() == df['Declared_Type'].fillna('').str.upper()) &
+            (df['Foreign_Count'] == 0)
+        )
+        return df
+    
+    def get_stored_type_summary(self) -> Dict[str, int]:
+        """実際の格納型（typeof の最頻値）ごとの列数"""
+        if not self.conn:
+            return {}
+        type_profiler.init_tables(self.conn)
+        rows = self.conn.execute("""
+            SELECT dominant_type, COUNT(*) FROM column_type_profile
+            GROUP BY dominant_type ORDER BY COUNT(*) DESC
+        """).fetchall()
+        return dict(rows)
+    
+    def generate_report(self) -> Dict[str, object]:
+        """統合レポートを表示し、集計結果を返す"""
+        print("=== T003: 統合型レポート ===")
+        master_summary = self.get_column_master_summary()
+        schema_summary = self.get_actual_table_schema_summary()
+        consistency = self.analyze_type_consistency()
+        stored_summary = self.get_stored_type_summary()
+        
+        print("\n[column_master 推定型]")
+        print(master_summary.to_string(index=False) if not master_summary.empty else "  データなし")
+        print("\n[テーブル宣言型]")
+        for dtype, count in sorted(schema_summary.items(), key=lambda x: -x[1]):
+            print(f"  {dtype}: {count}")
+        print("\n[実際の格納型（typeof）]")
+        for dtype, count in stored_summary.items():
+            print(f"  {dtype}: {count}")
+        
+        inconsistent = consistency[~consistency['Consistent']] if not consistency.empty else consistency
+        print(f"\n[整合性] 対象列: {len(consistency)} / 不整合: {len(inconsistent)}")
+        if not inconsistent.empty:
+            worst = inconsistent.sort_values('Foreign_Ratio', ascending=False).head(20)
+            for _, row in worst.iterrows():
+                print(f"  {row['File']}:{row['Column']} 推定={row['Inferred_Type']} 宣言={row['Declared_Type']} "
+                      f"格納={row['Stored_Type']} 異質な値={row['Foreign_Ratio']:.1%}")
+        
+        return {
+            "column_master": master_summary,
+            "declared_types": schema_summary,
+            "stored_types": stored_summary,
+            "consistency": consistency,
+        }
+
+
+def main():
+    generator = IntegrationReportGenerator()
+    if not generator.connect():
+        return
+    try:
+        generator.generate_report()
+    finally:
+        generator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,12 @@ GUI操作からデータベース反映までの一貫性確保
 
 import json
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 import sqlite3
 from config import DB_FILE
+from column_index import find_columns
 import pattern_rules
+from rule_versioning import RuleDelta, RuleVersionStore
 
 class RuleIntegrationManager:
     """パターンルール管理とloader.py統合の管理クラス"""
@@ -38,11 +40,12 @@ class RuleIntegrationManager:
         code_fields = business_rules.get('code_fields', [])
         if '保管場所' in code_fields:
             # データベースから保管場所フィールドを持つファイルを取得
-            storage_files = self._get_files_with_field('保管場所')
-            for file_name in storage_files:
+            # 表記ゆれ（全角/半角など）のある列も実際の列名でオーバーライドする
+            storage_columns = self._get_columns_with_fields(['保管場所'])['保管場所']
+            for file_name, column_name in storage_columns:
                 loader_updates["storage_code_fields"].append({
                     "file": file_name,
-                    "field": "保管場所", 
+                    "field": column_name, 
                     "action": "force_text"
                 })
         
@@ -73,23 +76,22 @@ class RuleIntegrationManager:
     
     def _get_files_with_field(self, field_name: str) -> List[str]:
         """指定されたフィールド名を持つファイル一覧を取得"""
+        return sorted({file_name for file_name, _ in self._get_columns_with_fields([field_name])[field_name]})
+
+    def _get_columns_with_fields(self, field_names: List[str], mode: str = 'normalized') -> Dict[str, List[Tuple[str, str]]]:
+        """複数のフィールド名について、該当列を持つ (ファイル名, 実際の列名) を1回の検索で取得
+        
+        列名インデックスを使い、全角/半角・大文字/小文字の違いは同一視する
+        """
         try:
             conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
-            
-            # column_masterから該当フィールドを持つファイルを検索
-            cursor.execute(
-                "SELECT DISTINCT file_name FROM column_master WHERE column_name = ?", 
-                (field_name,)
-            )
-            
-            files = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            return files
-            
+            try:
+                return find_columns(conn, field_names, mode)
+            finally:
+                conn.close()
         except Exception as e:
-            print(f"エラー: フィールド {field_name} を持つファイル検索中: {e}")
-            return []
+            print(f"エラー: フィールド {', '.join(field_names)} を持つファイル検索中: {e}")
+            return {name: [] for name in field_names}
     
     def update_loader_updates_file(self) -> bool:
         """ルールに基づいてt002_loader_updates.jsonを更新"""
@@ -110,15 +112,58 @@ class RuleIntegrationManager:
             print(f"❌ エラー: loader更新ファイル生成中: {e}")
             return False
     
-    def sync_gui_to_loader(self) -> bool:
-        """GUIの変更をloader.pyに即座に反映"""
-        success = self.update_loader_updates_file()
+    @staticmethod
+    def _override_rules(loader_updates: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """オーバーライド一覧をバージョン管理用のルール一覧に変換"""
+        return [
+            {"category": category, **item}
+            for category in ("datetime_override_fields", "storage_code_fields")
+            for item in loader_updates.get(category, [])
+        ]
+    
+    def write_loader_updates(self) -> Optional[RuleDelta]:
+        """GUIの変更をt002_loader_updates.jsonに書き出し、まだ再ロードしていない差分を返す
         
-        if success:
-            print("🔄 GUI設定がloader.pyに反映されました")
-            print("💡 変更を適用するには 'python loader.py' を再実行してください")
+        影響ファイルがない差分はその場で適用済みにする。書き出しに失敗した場合はNone。
+        影響ファイルがある差分は、呼び出し側が再ロードした後に RuleVersionStore.mark_applied で適用済みにする。
+        """
+        store = RuleVersionStore(DB_FILE)
+        delta = store.compute_delta(
+            "loader_updates", self._override_rules(self.generate_loader_updates_from_rules())
+        )
+        
+        if delta.is_empty and Path(self.loader_updates_file).exists():
+            print("✅ 前回の同期からルールの変更はありません")
+            return delta
+        
+        if not self.update_loader_updates_file():
+            return None
+        
+        print(f"🔄 GUI設定がloader.pyに反映されました ({delta.summary()})")
+        if not delta.affected_files:
+            store.mark_applied(delta)
+        return delta
+    
+    def sync_gui_to_loader(self, reload: bool = True) -> bool:
+        """GUIの変更をloader.pyに反映し、影響を受けたファイルだけを再ロード"""
+        delta = self.write_loader_updates()
+        if delta is None:
+            return False
+        
+        if not delta.affected_files:
+            return True
+        if reload:
+            from loader import load_and_compare
+            print(f"🔄 影響ファイルのみ再ロードします: {', '.join(delta.affected_files)}")
+            failed = load_and_compare(target_files=delta.affected_files)
+            if failed:
+                print(f"❌ 再ロードに失敗したファイルがあります（次回の同期で再ロードします）: {', '.join(failed)}")
+                return False
+            RuleVersionStore(DB_FILE).mark_applied(delta)
+        else:
+            print(f"💡 変更を適用するには次のファイルを再ロードしてください: {', '.join(delta.affected_files)}")
         
-        return success
+        return True
     
     def get_current_rule_status(self) -> Dict[str, Any]:
         """現在のルール適用状況を取得"""
@@ -182,7 +227,7 @@ def main():
     print("\n💡 使用方法:")
     print("1. StreamlitでGUI操作を行う")
     print("2. RuleIntegrationManager.sync_gui_to_loader() を呼び出す")  
-    print("3. python loader.py を実行してデータベースに反映")
+    print("3. 影響を受けたファイルだけが自動で再ロードされます")
 
 if __name__ == "__main__":
     main()
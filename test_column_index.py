@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+列名インデックス（正規化・部分一致検索）のテスト
+"""
+
+import sqlite3
+import unittest
+
+from column_index import find_columns, find_files, normalize_column_name
+
+
+class TestColumnIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("CREATE TABLE column_master (file_name TEXT, column_name TEXT, PRIMARY KEY (file_name, column_name))")
+        self.conn.executemany("INSERT INTO column_master VALUES (?, ?)", [
+            ('zm114.txt', '保管場所'),
+            ('zp02.txt', '入庫保管場所'),
+            ('zs65.txt', 'ＰＬＡＮＴ'),
+            ('zs45.txt', 'Plant Code'),
+            ('zs45.txt', '品目'),
+        ])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_normalize_column_name(self):
+        self.assertEqual(normalize_column_name('ＰＬＡＮＴ'), 'plant')
+        self.assertEqual(normalize_column_name(' Plant Code '), 'plantcode')
+
+    def test_batch_lookup_modes(self):
+        names = ['保管場所', 'plant', '品目', '存在しない列']
+        exact = find_files(self.conn, names, 'exact')
+        self.assertEqual(exact['保管場所'], ['zm114.txt'])
+        self.assertEqual(exact['plant'], [])
+
+        normalized = find_files(self.conn, names, 'normalized')
+        self.assertEqual(normalized['plant'], ['zs65.txt'])
+        self.assertEqual(normalized['存在しない列'], [])
+
+        partial = find_columns(self.conn, names, 'partial')
+        self.assertEqual(partial['保管場所'], [('zm114.txt', '保管場所'), ('zp02.txt', '入庫保管場所')])
+        self.assertEqual(partial['plant'], [('zs45.txt', 'Plant Code'), ('zs65.txt', 'ＰＬＡＮＴ')])
+        self.assertEqual(partial['品目'], [('zs45.txt', '品目')])
+        self.assertEqual(find_files(self.conn, ['品'], 'partial')['品'], ['zs45.txt'])
+
+    def test_index_follows_column_master(self):
+        find_files(self.conn, ['品目'])
+        self.conn.execute("INSERT INTO column_master VALUES ('zm29.txt', '品目')")
+        self.assertEqual(find_files(self.conn, ['品目'])['品目'], ['zm29.txt', 'zs45.txt'])
+
+        # 件数が変わらない列名の変更も反映する
+        self.conn.execute("UPDATE column_master SET column_name = '品目コード' WHERE file_name = 'zm29.txt'")
+        self.assertEqual(find_files(self.conn, ['品目コード'])['品目コード'], ['zm29.txt'])
+        self.assertEqual(find_files(self.conn, ['品目'])['品目'], ['zs45.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+DataFrameのメモリ削減のテスト
+"""
+
+import sqlite3
+
+import pandas as pd
+
+from compact_frame import MemoryReport, compact_frame
+from loader import apply_conversion_plan, build_conversion_plan, write_chunk
+
+
+def stock_frame(rows=1000):
+    return pd.DataFrame({
+        "品目": [f"A{i:06d}" for i in range(rows)],
+        "保管場所": [f"{i % 5:04d}" for i in range(rows)],
+        "数量": [str(i % 100) for i in range(rows)],
+        "単価": [f"{i % 7},5" for i in range(rows)],
+        "金額": [f"{i}.1" for i in range(rows)],
+    }, dtype=object)
+
+
+def test_compact_types_keep_sqlite_values():
+    """カテゴリ・小さい整数型・float32 にしても、SQLiteの列型と値は変わらないこと"""
+    plan = build_conversion_plan(["品目", "保管場所", "数量", "単価", "金額"],
+                                 {"品目": "TEXT", "保管場所": "TEXT", "数量": "INTEGER", "単価": "REAL", "金額": "REAL"},
+                                 "stock.txt", set())
+    expected = apply_conversion_plan(stock_frame(), plan)
+    compact = compact_frame(apply_conversion_plan(stock_frame(), plan))
+
+    assert isinstance(compact["保管場所"].dtype, pd.CategoricalDtype)
+    assert str(compact["数量"].dtype) == "Int8"
+    assert str(compact["単価"].dtype) == "float32"
+    assert str(compact["金額"].dtype) == "float64"  # float32では丸められる値はそのまま
+
+    tables = {}
+    for name, df in (("expected", expected), ("compact", compact)):
+        conn = sqlite3.connect(":memory:")
+        write_chunk(df, "stock", conn, replace=True)
+        tables[name] = (conn.execute("SELECT * FROM stock").fetchall(),
+                        [row[2] for row in conn.execute("PRAGMA table_info(stock)")])
+    assert tables["compact"] == tables["expected"]
+
+
+def test_memory_report_and_in_place_conversion():
+    """copy=False の変換はチャンクをそのまま書き換え、削減量が記録されること"""
+    plan = build_conversion_plan(["保管場所", "数量"], {"保管場所": "TEXT", "数量": "INTEGER"}, "stock.txt", set())
+    chunk = stock_frame()[["保管場所", "数量"]]
+    report = MemoryReport("stock")
+    result = report.convert(chunk, lambda c: apply_conversion_plan(c, plan, copy=False))
+
+    assert result is chunk
+    assert report.after_bytes < report.before_bytes / 4
+    assert "削減" in report.summary()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+比較レポート（compare_report テーブル・ビュー）のテスト
+"""
+
+import csv
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import compare_report
+
+
+def _row(file_name, column, inferred, actual):
+    return {"File": file_name, "Column": column, "Inferred_Type": inferred, "Actual_Type": actual,
+            "Match": "○" if inferred == actual else "×", "Encoding": "cp932", "Delimiter": "\t"}
+
+
+class TestCompareReport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmp_dir.name, 'master.db'))
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp_dir.cleanup()
+
+    def test_partial_run_replaces_only_reloaded_files(self):
+        compare_report.save_run(self.conn, [
+            _row('zm114.txt', '保管場所', 'INTEGER', 'TEXT'),
+            _row('zs45.txt', 'TecComp', 'DATETIME', 'TEXT'),
+        ])
+        run_id = compare_report.save_run(self.conn, [_row('zm114.txt', '保管場所', 'TEXT', 'TEXT')],
+                                         target_files=['zm114.txt'])
+
+        latest = compare_report.fetch_frame(self.conn)
+        self.assertEqual(list(latest['File']), ['zm114.txt', 'zs45.txt'])
+        self.assertEqual(list(latest['Inferred_Type']), ['TEXT', 'DATETIME'])
+        self.assertEqual(list(compare_report.fetch_frame(self.conn, 'datetime_to_text')['Column']), ['TecComp'])
+        self.assertTrue(compare_report.fetch_frame(self.conn, 'storage_location').empty)
+
+        # 過去の実行結果も保持される
+        history = self.conn.execute("SELECT COUNT(*) FROM compare_report").fetchone()[0]
+        self.assertEqual(history, 3)
+        self.assertEqual(self.conn.execute("SELECT MAX(run_id) FROM compare_runs").fetchone()[0], run_id)
+
+    def test_full_run_drops_files_missing_from_it(self):
+        """全件ロードで結果がなかったファイルの古い結果は最新に含めないこと"""
+        compare_report.save_run(self.conn, [_row('a.txt', 'c', 'TEXT', 'TEXT'), _row('b.txt', 'c', 'TEXT', 'TEXT')])
+        compare_report.save_run(self.conn, [_row('a.txt', 'c', 'INTEGER', 'INTEGER')])
+        self.assertEqual(list(compare_report.fetch_frame(self.conn)['File']), ['a.txt'])
+
+        compare_report.save_run(self.conn, [_row('b.txt', 'c', 'REAL', 'REAL')], target_files=['b.txt'])
+        self.assertEqual(list(compare_report.fetch_frame(self.conn)['Inferred_Type']), ['INTEGER', 'REAL'])
+
+        # 2回目以降の初期化ではビューを作り直さない
+        version = self.conn.execute("PRAGMA schema_version").fetchone()[0]
+        compare_report.init_tables(self.conn)
+        self.assertEqual(self.conn.execute("PRAGMA schema_version").fetchone()[0], version)
+
+    def test_export_csv_streams_latest_rows(self):
+        compare_report.save_run(self.conn, [_row('a.txt', f'c{i}', 'TEXT', 'TEXT') for i in range(5)])
+        path = os.path.join(self.tmp_dir.name, 'compare_report.csv')
+        self.assertEqual(compare_report.export_csv(self.conn, path, chunk_size=2), 5)
+
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['Delimiter'], '\t')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+圧縮入力（.gz / .zip）のテスト
+"""
+
+import gzip
+import os
+import tempfile
+import unittest
+import zipfile
+
+from compressed_input import list_members, open_text, physical_names
+from loader import SimpleFileProcessor
+from staging_cache import StagingCache
+
+
+class TestCompressedInput(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = self.tmp_dir.name
+        self.stock = "品目\t保管場所\t数量\nA001\t0001\t10\nA002\t0002\t5-\n"
+
+        with gzip.open(os.path.join(self.data_dir, 'zs65.txt.gz'), 'wb') as f:
+            f.write(self.stock.encode('cp932'))
+        with zipfile.ZipFile(os.path.join(self.data_dir, 'drop.zip'), 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('2024/stock.csv', "品目,工場\nB001,P100\n")
+            zf.writestr('2024/orders.txt', self.stock)
+            zf.writestr('2024/run.log', "ignored")
+            zf.writestr('2024/', '')
+
+        self.processor = SimpleFileProcessor(cache=StagingCache(os.path.join(self.data_dir, 'staging')))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_members_use_inner_file_names(self):
+        self.assertEqual(list_members(os.path.join(self.data_dir, 'zs65.txt.gz')), [('zs65.txt', None)])
+        self.assertEqual(list_members(os.path.join(self.data_dir, 'drop.zip')),
+                         [('stock.csv', '2024/stock.csv'), ('orders.txt', '2024/orders.txt')])
+
+    def test_duplicate_member_names_keep_first(self):
+        """別フォルダの同名メンバーは最初のものだけを論理ファイルにすること"""
+        path = os.path.join(self.data_dir, 'dup.zip')
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('a/x.txt', "品目\nA001\n")
+            zf.writestr('b/x.txt', "品目\nB001\n")
+        self.assertEqual(list_members(path), [('x.txt', 'a/x.txt')])
+        df = next(self.processor.iter_inputs(path))[1]
+        self.assertEqual(df['品目'].tolist(), ['A001'])
+
+    def test_streams_decode_like_plain_files(self):
+        with open_text(os.path.join(self.data_dir, 'zs65.txt.gz'), 'cp932') as f:
+            self.assertEqual(f.read(), self.stock)
+
+        inputs = list(self.processor.iter_inputs(os.path.join(self.data_dir, 'zs65.txt.gz')))
+        self.assertEqual(len(inputs), 1)
+        name, df, encoding, delimiter = inputs[0]
+        self.assertEqual((name, encoding, delimiter), ('zs65.txt', 'cp932', '\t'))
+        self.assertEqual(df['保管場所'].tolist(), ['0001', '0002'])
+
+    def test_multi_member_zip(self):
+        inputs = {name: (df, delimiter) for name, df, _, delimiter
+                  in self.processor.iter_inputs(os.path.join(self.data_dir, 'drop.zip'))}
+        self.assertEqual(set(inputs), {'stock.csv', 'orders.txt'})
+        self.assertEqual(inputs['stock.csv'][1], ',')
+        self.assertEqual(inputs['stock.csv'][0]['工場'].tolist(), ['P100'])
+        self.assertEqual(len(inputs['orders.txt'][0]), 2)
+
+    def test_physical_names_for_partial_reload(self):
+        files = ['zs65.txt.gz', 'drop.zip', 'plain.txt']
+        self.assertEqual(physical_names({'orders.txt', 'plain.txt'}, self.data_dir, files), {'drop.zip', 'plain.txt'})
+        self.assertEqual(physical_names({'zs65.txt'}, self.data_dir, files), {'zs65.txt.gz'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+分散ロード（ジョブキュー・ワーカー・取り込み）のテスト
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from functools import partial
+from unittest import mock
+
+import pandas as pd
+
+from distributed_loader import merge_batch, run_worker
+from staging_cache import StagingCache
+from work_queue import WorkQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.queue = WorkQueue(os.path.join(self.tmp_dir.name, 'queue.db'), lease_seconds=60,
+                               max_attempts=2, clock=self.clock)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_claim_is_exclusive(self):
+        self.assertEqual(self.queue.enqueue("b1", ["a.txt", "b.txt", "a.txt"]), 2)
+        first, second = self.queue.claim("w1"), self.queue.claim("w2")
+        self.assertEqual({first.file_name, second.file_name}, {"a.txt", "b.txt"})
+        self.assertIsNone(self.queue.claim("w3"))
+        self.assertEqual(self.queue.counts("b1"), {"running": 2})
+
+    def test_expired_lease_is_reclaimed_and_stale_result_rejected(self):
+        self.queue.enqueue("b1", ["a.txt"])
+        stale = self.queue.claim("w1")
+        self.clock.now += 30
+        self.assertTrue(self.queue.heartbeat(stale, "w1"))
+        self.clock.now += 61
+        job = self.queue.claim("w2")
+        self.assertEqual((job.job_id, job.attempts), (stale.job_id, 2))
+        # リースを失ったワーカーの延長・完了報告は受け付けない
+        self.assertFalse(self.queue.heartbeat(stale, "w1"))
+        self.assertFalse(self.queue.complete(stale, "w1", "w1.db", {"tables": [], "rows": []}))
+        self.assertTrue(self.queue.complete(job, "w2", "w2.db", {"tables": ["a"], "rows": []}))
+        self.assertEqual([j["staging_db"] for j in self.queue.done_jobs("b1")], ["w2.db"])
+        self.assertFalse(self.queue.has_open_jobs())
+
+    def test_failed_job_retries_until_max_attempts(self):
+        self.queue.enqueue("b1", ["a.txt"])
+        self.queue.fail(self.queue.claim("w1"), "w1", "読み込み失敗")
+        self.assertEqual(self.queue.counts("b1"), {"pending": 1})
+        self.queue.fail(self.queue.claim("w1"), "w1", "読み込み失敗")
+        self.assertEqual(self.queue.failures("b1"), [{"file_name": "a.txt", "error": "読み込み失敗"}])
+        self.assertIsNone(self.queue.claim("w1"))
+
+    def test_claims_are_scoped_to_batch_and_abandoned_batch_is_cancelled(self):
+        self.queue.enqueue("old", ["a.txt", "b.txt"])
+        stale = self.queue.claim("w1")
+        self.queue.start_batch("new", ["c.txt"], ["c.txt"], "2024-01-01T00:00:00")
+        self.assertEqual(self.queue.open_batches(), ["new", "old"])
+        self.assertEqual(self.queue.claim("w2", "new").file_name, "c.txt")
+        self.assertIsNone(self.queue.claim("w3", "new"))
+        self.assertFalse(self.queue.has_open_jobs("none"))
+
+        self.assertEqual(self.queue.cancel_batch("old"), 2)
+        self.assertEqual(self.queue.open_batches(), ["new"])
+        self.assertFalse(self.queue.complete(stale, "w1", "w1.db", {"tables": [], "rows": []}))
+        self.assertEqual(self.queue.batch_info("new"), (["c.txt"], "2024-01-01T00:00:00"))
+
+
+class TestDistributedLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, 'data')
+        os.makedirs(self.data_dir)
+        self.master_db = os.path.join(self.tmp_dir.name, 'master.db')
+        conn = sqlite3.connect(self.master_db)
+        conn.execute("""
+            CREATE TABLE column_master (
+                file_name TEXT, column_name TEXT, data_type TEXT, initial_inferred_type TEXT,
+                encoding TEXT, delimiter TEXT, date_format TEXT, sap_rules TEXT,
+                PRIMARY KEY (file_name, column_name)
+            )
+        """)
+        for name in ("stock.txt", "ship.txt"):
+            conn.executemany("INSERT INTO column_master VALUES (?, ?, ?, ?, 'utf-8', '\t', NULL, NULL)",
+                             [(name, "品目", "TEXT", "TEXT"), (name, "数量", "INTEGER", "INTEGER")])
+            with open(os.path.join(self.data_dir, name), 'w', encoding='utf-8') as f:
+                f.write("品目\t数量\n" + "".join(f"A{i}\t{i}\n" for i in range(20)))
+        conn.commit()
+        conn.close()
+        self.queue = WorkQueue(os.path.join(self.tmp_dir.name, 'queue.db'))
+        # ワーカーの読み込みキャッシュも output/ ではなく一時ディレクトリに書く
+        cache_patch = mock.patch('loader.StagingCache', partial(StagingCache, os.path.join(self.tmp_dir.name, 'cache')))
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_workers_load_into_staging_and_coordinator_merges(self):
+        self.queue.enqueue("b1", ["stock.txt", "ship.txt", "missing.txt"])
+        completed = run_worker("w1", queue_db=self.queue.db_file, data_dir=self.data_dir,
+                               master_db=self.master_db, staging_dir=os.path.join(self.tmp_dir.name, 'staging'),
+                               poll_seconds=0)
+        self.assertEqual(completed, 3)
+
+        conn = sqlite3.connect(self.master_db)
+        try:
+            self.assertEqual(merge_batch(conn, self.queue, "b1"), 3)
+            rows = self.queue.merged_rows("b1")
+            self.assertEqual({row["File"] for row in rows}, {"stock.txt", "ship.txt"})
+            df = pd.read_sql_query("SELECT * FROM stock", conn)
+            self.assertEqual(df["数量"].tolist(), list(range(20)))
+            types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(stock)")}
+            self.assertEqual(types["数量"], "INTEGER")
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM column_type_profile WHERE table_name = 'ship'")
+                             .fetchone()[0], 2)
+            # ワーカーのステージングDBの column_master で master.db 側が消えていないこと
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM column_master").fetchone()[0], 4)
+        finally:
+            conn.close()
+        self.assertEqual(self.queue.counts("b1"), {"merged": 3})
+        self.assertEqual(os.listdir(os.path.join(self.tmp_dir.name, 'staging')), [])
+
+    def test_merge_error_is_retried_then_failed(self):
+        self.queue.enqueue("b1", ["stock.txt"])
+        job = self.queue.claim("w1")
+        missing = os.path.join(self.tmp_dir.name, 'missing', 'staging.db')
+        self.queue.complete(job, "w1", missing, {"tables": ["stock"], "rows": []})
+        conn = sqlite3.connect(self.master_db)
+        try:
+            errors = {}
+            self.assertEqual(merge_batch(conn, self.queue, "b1", errors), 0)
+            self.assertEqual(self.queue.counts("b1"), {"done": 1})
+            for _ in range(2):
+                merge_batch(conn, self.queue, "b1", errors)
+        finally:
+            conn.close()
+        self.assertEqual(self.queue.counts("b1"), {"failed": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
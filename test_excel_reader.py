@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Excelストリーミング読み込みのテスト
+"""
+
+import os
+import tempfile
+import unittest
+
+from openpyxl import Workbook
+
+from excel_reader import iter_sheet_chunks, read_sheet, read_workbook, split_logical_name
+from loader import sanitize_table_name
+
+
+class TestExcelReader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'book.xlsx')
+        wb = Workbook()
+        ws = wb.active
+        ws.title = '在庫'
+        ws.append(['品目', None, '数量', '数量'])
+        for i in range(25):
+            ws.append([f'A{i:03d}', 'x', float(i), 1.5])
+        wb.create_sheet('空')
+        wb.create_sheet('工場').append(['工場'])
+        wb['工場'].append(['P100'])
+        wb.save(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_header_and_values_match_read_excel(self):
+        df = read_sheet(self.path, '在庫')
+        self.assertEqual(list(df.columns), ['品目', 'Unnamed: 1', '数量', '数量.1'])
+        self.assertEqual(len(df), 25)
+        self.assertEqual(df.iloc[3].tolist(), ['A003', 'x', '3', '1.5'])
+
+    def test_chunks_are_bounded(self):
+        chunks = list(iter_sheet_chunks(self.path, '在庫', chunksize=10))
+        self.assertEqual([len(c) for c in chunks], [10, 10, 5])
+        self.assertEqual(len(read_sheet(self.path, '在庫', nrows=7)), 7)
+
+    def test_every_sheet_is_a_logical_file(self):
+        sheets = read_workbook(self.path)
+        self.assertEqual([name for name, _, _ in sheets], ['book.xlsx#在庫', 'book.xlsx#工場'])
+        self.assertEqual(split_logical_name('book.xlsx#工場'), ('book.xlsx', '工場'))
+        self.assertEqual(split_logical_name('a#b.txt'), ('a#b.txt', None))
+        self.assertEqual(sanitize_table_name('book.xlsx#工場'), 'book_工場')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+固定長（SAPリスト出力）解析のテスト
+"""
+
+import numpy as np
+
+from fixed_width import read_fixed_width, separator_mask
+
+
+def pad(text, width):
+    """表示幅（cp932のバイト数）でそろえる"""
+    return text + ' ' * (width - len(text.encode('cp932')))
+
+
+def write_list(path, encoding, rows):
+    lines = [pad('品目コード', 11) + pad('品目テキスト', 22) + pad('数量', 10) + '入庫日',
+             '-' * 52]
+    for i, (code, text, qty, date) in enumerate(rows):
+        lines.append(pad(code, 11) + pad(text, 22) + f"{qty:>8}  " + date)
+        if i == 1:
+            lines += ['', lines[0], '=' * 52]  # 改ページ（空行・見出しの繰り返し・罫線）
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        f.write("\r\n".join(lines) + "\r\n")
+
+
+ROWS = [("A0001", "ボルト M8 x 20", 120, "2024/01/05"),
+        ("A0002", "ナット", 5, "2024/01/06"),
+        ("B0100", "ワッシャー 平 M8", 1500, "2024/02/01"),
+        ("B0101", "スプリング ワッシャー", 12, "2024/02/03 12:00")]
+
+
+def test_values_with_spaces_stay_in_one_column(tmp_path):
+    """値の中の空白で列が分かれず、見出し・罫線・改ページを除いて読めること"""
+    for encoding in ('cp932', 'utf-8'):
+        path = tmp_path / f"list_{encoding}.txt"
+        write_list(path, encoding, ROWS)
+        df = read_fixed_width(str(path), encoding)
+        assert list(df.columns) == ['品目コード', '品目テキスト', '数量', '入庫日']
+        assert df['品目テキスト'].tolist() == [row[1] for row in ROWS]
+        assert df['数量'].tolist() == [str(row[2]) for row in ROWS]
+        assert df['入庫日'].iloc[-1] == '2024/02/03 12:00'  # 最後の列は行末まで
+
+
+def test_row_limit_and_non_fixed_width(tmp_path):
+    """行数の上限を守り、タブ区切りなど固定長でないファイルはNoneを返すこと"""
+    path = tmp_path / "list.txt"
+    write_list(path, 'cp932', ROWS)
+    assert len(read_fixed_width(str(path), 'cp932', nrows=3)) == 3
+
+    tsv = tmp_path / "data.tsv"
+    tsv.write_text("a\tb\n1\t2\n", encoding='utf-8')
+    assert read_fixed_width(str(tsv), 'utf-8') is None
+
+
+def test_cp932_trail_byte_is_not_a_rule(tmp_path):
+    """2バイト目が 0x7C の全角文字（ポ・掛・竹）で見出しの語・列が分かれないこと"""
+    assert separator_mask(np.frombuffer('ポ|'.encode('cp932'), dtype=np.uint8)).tolist() == [False, False, True]
+    lines = [pad('ポンプ番号', 12) + pad('掛率', 8) + '竹'] + \
+            [pad(f'ポ{i}', 12) + pad(f'掛{i}', 8) + f'竹{i}' for i in range(3)]
+    path = tmp_path / "pump.txt"
+    path.write_bytes("\r\n".join(lines).encode('cp932') + b"\r\n")
+    df = read_fixed_width(str(path), 'cp932')
+    assert list(df.columns) == ['ポンプ番号', '掛率', '竹']
+    assert df['ポンプ番号'].tolist() == ['ポ0', 'ポ1', 'ポ2']
+    assert df['竹'].tolist() == ['竹0', '竹1', '竹2']
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+型推定のメモ（InferenceMemo）のテスト
+"""
+
+import os
+import sqlite3
+
+import analyzer
+import pytest
+from inference_memo import InferenceMemo
+from staging_cache import StagingCache
+
+
+@pytest.fixture(autouse=True)
+def isolated_output(tmp_path, monkeypatch):
+    """解析結果のステージングキャッシュを output/ ではなく tmp_path に書くこと"""
+    monkeypatch.setattr(analyzer, 'StagingCache', lambda: StagingCache(str(tmp_path / 'staging')))
+
+
+def write_file(data_dir, name, lines):
+    with open(os.path.join(data_dir, name), 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def run_analyze(tmp_path, monkeypatch, names):
+    inferred = []
+    original = analyzer.infer_sqlite_type
+
+    def counting(series, column_name, file_name=None, corrector=None):
+        inferred.append(column_name)
+        return original(series, column_name, file_name, corrector)
+
+    monkeypatch.setattr(analyzer, 'infer_sqlite_type', counting)
+    df = analyzer.analyze_files(str(tmp_path), str(tmp_path / 'candidates.csv'),
+                                db_file=str(tmp_path / 'master.db'), file_names=names)
+    return inferred, df
+
+
+def test_memo_reuses_unchanged_columns_across_layouts(tmp_path, monkeypatch):
+    """ヘッダーが変わっても中身が同じ列は推定せず、ルールファイルが変わるとメモを使わないこと"""
+    rows = [f"{i}\t2024010{i % 9 + 1}" for i in range(30)]
+    write_file(tmp_path, 'a.txt', ["数量\t出庫日"] + rows)
+    inferred, _ = run_analyze(tmp_path, monkeypatch, ['a.txt'])
+    assert inferred == ["数量", "出庫日"]
+
+    write_file(tmp_path, 'b.txt', ["数量\t出庫日\t備考"] + [f"{row}\tx" for row in rows])
+    inferred, df = run_analyze(tmp_path, monkeypatch, ['b.txt'])
+    assert inferred == ["備考"]
+    assert df["Date_Format"].iloc[1] == "%Y%m%d"
+
+    monkeypatch.setattr(analyzer, 'rules_key', lambda version: f"{version}-changed")
+    write_file(tmp_path, 'c.txt', ["数量\t出庫日\tメモ"] + [f"{row}\ty" for row in rows])
+    inferred, _ = run_analyze(tmp_path, monkeypatch, ['c.txt'])
+    assert inferred == ["数量", "出庫日", "メモ"]
+
+
+def test_memo_lru_cap():
+    """上限を超えた分は最後に使われたのが古い記録から削除されること"""
+    conn = sqlite3.connect(":memory:")
+    memo = InferenceMemo(conn, "k", max_entries=2)
+    info = {"Inferred_Type": "TEXT", "Initial_Inferred_Type": "TEXT", "Date_Format": None}
+    for name in ("a", "b", "c"):
+        memo.put((name, "h"), info)
+        memo.flush()
+    memo.get(("b", "h"))
+    memo.put(("d", "h"), info)
+    memo.flush()
+    assert {row[0] for row in conn.execute("SELECT column_name FROM inference_memo")} == {"b", "d"}
+    assert InferenceMemo(conn, "other").get(("b", "h")) is None
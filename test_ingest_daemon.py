@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+監視フォルダ取り込みデーモンのテスト
+"""
+
+import os
+import tempfile
+import unittest
+
+from ingest_daemon import IngestDaemon, StabilityTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestIngestDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, 'data')
+        os.makedirs(self.data_dir)
+        self.db_file = os.path.join(self.tmp_dir.name, 'master.db')
+        self.clock = FakeClock()
+        self.processed = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _daemon(self, queue_size=4):
+        return IngestDaemon(self.data_dir, self.db_file, process=self.processed.append,
+                            quiescence=2.0, queue_size=queue_size, use_inotify=False, clock=self.clock)
+
+    def _write(self, name, text):
+        with open(os.path.join(self.data_dir, name), 'a', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_tracker_waits_for_quiescence(self):
+        tracker = StabilityTracker(quiescence=2.0, clock=self.clock)
+        self.assertEqual(tracker.observe({'a.txt': (10, 1)}), [])
+        self.clock.now = 1.5
+        self.assertEqual(tracker.observe({'a.txt': (20, 2)}), [])  # 書き込み中
+        self.clock.now = 3.0
+        self.assertEqual(tracker.observe({'a.txt': (20, 2)}), [])
+        self.clock.now = 3.5
+        self.assertEqual(tracker.observe({'a.txt': (20, 2)}), ['a.txt'])
+
+    def test_ingests_each_stable_file_once(self):
+        daemon = self._daemon()
+        self._write('zs65.txt', 'a\tb\n1\t2\n')
+        self._write('run.log', 'ignored')
+        self.assertEqual(daemon.poll_once(), [])
+        self.clock.now = 2.0
+        self.assertEqual(daemon.poll_once(), ['zs65.txt'])
+        self.assertEqual(daemon.poll_once(), [])  # 取り込み待ち中は重複して入れない
+        self.assertEqual(daemon.process_next(timeout=0), 'zs65.txt')
+        self.assertEqual(self.processed, ['zs65.txt'])
+
+        self.clock.now = 4.0
+        self.assertEqual(daemon.poll_once(), [])
+
+        # 再起動しても取り込み済みのファイルは再ロードしない
+        restarted = self._daemon()
+        restarted.poll_once()
+        self.clock.now = 6.0
+        self.assertEqual(restarted.poll_once(), [])
+
+    def test_failed_ingest_is_retried_after_restart(self):
+        """取り込みに失敗したファイルは ingest_log に記録せず、再起動後に再試行すること"""
+        def failing(name):
+            raise RuntimeError("database is locked")
+
+        daemon = IngestDaemon(self.data_dir, self.db_file, process=failing,
+                              quiescence=2.0, use_inotify=False, clock=self.clock)
+        self._write('zs65.txt', 'a\tb\n1\t2\n')
+        daemon.poll_once()
+        self.clock.now = 2.0
+        self.assertEqual(daemon.poll_once(), ['zs65.txt'])
+        self.assertEqual(daemon.process_next(timeout=0), 'zs65.txt')
+        self.clock.now = 4.0
+        self.assertEqual(daemon.poll_once(), [])  # 同じ実行中は更新されるまで再試行しない
+
+        restarted = self._daemon()
+        restarted.poll_once()
+        self.clock.now = 6.0
+        self.assertEqual(restarted.poll_once(), ['zs65.txt'])
+        restarted.process_next(timeout=0)
+        self.assertEqual(self.processed, ['zs65.txt'])
+
+    def test_queue_is_bounded(self):
+        daemon = self._daemon(queue_size=2)
+        for name in ('a.txt', 'b.txt', 'c.txt'):
+            self._write(name, 'x\n1\n')
+        daemon.poll_once()
+        self.clock.now = 2.0
+        self.assertEqual(daemon.poll_once(), ['a.txt', 'b.txt'])
+        daemon.process_next(timeout=0)
+        self.assertEqual(daemon.poll_once(), ['c.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
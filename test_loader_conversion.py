@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+loader.py 変換計画テスト
+オーバーライド集合・日付フォーマット再利用・SAP数値正規化を検証
+"""
+
+import pandas as pd
+
+from loader import build_override_set, build_conversion_plan, apply_conversion_plan
+
+
+def test_override_set_forces_text():
+    """t002_loader_updates.jsonの対象列は変換計画から除外されること"""
+    overrides = {
+        "datetime_override_fields": [{"file": "zs45.txt", "field": "TecComp", "action": "force_text"}],
+        "storage_code_fields": [{"file": "zm114.txt", "field": "保管場所", "action": "force_text"}],
+    }
+    override_set = build_override_set(overrides)
+    assert override_set == {("zs45.txt", "TecComp"), ("zm114.txt", "保管場所")}
+
+    plan = build_conversion_plan(["保管場所", "数量"], {"保管場所": "INTEGER", "数量": "INTEGER"},
+                                 "zm114.txt", override_set)
+    assert plan.forced_text_columns == ["保管場所"]
+    assert plan.integer_columns == ["数量"]
+
+
+def test_apply_plan_normalizes_sap_numbers_and_dates():
+    """後ろマイナス・カンマ小数点を数値化し、推定時の日付フォーマットで変換すること"""
+    df = pd.DataFrame({
+        "金額": ["123-", "1,5", "7", "abc"],
+        "数量": ["10", "20-", "30", ""],
+        "出庫日": ["20240101", "20240105", "20241231", ""],
+    }, dtype=str)
+    plan = build_conversion_plan(df.columns, {"金額": "REAL", "数量": "INTEGER", "出庫日": "DATETIME"},
+                                 "sample.txt", set(), {"出庫日": "%Y%m%d"})
+    result = apply_conversion_plan(df, plan)
+
+    assert result["金額"].tolist()[:3] == [-123.0, 1.5, 7.0]
+    assert pd.isna(result["金額"].iloc[3])
+    assert result["数量"].tolist()[:3] == [10, -20, 30]
+    assert result["出庫日"].iloc[0] == "2024-01-01 00:00:00"
+    assert pd.isna(result["出庫日"].iloc[3])
+
+
+def test_sap_rules_configurable_per_column():
+    """column_master.sap_rules の列指定に従って正規化すること"""
+    df = pd.DataFrame({"品目": ["00012345", "001"], "単価": ["1,5", "2,25-"]}, dtype=str)
+    plan = build_conversion_plan(df.columns, {"品目": "TEXT", "単価": "REAL"}, "sample.txt", set(),
+                                 sap_rules={"品目": "zero_padding", "単価": "none"})
+    assert plan.normalization == {"品目": ("zero_padding",)}
+
+    result = apply_conversion_plan(df, plan)
+    assert result["品目"].tolist() == ["12345", "001"]
+    # 正規化を無効にした数値列はカンマ小数点を解釈できずNone
+    assert result["単価"].isna().all()
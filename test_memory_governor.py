@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+メモリ予算ガバナーのテスト
+"""
+
+import unittest
+
+import pandas as pd
+
+from memory_governor import MIN_BLOCK_BYTES, MemoryGovernor
+from pipelined_loader import load_pipelined
+
+
+def sample_frame(columns, rows=200):
+    return pd.DataFrame({f"c{i}": [f"value{r:05d}" for r in range(rows)] for i in range(columns)}, dtype=object)
+
+
+class TestMemoryGovernor(unittest.TestCase):
+
+    def test_wide_files_get_fewer_rows_per_block(self):
+        governor = MemoryGovernor(budget_bytes=256 * 1024 ** 2, rss_reader=lambda: 64 * 1024 ** 2)
+        narrow = governor.plan_load(sample_frame(4), max_block_bytes=1024 ** 3)
+        wide = governor.plan_load(sample_frame(68), max_block_bytes=1024 ** 3)
+        self.assertGreater(wide.row_bytes, narrow.row_bytes * 10)
+        self.assertLess(wide.chunk_rows, narrow.chunk_rows)
+        self.assertLessEqual(
+            (wide.workers + 2 * wide.queue_size + 1) * wide.row_bytes * wide.block_bytes / governor.estimate_raw_row_bytes(sample_frame(68)),
+            192 * 1024 ** 2)
+
+    def test_tight_budget_shrinks_parallelism(self):
+        governor = MemoryGovernor(budget_bytes=66 * 1024 ** 2, rss_reader=lambda: 64 * 1024 ** 2)
+        sizing = governor.plan_load(sample_frame(68), max_workers=4, max_queue_size=4)
+        self.assertEqual((sizing.workers, sizing.queue_size), (1, 1))
+        self.assertEqual(sizing.block_bytes, MIN_BLOCK_BYTES)
+
+    def test_over_budget_throttles_but_finishes(self):
+        governor = MemoryGovernor(budget_bytes=1, rss_reader=lambda: 2)
+        self.assertTrue(governor.over_budget())
+
+        written = []
+        blocks = [pd.DataFrame({'a': [str(i)]}) for i in range(20)]
+
+        class Source:
+            excel = True
+            path = sheet = None
+            chunk_rows = 1
+
+        import pipelined_loader
+        original = pipelined_loader.iter_sheet_chunks
+        pipelined_loader.iter_sheet_chunks = lambda *args, **kwargs: iter(blocks)
+        try:
+            total = load_pipelined(Source(), ['a'], None, None, convert=lambda df: df,
+                                   write=lambda df, first: written.append(df['a'].iloc[0]),
+                                   workers=3, governor=governor)
+        finally:
+            pipelined_loader.iter_sheet_chunks = original
+        self.assertEqual(total, 20)
+        self.assertEqual(written, [str(i) for i in range(20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
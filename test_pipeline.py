@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+パイプラインスケジューラのテスト
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from pipeline import ColumnMasterArtifact, JsonFileArtifact, Pipeline, Stage, build_default_pipeline
+from rule_versioning import RuleDelta, RuleVersionStore
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, 'data')
+        os.makedirs(self.data_dir)
+        self.db_file = os.path.join(self.tmp_dir.name, 'master.db')
+        self.rules_file = os.path.join(self.tmp_dir.name, 'rules.json')
+        self.calls = []
+        for name in ('a.txt', 'b.txt'):
+            self._write(name, 'x\n1\n')
+        self._write_rules([{'file': 'a.txt', 'field': 'x'}])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, text):
+        with open(os.path.join(self.data_dir, name), 'a', encoding='utf-8') as f:
+            f.write(text)
+
+    def _write_rules(self, overrides):
+        with open(self.rules_file, 'w', encoding='utf-8') as f:
+            json.dump({'summary': {'generated_at': str(len(self.calls))}, 'overrides': overrides}, f)
+
+    def _pipeline(self, fail_rules=False):
+        def rules():
+            self.calls.append(('rules', None))
+            if fail_rules:
+                raise RuntimeError('boom')
+
+        stages = [
+            Stage('rules', [JsonFileArtifact(self.rules_file)], ['rules_out'], rules),
+            Stage('load', [JsonFileArtifact(self.rules_file)], ['tables'],
+                  lambda files: self.calls.append(('load', files)), after=['rules'], per_file=True),
+        ]
+        return Pipeline(stages, self.data_dir, self.db_file)
+
+    def test_reruns_only_stale_stages_and_files(self):
+        self.assertEqual(self._pipeline().run(), {'rules': 'ran', 'load': 'ran'})
+        self.assertEqual(self.calls, [('rules', None), ('load', None)])
+
+        # 生成日時だけが変わっても再実行しない
+        self._write_rules([{'file': 'a.txt', 'field': 'x'}])
+        self.calls.clear()
+        self.assertEqual(self._pipeline().run(), {'rules': 'skipped', 'load': 'skipped'})
+
+        # a.txt のルールだけが変わった → load は a.txt だけ
+        self._write_rules([{'file': 'a.txt', 'field': 'y'}])
+        self.assertEqual(self._pipeline().run(), {'rules': 'ran', 'load': 'ran'})
+        self.assertEqual(self.calls[-1], ('load', ['a.txt']))
+
+        # データファイルが更新された → そのファイルだけ
+        self._write('b.txt', '2\n')
+        self.assertEqual(self._pipeline().run(), {'rules': 'skipped', 'load': 'ran'})
+        self.assertEqual(self.calls[-1], ('load', ['b.txt']))
+
+    def test_failed_stage_blocks_dependents(self):
+        self.assertEqual(self._pipeline(fail_rules=True).run(), {'rules': 'failed', 'load': 'blocked'})
+        # 失敗したステージは記録されないので次回も実行される
+        self.assertEqual(self._pipeline().run(), {'rules': 'ran', 'load': 'ran'})
+
+    def test_independent_branches_run_in_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+        stages = [
+            Stage('left', [ColumnMasterArtifact(self.db_file)], ['left_out'], barrier.wait),
+            Stage('right', [ColumnMasterArtifact(self.db_file)], ['right_out'], barrier.wait),
+        ]
+        # 同時に実行されなければ Barrier がタイムアウトして失敗する
+        self.assertEqual(Pipeline(stages, self.data_dir, self.db_file, workers=2).run(),
+                         {'left': 'ran', 'right': 'ran'})
+
+    def test_column_subset_ignores_other_columns(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("CREATE TABLE column_master (file_name TEXT, column_name TEXT, data_type TEXT)")
+        conn.execute("INSERT INTO column_master VALUES ('a.txt', 'x', 'INTEGER')")
+        conn.commit()
+        names = ColumnMasterArtifact(self.db_file, ['column_name'])
+        before = (names.fingerprint(), ColumnMasterArtifact(self.db_file).fingerprint())
+        # rule_apply が data_type だけを書き換えても列名だけの入力は変わらない
+        conn.execute("UPDATE column_master SET data_type = 'TEXT'")
+        conn.commit()
+        conn.close()
+        self.assertEqual(names.fingerprint(), before[0])
+        self.assertNotEqual(ColumnMasterArtifact(self.db_file).fingerprint(), before[1])
+
+    def test_synced_delta_is_applied_only_after_load(self):
+        delta = RuleDelta('loader_updates', {'h1': {'file': 'a.txt', 'field': 'x', 'action': 'force_text'}}, {})
+        store = RuleVersionStore(self.db_file)
+        with mock.patch('pipeline._analyze'), mock.patch('pipeline._pattern_fix'), \
+                mock.patch('pipeline._rule_apply'), mock.patch('t003_rule_integration.RuleIntegrationManager') as manager, \
+                mock.patch('loader.load_and_compare', side_effect=RuntimeError('boom')):
+            manager.return_value.write_loader_updates.return_value = delta
+            status = build_default_pipeline(self.data_dir, self.db_file).run()
+            self.assertEqual((status['sync_rules'], status['load']), ('ran', 'failed'))
+            self.assertEqual(store.applied_rules('loader_updates'), {})
+
+            # 影響ファイルのロードに失敗した場合は未適用のまま
+            with mock.patch('loader.load_and_compare', return_value=['a.txt']):
+                self.assertEqual(build_default_pipeline(self.data_dir, self.db_file).run(force=True)['load'], 'ran')
+            self.assertEqual(store.applied_rules('loader_updates'), {})
+
+            with mock.patch('loader.load_and_compare', return_value=[]) as load:
+                self.assertEqual(build_default_pipeline(self.data_dir, self.db_file).run(force=True)['load'], 'ran')
+                load.assert_called_once()
+        self.assertEqual(list(store.applied_rules('loader_updates')), ['h1'])
+
+    def test_failed_files_are_retried(self):
+        failed = ['b.txt']
+
+        def load(files):
+            self.calls.append(('load', files))
+            return list(failed)
+
+        stages = [Stage('load', [JsonFileArtifact(self.rules_file)], ['tables'], load, per_file=True)]
+        self.assertEqual(Pipeline(stages, self.data_dir, self.db_file).run(), {'load': 'ran'})
+        # 失敗したファイルだけを次回も実行する
+        failed.clear()
+        Pipeline(stages, self.data_dir, self.db_file).run()
+        self.assertEqual(self.calls[-1], ('load', ['b.txt']))
+        self.assertEqual(Pipeline(stages, self.data_dir, self.db_file).run(), {'load': 'skipped'})
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Pipeline([Stage('a', [], [], lambda: None, after=['b']),
+                      Stage('b', [], [], lambda: None, after=['a'])], self.data_dir, self.db_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+パイプライン型ロードのテスト
+"""
+
+import gzip
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from load_checkpoint import CheckpointStore
+from loader import _load_input, apply_conversion_plan, build_conversion_plan, write_chunk
+from pipelined_loader import InputSource, load_pipelined, split_blocks
+from sap_normalizer import SapNormalizer
+
+
+class TestPipelinedLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmp_dir.name, 'master.db'))
+        self.lines = ["品目\t数量"] + [f"A{i:04d}\t{i}-" for i in range(500)]
+        self.columns = ["品目", "数量"]
+        self.plan = build_conversion_plan(self.columns, {"品目": "TEXT", "数量": "INTEGER"}, "stock.txt", set())
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp_dir.cleanup()
+
+    def _file(self, name, encoding='utf-8', opener=open):
+        path = os.path.join(self.tmp_dir.name, name)
+        with opener(path, 'wb') as f:
+            f.write(("\n".join(self.lines) + "\n").encode(encoding))
+        return path
+
+    def _load(self, source, encoding='utf-8', **kwargs):
+        return load_pipelined(
+            source, self.columns, encoding, '\t',
+            convert=lambda chunk: apply_conversion_plan(chunk, self.plan),
+            write=lambda chunk, first: write_chunk(chunk, 'stock', self.conn, replace=first),
+            workers=3, queue_size=2, block_bytes=256, **kwargs)
+
+    def _table(self):
+        return pd.read_sql_query("SELECT * FROM stock", self.conn)
+
+    def test_split_blocks_keeps_quoted_newlines(self):
+        chunks = [b'a,"x\n', b'y"\nb,1\nc', b',2\n']
+        self.assertEqual(list(split_blocks(chunks, b'\n', b'"', b',')), [b'a,"x\ny"\nb,1\n', b'c,2\n'])
+        # 断片の境目にかかる "" はエスケープ
+        chunks = ['a,"x"', '"\n', 'y"\nb,1\n']
+        self.assertEqual(list(split_blocks(chunks, '\n', '"', ',')), ['a,"x""\ny"\nb,1\n'])
+
+    def test_split_blocks_ignores_quotes_inside_values(self):
+        """値の途中の " （インチ記号）は引用符とみなさず、閉じない引用符は上限で改行区切りに戻すこと"""
+        lines = [f"P{i}\t12\" pipe\t{i}\n" for i in range(20)]
+        chunks = [line.encode() for line in lines]
+        self.assertEqual(list(split_blocks(chunks, b'\n', b'"', b'\t')), chunks)
+
+        chunks = [b'P0\t"12 pipe\t0\n'] + chunks[1:]
+        blocks = list(split_blocks(chunks, b'\n', b'"', b'\t', max_carry=60))
+        self.assertEqual(b''.join(blocks), b''.join(chunks))
+        self.assertTrue(all(len(block) <= 60 + len(chunks[1]) for block in blocks))
+        self.assertGreater(len(blocks), 5)
+
+    def test_whole_file_in_order(self):
+        self.assertEqual(self._load(InputSource(self._file('stock.txt'))), 500)
+        df = self._table()
+        self.assertEqual(df['品目'].tolist(), [f"A{i:04d}" for i in range(500)])
+        self.assertEqual(df['数量'].tolist()[:3], [0, -1, -2])
+        types = {row[1]: row[2] for row in self.conn.execute("PRAGMA table_info(stock)")}
+        self.assertEqual(types['数量'], 'INTEGER')
+
+    def test_compressed_and_utf16_sources(self):
+        self.assertEqual(self._load(InputSource(self._file('stock.txt.gz', opener=gzip.open))), 500)
+        self.assertEqual(self._load(InputSource(self._file('stock16.txt', 'utf-16')), 'utf-16'), 500)
+        self.assertEqual(self._table()['品目'].iloc[-1], 'A0499')
+
+    def test_row_limit_and_empty_file(self):
+        self.assertEqual(self._load(InputSource(self._file('stock.txt')), max_rows=120), 120)
+        self.assertEqual(len(self._table()), 120)
+
+        self.lines = self.lines[:1]
+        self.assertEqual(self._load(InputSource(self._file('empty.txt'))), 0)
+        self.assertEqual(list(self._table().columns), self.columns)
+
+    def test_resume_from_last_checkpoint(self):
+        source = InputSource(self._file('stock.txt'))
+        checkpoints = CheckpointStore(self.conn)
+        written_chunks = []
+
+        def crashing_write(chunk, first):
+            if len(written_chunks) == 5:
+                raise KeyboardInterrupt
+            written_chunks.append(len(chunk))
+            write_chunk(chunk, 'stock', self.conn, replace=first, commit=False)
+
+        with self.assertRaises(KeyboardInterrupt):
+            self._load_with(source, crashing_write,
+                            checkpoint=lambda pos, rows: checkpoints.save('stock', 'stock.txt', 'fp', pos, rows),
+                            checkpoint_every=2)
+        self.conn.rollback()  # 未コミットの5チャンク目は失われる
+
+        position, rows = checkpoints.resume_point('stock', 'fp')
+        self.assertEqual(rows, sum(written_chunks[:4]))
+        self.assertEqual(len(self._table()), rows)
+        self.assertIsNone(checkpoints.resume_point('stock', 'other'))
+
+        total = self._load_with(source, lambda chunk, first: write_chunk(chunk, 'stock', self.conn, replace=first),
+                                resume_from=(position, rows))
+        self.assertEqual(total, 500)
+        self.assertEqual(self._table()['品目'].tolist(), [f"A{i:04d}" for i in range(500)])
+
+    def _load_with(self, source, write, **kwargs):
+        return load_pipelined(source, self.columns, 'utf-8', '\t',
+                              convert=lambda chunk: apply_conversion_plan(chunk, self.plan),
+                              write=write, workers=2, queue_size=2, block_bytes=256, **kwargs)
+
+    def test_failed_load_is_rolled_back_and_restarts(self):
+        """中断以外の失敗は未コミットのチャンクを捨ててチェックポイントを消し、次回は最初からロードすること"""
+        source = InputSource(self._file('stock.txt'))
+        sample = pd.read_csv(source.path, sep='\t', dtype=str, nrows=10)
+        written_chunks = []
+
+        def failing_write(chunk, table_name, conn, replace=False, commit=True):
+            if len(written_chunks) == 5:
+                raise ValueError('disk full')
+            written_chunks.append(len(chunk))
+            write_chunk(chunk, table_name, conn, replace=replace, commit=commit)
+
+        def small_blocks(*args, **kwargs):
+            return load_pipelined(*args, **dict(kwargs, block_bytes=256, checkpoint_every=2))
+
+        load = lambda: _load_input(self.conn, 'stock.txt', sample, 'utf-8', '\t', set(), SapNormalizer(), source)
+        with mock.patch('loader.load_pipelined', small_blocks), mock.patch('loader.write_chunk', failing_write):
+            with self.assertRaises(ValueError):
+                load()
+        self.assertFalse(self.conn.in_transaction)
+        self.assertEqual(len(self._table()), sum(written_chunks[:4]))
+        self.assertIsNone(CheckpointStore(self.conn).resume_point('stock', 'any'))
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM load_checkpoint").fetchone()[0], 0)
+
+        with mock.patch('loader.load_pipelined', small_blocks):
+            load()
+        self.assertEqual(self._table()['品目'].tolist(), [f"A{i:04d}" for i in range(500)])
+
+    def test_worker_error_is_raised(self):
+        def broken(chunk):
+            raise ValueError('bad chunk')
+
+        with self.assertRaises(ValueError):
+            load_pipelined(InputSource(self._file('stock.txt')), self.columns, 'utf-8', '\t',
+                           convert=broken, write=lambda chunk, first: None, block_bytes=256)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+T002ルール評価エンジンテスト
+パターン条件をSQLで評価し、一致行だけから修正ルールを生成できるかを検証
+"""
+
+import sqlite3
+from unittest import mock
+
+import init_dev
+import master_manager
+from rule_engine import RuleEngine, compile_query
+from t002_pattern_fixer import T002PatternFixer
+
+
+def _create_master(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute("""
+        CREATE TABLE column_master (
+            file_name TEXT, column_name TEXT, data_type TEXT, initial_inferred_type TEXT,
+            encoding TEXT, delimiter TEXT, PRIMARY KEY (file_name, column_name)
+        )
+    """)
+    conn.executemany("INSERT INTO column_master VALUES (?, ?, ?, ?, 'cp932', '\t')", [
+        ("zs65.txt", "コード", "TEXT", None),
+        ("zs45.txt", "TecComp", "TEXT", "DATETIME"),
+        ("zs45.txt", "出庫日", "DATETIME", "DATETIME"),
+        ("price.txt", "製品原価", "TEXT", "INTEGER"),
+        ("price.txt", "数量", "TEXT", "INTEGER"),
+        ("zm114.txt", "保管場所", "TEXT", "INTEGER"),
+    ])
+    conn.commit()
+    conn.close()
+
+
+def test_compile_query_handles_null_and_regex():
+    """None は IS NULL、正規表現は REGEXP に変換されること"""
+    sql, params = compile_query({"inferred_types": [None, "Unknown"], "column_regex": "原価"})
+    assert "initial_inferred_type IN (?) OR initial_inferred_type IS NULL" in sql
+    assert "column_name REGEXP ?" in sql
+    assert params == ["Unknown", "原価"]
+
+
+def test_generate_fix_rules_from_sql(tmp_path):
+    """各パターンの一致行だけが修正ルールになること"""
+    db_file = str(tmp_path / "master.db")
+    _create_master(db_file)
+
+    fix_rules = T002PatternFixer(db_file).generate_fix_rules()
+
+    assert [(f["file_name"], f["field_name"], f["to_type"]) for f in fix_rules["pattern1_fixes"]] == [
+        ("zs65.txt", "コード", "TEXT")
+    ]
+    assert [f["field_name"] for f in fix_rules["pattern2_fixes"]] == ["TecComp"]
+    assert [f["field_name"] for f in fix_rules["pattern3_fixes"]] == ["製品原価"]
+    assert [f["field_name"] for f in fix_rules["pattern4_fixes"]] == ["保管場所"]
+
+
+def test_fetch_does_not_change_schema(tmp_path):
+    """評価用の接続ではインデックスを作らないこと（作成は column_master の初期化時に1回）"""
+    db_file = str(tmp_path / "master.db")
+    _create_master(db_file)
+    conn = sqlite3.connect(db_file)
+    before = conn.execute("PRAGMA schema_version").fetchone()[0]
+    assert len(RuleEngine(db_file).fetch({"actual_types": ["DATETIME"]})) == 1
+    assert conn.execute("PRAGMA schema_version").fetchone()[0] == before
+    conn.close()
+
+
+def test_master_init_paths_create_type_index(tmp_path):
+    """column_master を作る初期化処理はどれも型条件のインデックスを作ること"""
+    dev_db = str(tmp_path / "dev.db")
+    with mock.patch("init_dev.DB_FILE", dev_db):
+        assert init_dev.init_db_dev()
+    master_db = tmp_path / "master.db"
+    with mock.patch("master_manager.DB_PATH", master_db), mock.patch("master_manager.OUTPUT_DIR", str(tmp_path)):
+        master_manager.init_master()
+
+    for db_file in (dev_db, str(master_db)):
+        conn = sqlite3.connect(db_file)
+        indexes = [row[1] for row in conn.execute("PRAGMA index_list(column_master)")]
+        conn.close()
+        assert "idx_column_master_types" in indexes
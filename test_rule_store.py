@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+ルールストア（master.db管理のパターンルール）のテスト
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from pattern_rules import TypeCorrectionRules
+from rule_store import RuleStore
+
+
+class TestRuleStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = RuleStore(os.path.join(self.tmp_dir.name, 'rules.db'))
+        self.rules_data = {
+            "unregistered_files": {"zs65.txt": {"encoding": "utf-8", "separator": "\t"}},
+            "datetime_patterns": [r"^\d{8}$"],
+            "business_logic_rules": {
+                "code_fields": ["保管場所"],
+                "amount_fields": ["原価"],
+                "quantity_fields": ["数量"],
+            },
+            "sap_patterns": {"trailing_minus": r"^(\d+(?:[.,]\d+)?)-$"},
+        }
+        self.store.import_rules_data(self.rules_data)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_json_round_trip(self):
+        self.assertEqual(self.store.snapshot(), self.rules_data)
+
+        path = os.path.join(self.tmp_dir.name, 'rules.json')
+        self.store.export_json(path)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), self.rules_data)
+
+    def test_row_level_edits_bump_version(self):
+        version = self.store.version()
+        self.assertTrue(self.store.add('code_fields', '工場'))
+        self.assertFalse(self.store.add('code_fields', '工場'))
+        self.assertTrue(self.store.update('datetime_patterns', r"^\d{8}$", new_key=r"^\d{4}/\d{2}/\d{2}$"))
+        self.assertTrue(self.store.delete('unregistered_files', 'zs65.txt'))
+        self.assertFalse(self.store.delete('unregistered_files', 'zs65.txt'))
+        self.assertEqual(self.store.version(), version + 3)
+
+        data = self.store.snapshot()
+        self.assertEqual(data['business_logic_rules']['code_fields'], ['保管場所', '工場'])
+        self.assertEqual(data['datetime_patterns'], [r"^\d{4}/\d{2}/\d{2}$"])
+        self.assertEqual(data['unregistered_files'], {})
+
+    def test_rename_keeps_value(self):
+        self.assertTrue(self.store.update('unregistered_files', 'zs65.txt', new_key='zs65_sss.txt'))
+        self.assertEqual(self.store.entries('unregistered_files'),
+                         [('zs65_sss.txt', {"encoding": "utf-8", "separator": "\t"})])
+        self.assertTrue(self.store.update('unregistered_files', 'zs65_sss.txt', value={"encoding": "cp932"}))
+        self.assertEqual(self.store.entries('unregistered_files'), [('zs65_sss.txt', {"encoding": "cp932"})])
+
+    def test_corrector_reloads_only_when_version_moves(self):
+        corrector = TypeCorrectionRules(store=self.store)
+        self.assertFalse(corrector.refresh())
+
+        # 別インスタンス（別セッション）からの編集を検知する
+        RuleStore(self.store.db_file).add('code_fields', 'plant')
+        self.assertTrue(corrector.refresh())
+        self.assertIn('plant', corrector._rules_data['business_logic_rules']['code_fields'])
+        self.assertEqual(corrector.correct_type('a.txt', 'plant_id', None, 'INTEGER'), 'TEXT')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+ルールのバージョン管理（差分計算）のテスト
+"""
+
+import os
+import tempfile
+import unittest
+
+from rule_versioning import RuleVersionStore, rule_target
+
+
+class TestRuleVersionStore(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_file = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.store = RuleVersionStore(self.db_file)
+
+    def tearDown(self):
+        os.remove(self.db_file)
+
+    def test_unchanged_rules_produce_empty_delta(self):
+        rules = [{'file': 'zm114.txt', 'field': '保管場所', 'action': 'force_text'}]
+        self.store.mark_applied(self.store.compute_delta('loader_updates', rules))
+
+        # キー順が違っても同じルールとみなす
+        reordered = [{'action': 'force_text', 'field': '保管場所', 'file': 'zm114.txt'}]
+        self.assertTrue(self.store.compute_delta('loader_updates', reordered).is_empty)
+
+    def test_changed_rule_affects_only_its_file(self):
+        rules = [
+            {'file_name': 'a.txt', 'field_name': '金額', 'to_type': 'REAL'},
+            {'file_name': 'b.txt', 'field_name': '日付', 'to_type': 'DATETIME'},
+        ]
+        self.store.replace_all('pattern_rules', rules)
+
+        changed = [rules[0], {'file_name': 'b.txt', 'field_name': '日付', 'to_type': 'TEXT'}]
+        delta = self.store.compute_delta('pattern_rules', changed)
+        self.assertEqual(len(delta.added), 1)
+        self.assertEqual(len(delta.removed), 1)
+        self.assertEqual(delta.affected_files, ['b.txt'])
+        self.assertEqual(delta.affected_pairs, {('b.txt', '日付')})
+
+    def test_rule_target_supports_both_formats(self):
+        self.assertEqual(rule_target({'file': 'x', 'field': 'y'}), ('x', 'y'))
+        self.assertEqual(rule_target({'file_name': 'x', 'field_name': 'y'}), ('x', 'y'))
+
+
+if __name__ == '__main__':
+    unittest.main()
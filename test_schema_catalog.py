@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+スキーマメタデータカタログのテスト
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import schema_catalog
+from schema_catalog import get_catalog, table_columns
+
+
+class TestSchemaCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, 'catalog.db')
+        self.conn = sqlite3.connect(self.db_file)
+        self.conn.execute("CREATE TABLE column_master (file_name TEXT, column_name TEXT, data_type TEXT)")
+        self.conn.execute("CREATE TABLE zm114 (保管場所 TEXT, 数量 INTEGER, 単価 REAL)")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp_dir.cleanup()
+
+    def test_columns_and_distribution(self):
+        catalog = get_catalog(self.conn)
+        self.assertEqual(catalog.tables(), ['column_master', 'zm114'])
+        self.assertEqual(catalog.columns('zm114'), {'保管場所': 'TEXT', '数量': 'INTEGER', '単価': 'REAL'})
+        self.assertEqual(catalog.columns('missing'), {})
+        self.assertEqual(catalog.type_distribution(exclude=('column_master',)),
+                         {'TEXT': 1, 'INTEGER': 1, 'REAL': 1})
+
+    def test_cached_until_schema_version_changes(self):
+        catalog = get_catalog(self.conn)
+        self.assertIs(get_catalog(self.conn), catalog)
+
+        # 別の接続からのスキーマ変更も検知する
+        other = sqlite3.connect(self.db_file)
+        other.execute("DROP TABLE zm114")
+        other.execute("CREATE TABLE zm114 (保管場所 TEXT)")
+        other.commit()
+        other.close()
+
+        refreshed = get_catalog(self.conn)
+        self.assertIsNot(refreshed, catalog)
+        self.assertEqual(refreshed.columns('zm114'), {'保管場所': 'TEXT'})
+
+    def test_table_columns_does_not_rebuild_stale_catalog(self):
+        catalog = get_catalog(self.conn)
+        self.assertEqual(table_columns(self.conn, 'zm114'), {'保管場所': 'TEXT', '数量': 'INTEGER', '単価': 'REAL'})
+        self.conn.execute("CREATE TABLE zs45 (TecComp TEXT)")
+        self.assertEqual(table_columns(self.conn, 'zs45'), {'TecComp': 'TEXT'})
+        self.assertEqual(table_columns(self.conn, 'missing'), {})
+        # ロード中の作成・削除ではカタログ全体を読み直さない
+        self.assertIs(schema_catalog._catalogs[self.db_file], catalog)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+スキーマレジストリのテスト
+"""
+
+import os
+import sqlite3
+
+import analyzer
+import pytest
+from schema_registry import SchemaRegistry, layout_fingerprint
+from staging_cache import StagingCache
+
+
+@pytest.fixture(autouse=True)
+def isolated_output(tmp_path, monkeypatch):
+    """解析結果のステージングキャッシュを output/ ではなく tmp_path に書くこと"""
+    monkeypatch.setattr(analyzer, 'StagingCache', lambda: StagingCache(str(tmp_path / 'staging')))
+
+
+def write_file(data_dir, name, lines):
+    with open(os.path.join(data_dir, name), 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def run_analyze(tmp_path, monkeypatch, names):
+    inferred = []
+    original = analyzer.infer_sqlite_type
+
+    def counting(series, column_name, file_name=None, corrector=None):
+        inferred.append(column_name)
+        return original(series, column_name, file_name, corrector)
+
+    monkeypatch.setattr(analyzer, 'infer_sqlite_type', counting)
+    df = analyzer.analyze_files(str(tmp_path), str(tmp_path / 'candidates.csv'),
+                                db_file=str(tmp_path / 'master.db'), file_names=names)
+    return inferred, df
+
+
+def test_known_layout_skips_inference(tmp_path, monkeypatch):
+    """同じヘッダーの翌日ファイルは推定せず、新しい列・型の変わった列だけ推定すること"""
+    write_file(tmp_path, 'stock_0101.txt', ["品目\t数量\t出庫日"] + [f"A{i}\t{i}\t2024010{i % 9 + 1}" for i in range(30)])
+    inferred, first = run_analyze(tmp_path, monkeypatch, ['stock_0101.txt'])
+    assert inferred == ["品目", "数量", "出庫日"]
+
+    write_file(tmp_path, 'stock_0102.txt', ["品目\t数量\t出庫日"] + [f"B{i}\t{i * 2}\t2024020{i % 9 + 1}" for i in range(30)])
+    inferred, second = run_analyze(tmp_path, monkeypatch, ['stock_0102.txt'])
+    assert inferred == []
+    assert second["Inferred_Type"].tolist() == first["Inferred_Type"].tolist()
+    assert second["Date_Format"].tolist()[2] == first["Date_Format"].tolist()[2]
+
+    # 同じファイル名で列が増えた場合は新しい列だけ、値が型どおりでない列は推定し直す
+    write_file(tmp_path, 'stock_0102.txt', ["品目\t数量\t出庫日\t備考"] + [f"B{i}\tx{i}\t2024020{i % 9 + 1}\tok" for i in range(30)])
+    inferred, _ = run_analyze(tmp_path, monkeypatch, ['stock_0102.txt'])
+    assert sorted(inferred) == ["備考", "数量"]
+
+
+def test_rules_come_from_analyzed_db(tmp_path, monkeypatch):
+    """ルールストア・バージョンは解析先の db_file のものを使うこと"""
+    write_file(tmp_path, 'a.txt', ["数量"] + [str(i) for i in range(30)])
+    run_analyze(tmp_path, monkeypatch, ['a.txt'])
+    conn = sqlite3.connect(str(tmp_path / 'master.db'))
+    try:
+        version = conn.execute("SELECT version FROM rule_store_version").fetchone()[0]
+        assert conn.execute("SELECT COUNT(*) FROM rule_store_entries").fetchone()[0] > 0
+        assert {row[0] for row in conn.execute("SELECT rules_version FROM schema_layouts")} == {version}
+    finally:
+        conn.close()
+
+
+def test_rules_version_invalidates_layouts():
+    """ルールストアのバージョンが変わると記録済みの型を使わないこと"""
+    conn = sqlite3.connect(":memory:")
+    types = {"数量": {"Inferred_Type": "INTEGER", "Initial_Inferred_Type": "INTEGER", "Date_Format": None}}
+    SchemaRegistry(conn, rules_version=1).record("a.txt", ["数量"], "utf-8", "\t", types)
+    assert SchemaRegistry(conn, rules_version=1).lookup("b.txt", [" 数量"], "utf-8", "\t") == {" 数量": types["数量"]}
+    assert SchemaRegistry(conn, rules_version=2).lookup("b.txt", ["数量"], "utf-8", "\t") == {}
+    assert layout_fingerprint(["数量"], "utf-8", "\t") != layout_fingerprint(["数量"], "cp932", "\t")
+
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+ステージングキャッシュのテスト
+"""
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+import analyzer
+from loader import SimpleFileProcessor
+from staging_cache import StagingCache, detect_delimiter
+
+
+class TestStagingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = StagingCache(os.path.join(self.tmp_dir.name, 'staging'))
+        self.file_path = self._write('stock.txt', "品目\t品目テキスト\nA1\tボルト M8 x 20\nA2\tナット 大\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_put_overwrites_and_respects_row_count(self):
+        df = pd.DataFrame({'品目': ['A1', 'A2'], '数量': ['1', '']})
+        self.cache.put(self.file_path, df, 'utf-8', '\t')
+        self.assertIsNone(self.cache.get(self.file_path, nrows=3))  # 途中までのエントリで行数が足りない
+        cached, encoding, delimiter = self.cache.get(self.file_path, nrows=1)
+        self.assertEqual((cached['品目'].tolist(), encoding, delimiter), (['A1'], 'utf-8', '\t'))
+
+        # 行数の少ない結果でも上書きされ、完全なエントリは行数が足りなくてもヒットする
+        self.cache.put(self.file_path, df.head(1), 'cp932', ',', complete=True)
+        cached, encoding, delimiter = self.cache.get(self.file_path, nrows=3)
+        self.assertEqual((len(cached), encoding, delimiter), (1, 'cp932', ','))
+        self.assertIsNone(self.cache.get(self.file_path, member='Sheet2'))
+
+    def test_analyzer_and_loader_share_one_delimiter(self):
+        """タブ区切りの値に空白が多くても analyze と load が同じ区切り文字で同じエントリを使うこと"""
+        self.assertEqual(detect_delimiter(self.file_path, 'utf-8'), '\t')
+        self.assertEqual(detect_delimiter(self._write('one.txt', "品目\nA1\n"), 'utf-8'), '\t')
+        self.assertEqual(detect_delimiter(self._write('space.txt', "品目 数量\nA1 1\n"), 'utf-8'), ' ')
+
+        df, encoding, delimiter = analyzer._read_sample(self.file_path, 'stock.txt', self.cache)
+        self.assertEqual((list(df.columns), delimiter), (['品目', '品目テキスト'], '\t'))
+        cached, _, cached_delimiter = SimpleFileProcessor(cache=self.cache).process_file(self.file_path)
+        self.assertEqual((list(cached.columns), cached_delimiter), (['品目', '品目テキスト'], '\t'))
+        self.assertEqual(len(os.listdir(self.cache.cache_dir)), 1)
+
+    def test_evict_removes_entries_over_size_limit(self):
+        cache = StagingCache(self.cache.cache_dir, max_bytes=1)
+        cache.put(self.file_path, pd.DataFrame({'a': ['1']}), 'utf-8', '\t')
+        self.assertEqual(os.listdir(cache.cache_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
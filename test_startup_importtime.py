@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+main.py 起動時間テスト
+python -X importtime で保守系サブコマンドのimport時間を計測する
+"""
+
+import os
+import subprocess
+import sys
+
+from config import STARTUP_IMPORT_BUDGET_MS
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_importtime(code):
+    """-X importtime の出力を {モジュール名: 累積マイクロ秒} に変換"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def test_maintenance_commands_skip_pandas():
+    """init_dev / init_prod のハンドラ解決でpandasを読み込まないこと"""
+    timings = measure_importtime(
+        "import main; main.resolve_command('init_dev'); import init_dev, init_prod"
+    )
+    assert "pandas" not in timings
+    assert "analyzer" not in timings
+    assert "loader" not in timings
+
+
+def test_maintenance_commands_within_budget():
+    """保守系サブコマンドのimport時間が予算内に収まること"""
+    timings = measure_importtime("import main, init_dev, init_prod")
+    total_ms = sum(timings.get(name, 0) for name in ("main", "init_dev", "init_prod")) / 1000
+    print(f"import時間: {total_ms:.1f}ms (予算: {STARTUP_IMPORT_BUDGET_MS}ms)")
+    assert total_ms < STARTUP_IMPORT_BUDGET_MS
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+T002修正ルールの差分適用のテスト
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from rule_versioning import RuleVersionStore
+from t002_rule_applier import T002RuleApplier
+
+
+class TestIncrementalApplication(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)  # t002_loader_updates.json はカレントディレクトリに書き出される
+        self.db_file = os.path.join(self.tmp_dir.name, 'master.db')
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("""
+            CREATE TABLE column_master (
+                file_name TEXT, column_name TEXT, data_type TEXT, initial_inferred_type TEXT
+            )
+        """)
+        # analyze時に TypeCorrectionRules で INTEGER → TEXT に修正された列
+        conn.execute("INSERT INTO column_master VALUES ('zm114.txt', '保管場所', 'TEXT', 'INTEGER')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def _applier(self, fixes):
+        with open('pattern_rules.json', 'w', encoding='utf-8') as f:
+            json.dump({'fix_rules': {'pattern1_fixes': fixes, 'pattern2_fixes': [], 'pattern4_fixes': []}},
+                      f, ensure_ascii=False)
+        applier = T002RuleApplier('pattern_rules.json')
+        applier.db_file = self.db_file
+        return applier
+
+    def _data_type(self):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            return conn.execute("SELECT data_type FROM column_master").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_removed_rule_restores_type_before_rule(self):
+        """ルールを削除したら初期推定型ではなくルール適用前（analyze時の修正後）の型に戻すこと"""
+        fix = {'file_name': 'zm114.txt', 'field_name': '保管場所', 'to_type': 'REAL'}
+        self._applier([fix]).run_incremental_application()
+        self.assertEqual(self._data_type(), 'REAL')
+
+        # 内容が変わったルールでも最初の型を残す
+        self._applier([dict(fix, to_type='INTEGER')]).run_incremental_application()
+        self.assertEqual(self._data_type(), 'INTEGER')
+
+        self._applier([]).run_incremental_application()
+        self.assertEqual(self._data_type(), 'TEXT')
+        self.assertEqual(RuleVersionStore(self.db_file).previous_types('pattern_rules'), {})
+
+    def test_delta_is_applied_only_after_reload(self):
+        """再ロードに失敗したら差分を未適用のままにし、次回も再ロードすること"""
+        applier = self._applier([{'file_name': 'zm114.txt', 'field_name': '保管場所', 'to_type': 'REAL'}])
+        with mock.patch('loader.load_and_compare', return_value=['zm114.txt']) as load:
+            applier.run_incremental_application(reload=True)
+        load.assert_called_once_with(target_files=['zm114.txt'])
+
+        with mock.patch('loader.load_and_compare', return_value=[]) as load:
+            self.assertEqual(applier.run_incremental_application(reload=True).affected_files, ['zm114.txt'])
+        load.assert_called_once_with(target_files=['zm114.txt'])
+        self.assertTrue(RuleVersionStore(self.db_file).compute_delta('pattern_rules', applier._current_fixes()).is_empty)
+
+        # 再ロードを挟んでもルール適用前の型が残っている
+        self._applier([]).run_incremental_application()
+        self.assertEqual(self._data_type(), 'TEXT')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+実データ型プロファイラ（typeof集計）のテスト
+"""
+
+import sqlite3
+import unittest
+
+import compare_report
+from type_profiler import profile_and_save, profile_table, sample_ranges
+
+
+class TestTypeProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute('CREATE TABLE zm114 ("保管場所" INTEGER, "単価" REAL, "名称" TEXT)')
+        self.conn.executemany("INSERT INTO zm114 VALUES (?, ?, ?)", [
+            (1001, 1.5, 'A'),
+            ('10A1', 2, 'B'),     # INTEGER列に数値化できない文字列
+            (None, None, None),
+        ])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_histogram_and_foreign_values(self):
+        profile = profile_table(self.conn, 'zm114', 'zm114.txt').set_index('column_name')
+        self.assertEqual(profile.loc['保管場所', 'integer_count'], 1)
+        self.assertEqual(profile.loc['保管場所', 'text_count'], 1)
+        self.assertEqual(profile.loc['保管場所', 'null_count'], 1)
+        self.assertEqual(profile.loc['保管場所', 'foreign_count'], 1)
+        # REAL親和性の列では整数値もREALとして格納される
+        self.assertEqual(profile.loc['単価', 'real_count'], 2)
+        self.assertEqual(profile.loc['単価', 'foreign_count'], 0)
+        self.assertEqual(profile.loc['名称', 'dominant_type'], 'text')
+
+    def test_mismatch_view_uses_profile(self):
+        profile_and_save(self.conn, 'zm114', 'zm114.txt')
+        compare_report.save_run(self.conn, [
+            {"File": "zm114.txt", "Column": "保管場所", "Inferred_Type": "INTEGER", "Actual_Type": "INTEGER", "Match": "○"},
+            {"File": "zm114.txt", "Column": "名称", "Inferred_Type": "TEXT", "Actual_Type": "TEXT", "Match": "○"},
+        ])
+        mismatches = compare_report.fetch_frame(self.conn, 'value_type_mismatch')
+        self.assertEqual(list(mismatches['Column']), ['保管場所'])
+
+    def test_sample_ranges(self):
+        self.assertIsNone(sample_ranges(1, 500, sample_rows=1000))
+        ranges = sample_ranges(1, 1_000_000, sample_rows=5000, block_rows=1000)
+        self.assertEqual(len(ranges), 5)
+        self.assertTrue(all(end - start == 1000 for start, end in ranges))
+
+    def test_sampled_profile_reads_only_blocks(self):
+        self.conn.execute("CREATE TABLE big (v INTEGER)")
+        self.conn.executemany("INSERT INTO big VALUES (?)", [(i,) for i in range(10000)])
+        profile = profile_table(self.conn, 'big', sample_rows=2000)
+        self.assertEqual(profile.loc[0, 'sampled'], 1)
+        self.assertEqual(profile.loc[0, 'total'], 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+ユニーク値単位の変換のテスト
+"""
+
+import pandas as pd
+
+from loader import apply_conversion_plan, build_conversion_plan
+from unique_convert import convert_unique
+
+
+def test_converts_each_unique_value_once():
+    """繰り返しの多い列はユニーク値だけを変換し、元の並び・インデックスで返すこと"""
+    calls = []
+
+    def convert(s):
+        calls.append(len(s))
+        return pd.to_numeric(s, errors='coerce')
+
+    series = pd.Series(["10", "20-", None, "10", "x"] * 200, index=range(5, 1005), dtype=object)
+    result = convert_unique(series, convert)
+    assert calls == [4]
+    assert result.index.equals(series.index)
+    pd.testing.assert_series_equal(result, pd.to_numeric(series, errors='coerce'))
+
+
+def test_high_cardinality_falls_back_to_whole_column():
+    """ユニーク値が多い列は列全体をそのまま変換すること"""
+    calls = []
+    series = pd.Series([str(i) for i in range(1000)], dtype=object)
+    convert_unique(series, lambda s: calls.append(len(s)) or s)
+    assert calls == [1000]
+
+
+def test_conversion_plan_matches_row_by_row():
+    """ユニーク値経由の変換（SAP正規化・数値化・日付）が行ごとの変換と同じ結果になること"""
+    df = pd.DataFrame({
+        "数量": ["10", "20-", "", "10"] * 300,
+        "出庫日": ["20240101", "20240105", "", "20240101"] * 300,
+    }, dtype=str)
+    plan = build_conversion_plan(df.columns, {"数量": "INTEGER", "出庫日": "DATETIME"}, "sample.txt", set(),
+                                 {"出庫日": "%Y%m%d"})
+    result = apply_conversion_plan(df, plan)
+    assert result["数量"].tolist()[:4] == [10, -20, pd.NA, 10]
+    assert result["出庫日"].tolist()[:2] == ["2024-01-01 00:00:00", "2024-01-05 00:00:00"]
+    assert pd.isna(result["出庫日"].iloc[2])
+    assert len(result) == 1200
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+実データ型プロファイラ
+SQLite内で typeof() を集計し、テーブルの全列について値ごとの実際の格納型
+（null / integer / real / text / blob）の件数を1回の走査で求める
+
+宣言型（PRAGMA table_info の型）だけでは「INTEGER列の中身がTEXT」を検出できないため、
+結果を column_type_profile テーブルに保存し、統合レポートと不一致パターンで利用する。
+
+大きなテーブルは rowid のブロック単位でサンプリングする（TABLESAMPLE SYSTEM 相当）。
+"""
+
+import math
+import random
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from schema_catalog import get_catalog
+
+STORAGE_CLASSES = ('null', 'integer', 'real', 'text', 'blob')
+SAMPLE_BLOCK_ROWS = 1000
+# 1回のSELECTで集計する列数の上限（1列あたり4式。SQLITE_MAX_COLUMN の既定値2000以内に収める）
+MAX_COLUMNS_PER_SCAN = 400
+
+# 宣言型ごとに想定する格納型（これ以外の非NULL値を「異質な値」として数える）
+# REAL列の整数値・DATETIME列（NUMERIC親和性）の日付文字列は正常な格納形式
+EXPECTED_STORAGE = {
+    'INTEGER': ('integer',),
+    'REAL': ('real', 'integer'),
+    'TEXT': ('text',),
+    'DATETIME': ('text',),
+}
+
+PROFILE_COLUMNS = ['table_name', 'file_name', 'column_name', 'declared_type', 'sampled', 'total',
+                   'null_count', 'integer_count', 'real_count', 'text_count', 'blob_count',
+                   'dominant_type', 'foreign_count']
+
+
+def init_tables(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS column_type_profile (
+            table_name TEXT,
+            file_name TEXT,
+            column_name TEXT,
+            declared_type TEXT,
+            sampled INTEGER,
+            total INTEGER,
+            null_count INTEGER,
+            integer_count INTEGER,
+            real_count INTEGER,
+            text_count INTEGER,
+            blob_count INTEGER,
+            dominant_type TEXT,
+            foreign_count INTEGER,
+            profiled_at DATETIME,
+            PRIMARY KEY (table_name, column_name)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_column_type_profile_file ON column_type_profile (file_name, column_name)")
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def sample_ranges(min_rowid: int, max_rowid: int, sample_rows: int,
+                  block_rows: int = SAMPLE_BLOCK_ROWS, seed: int = 0) -> Optional[List[Tuple[int, int]]]:
+    """サンプリングする rowid の範囲 [start, end) の一覧（全件走査で足りる場合はNone）"""
+    span = max_rowid - min_rowid + 1
+    if span <= sample_rows:
+        return None
+    n_blocks = math.ceil(span / block_rows)
+    n_sample = min(n_blocks, max(1, math.ceil(sample_rows / block_rows)))
+    blocks = sorted(random.Random(seed).sample(range(n_blocks), n_sample))
+    return [(min_rowid + b * block_rows, min_rowid + (b + 1) * block_rows) for b in blocks]
+
+
+def _storage_counts(conn: sqlite3.Connection, table_name: str, columns: List[str],
+                    ranges: Optional[List[Tuple[int, int]]]) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    """(走査行数, {列名: {格納型: 件数}}) を求める。列数が多い場合のみ複数回に分けて走査"""
+    where, params = "", []
+    if ranges:
+        where = " WHERE " + " OR ".join("(rowid >= ? AND rowid < ?)" for _ in ranges)
+        params = [bound for r in ranges for bound in r]
+
+    total = 0
+    counts: Dict[str, Dict[str, int]] = {}
+    for start in range(0, max(len(columns), 1), MAX_COLUMNS_PER_SCAN):
+        chunk = columns[start:start + MAX_COLUMNS_PER_SCAN]
+        expressions = ["COUNT(*)"]
+        for col in chunk:
+            t = f"typeof({_quote(col)})"
+            expressions += [f"SUM({t} = 'null')", f"SUM({t} = 'integer')", f"SUM({t} = 'real')", f"SUM({t} = 'text')"]
+        row = conn.execute(f"SELECT {', '.join(expressions)} FROM {_quote(table_name)}{where}", params).fetchone()
+        total = row[0] or 0
+        for i, col in enumerate(chunk):
+            null_count, integer_count, real_count, text_count = (v or 0 for v in row[1 + 4 * i:5 + 4 * i])
+            counts[col] = {
+                'null': null_count, 'integer': integer_count, 'real': real_count, 'text': text_count,
+                'blob': total - null_count - integer_count - real_count - text_count,
+            }
+    return total, counts
+
+
+def profile_table(conn: sqlite3.Connection, table_name: str, file_name: Optional[str] = None,
+                  sample_rows: Optional[int] = None, seed: int = 0) -> pd.DataFrame:
+    """テーブルの全列の格納型ヒストグラムを求める
+
+    Args:
+        sample_rows: 指定した場合、rowidの範囲がこれを超えるテーブルはブロック単位でサンプリングする
+    """
+    declared = get_catalog(conn).columns(table_name)
+    if not declared:
+        return pd.DataFrame(columns=PROFILE_COLUMNS)
+
+    ranges = None
+    if sample_rows:
+        min_rowid, max_rowid = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {_quote(table_name)}").fetchone()
+        if min_rowid is not None:
+            ranges = sample_ranges(min_rowid, max_rowid, sample_rows, seed=seed)
+
+    total, counts = _storage_counts(conn, table_name, list(declared), ranges)
+
+    rows = []
+    for col, declared_type in declared.items():
+        c = counts[col]
+        non_null = {k: v for k, v in c.items() if k != 'null' and v > 0}
+        dominant = max(non_null, key=non_null.get) if non_null else 'null'
+        expected = EXPECTED_STORAGE.get((declared_type or '').upper())
+        foreign = sum(v for k, v in non_null.items() if k not in expected) if expected else 0
+        rows.append({
+            'table_name': table_name, 'file_name': file_name, 'column_name': col,
+            'declared_type': declared_type, 'sampled': int(ranges is not None), 'total': total,
+            'null_count': c['null'], 'integer_count': c['integer'], 'real_count': c['real'],
+            'text_count': c['text'], 'blob_count': c['blob'],
+            'dominant_type': dominant, 'foreign_count': foreign,
+        })
+    return pd.DataFrame(rows, columns=PROFILE_COLUMNS)
+
+
+def save_profile(conn: sqlite3.Connection, profile: pd.DataFrame) -> None:
+    """プロファイル結果を column_type_profile に保存（テーブル単位で置き換え）"""
+    init_tables(conn)
+    if profile.empty:
+        return
+    profiled_at = datetime.now().isoformat(timespec='seconds')
+    conn.executemany("DELETE FROM column_type_profile WHERE table_name = ?",
+                     [(t,) for t in profile['table_name'].unique()])
+    conn.executemany(f"""
+        INSERT INTO column_type_profile ({', '.join(PROFILE_COLUMNS)}, profiled_at)
+        VALUES ({', '.join('?' for _ in PROFILE_COLUMNS)}, ?)
+    """, [(*(None if pd.isna(v) else v for v in row), profiled_at)
+          for row in profile[PROFILE_COLUMNS].itertuples(index=False, name=None)])
+    conn.commit()
+
+
+def profile_and_save(conn: sqlite3.Connection, table_name: str, file_name: Optional[str] = None,
+                     sample_rows: Optional[int] = None) -> pd.DataFrame:
+    profile = profile_table(conn, table_name, file_name, sample_rows)
+    save_profile(conn, profile)
+    return profile
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+ユニーク値単位の変換
+SAPの抽出データは同じ日付・コード・金額が何度も繰り返されるため、列を factorize して
+ユニーク値だけを変換（日付解析・SAP正規化・数値化）し、コードを通して行に戻す。
+
+- 値の種類が多い列（ユニーク数が行数の UNIQUE_CONVERT_MAX_RATIO 超）はそのまま列全体を変換する
+  （先頭 UNIQUE_CONVERT_PROBE_ROWS 行で判定し、factorize 自体のコストも省く）
+- 変換関数は Series を受け取って同じ長さの Series を返す、値ごとに独立した関数であること
+"""
+
+from typing import Callable
+
+import pandas as pd
+
+from config import UNIQUE_CONVERT_MAX_RATIO
+
+UNIQUE_CONVERT_PROBE_ROWS = 1000
+
+
+def _low_cardinality(series: pd.Series, max_ratio: float) -> bool:
+    probe = series.iloc[:UNIQUE_CONVERT_PROBE_ROWS]
+    return probe.nunique(dropna=False) <= len(probe) * max_ratio
+
+
+def convert_unique(series: pd.Series, convert: Callable[[pd.Series], pd.Series],
+                   max_ratio: float = UNIQUE_CONVERT_MAX_RATIO) -> pd.Series:
+    """ユニーク値だけを convert で変換して元の行に展開する（値の種類が多い列は列全体を変換）"""
+    if len(series) == 0 or not _low_cardinality(series, max_ratio):
+        return convert(series)
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    if len(uniques) > len(series) * max_ratio:
+        return convert(series)
+    converted = convert(pd.Series(uniques, dtype=series.dtype, name=series.name))
+    result = converted.take(codes)
+    result.index = series.index
+    return result
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+ロードのジョブキュー（SQLite）
+分散ロード（distributed_loader.py）のコーディネーターがファイルごとのジョブを load_jobs テーブルに入れ、
+複数のワーカー（プロセス・別ノード）がリース付きで取り出して処理する。外部のブローカーは使わない。
+
+- 取り出し（claim）は BEGIN IMMEDIATE で1件ずつ行い、同じジョブを2つのワーカーが取ることはない
+- 処理中のワーカーはハートビートでリース期限を延ばす。期限が切れたジョブ（ワーカーの異常終了）は
+  別のワーカーが取り直す。WORK_MAX_ATTEMPTS 回失敗したジョブは failed になる
+- リースを失ったワーカーの完了報告は受け付けない（取り直したワーカーの結果だけを使う）
+- キューDBを共有マウントに置けば別ノードのワーカーも参加できる（SQLiteのロックが効くファイルシステムであること）
+- バッチ（load_batches）はコーディネーター1回分。新しいバッチを始めるときは、中断されたまま
+  再開されなかった前のバッチの残りのジョブを cancelled にする
+
+状態: pending → running → done → merged（コーディネーターが master.db に取り込み済み）/ failed / cancelled
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import WORK_LEASE_SECONDS, WORK_MAX_ATTEMPTS, WORK_QUEUE_DB
+
+
+def init_tables(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS load_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            batch_id TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            worker_id TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            staging_db TEXT,
+            result TEXT,
+            error TEXT,
+            enqueued_at DATETIME,
+            finished_at DATETIME,
+            UNIQUE (batch_id, file_name)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_load_jobs_status ON load_jobs (status, job_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS load_batches (
+            batch_id TEXT PRIMARY KEY,
+            target_files TEXT,
+            started_at DATETIME
+        )
+    """)
+
+
+# 取り込みが終わっていないジョブの状態
+OPEN_STATUSES = ('pending', 'running', 'done')
+
+
+class Job:
+    """取り出したジョブ"""
+
+    __slots__ = ('job_id', 'batch_id', 'file_name', 'attempts')
+
+    def __init__(self, job_id: int, batch_id: str, file_name: str, attempts: int):
+        self.job_id = job_id
+        self.batch_id = batch_id
+        self.file_name = file_name
+        self.attempts = attempts
+
+    def __repr__(self) -> str:
+        return f"Job({self.job_id}, {self.batch_id!r}, {self.file_name!r}, attempts={self.attempts})"
+
+
+class WorkQueue:
+    """load_jobs テーブルの操作（呼び出しごとに接続するため、スレッド・プロセス間で共有できる）"""
+
+    def __init__(self, db_file: str = WORK_QUEUE_DB, lease_seconds: float = WORK_LEASE_SECONDS,
+                 max_attempts: int = WORK_MAX_ATTEMPTS, clock: Callable[[], float] = time.time):
+        self.db_file = db_file
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            init_tables(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 複数のワーカーが同時に書き込むため、ロック待ちを長めにとる
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def _write(self, func):
+        """BEGIN IMMEDIATE のトランザクションで func(conn) を実行"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        finally:
+            conn.close()
+
+    def enqueue(self, batch_id: str, file_names: Iterable[str]) -> int:
+        """ファイルごとのジョブを追加し、追加した件数を返す（同じバッチの同じファイルは1件）"""
+        now = datetime.now().isoformat(timespec='seconds')
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO load_jobs (batch_id, file_name, enqueued_at) VALUES (?, ?, ?)",
+                             [(batch_id, name, now) for name in file_names])
+            return conn.total_changes - before
+        return self._write(insert)
+
+    def start_batch(self, batch_id: str, file_names: Iterable[str], target_files: Optional[List[str]],
+                    started_at: str) -> int:
+        """バッチを記録してジョブを追加し、追加した件数を返す（target_files は部分再ロードの対象）"""
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO load_batches VALUES (?, ?, ?)",
+            (batch_id, None if target_files is None else json.dumps(target_files, ensure_ascii=False), started_at)))
+        return self.enqueue(batch_id, file_names)
+
+    def batch_info(self, batch_id: str) -> Tuple[Optional[List[str]], Optional[str]]:
+        """バッチの (部分再ロードの対象ファイル, 開始日時)"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT target_files, started_at FROM load_batches WHERE batch_id = ?",
+                               (batch_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None, None
+        return (None if row[0] is None else json.loads(row[0])), row[1]
+
+    def open_batches(self) -> List[str]:
+        """取り込みが終わっていないジョブがあるバッチ（新しい順）"""
+        conn = self._connect()
+        try:
+            return [row[0] for row in conn.execute(f"""
+                SELECT batch_id FROM load_jobs WHERE status IN {OPEN_STATUSES}
+                GROUP BY batch_id ORDER BY MAX(job_id) DESC
+            """)]
+        finally:
+            conn.close()
+
+    def cancel_batch(self, batch_id: str) -> int:
+        """取り込みが終わっていないジョブを cancelled にし、件数を返す（処理中のワーカーの結果は破棄される）"""
+        now = datetime.now().isoformat(timespec='seconds')
+        return self._write(lambda conn: conn.execute(f"""
+            UPDATE load_jobs SET status = 'cancelled', lease_until = NULL, finished_at = ?
+            WHERE batch_id = ? AND status IN {OPEN_STATUSES}
+        """, (now, batch_id)).rowcount)
+
+    def claim(self, worker_id: str, batch_id: Optional[str] = None) -> Optional[Job]:
+        """未処理のジョブ（またはリース切れのジョブ）を1件取り出す（なければNone）
+
+        batch_id を指定した場合はそのバッチのジョブだけを取り出す。
+        """
+        now = self.clock()
+        batch_filter = "" if batch_id is None else "AND batch_id = ?"
+        params = (now,) if batch_id is None else (now, batch_id)
+
+        def take(conn):
+            row = conn.execute(f"""
+                SELECT job_id, batch_id, file_name, attempts FROM load_jobs
+                WHERE (status = 'pending' OR (status = 'running' AND lease_until < ?)) {batch_filter}
+                ORDER BY job_id LIMIT 1
+            """, params).fetchone()
+            if row is None:
+                return None
+            job_id, batch_id, file_name, attempts = row
+            if attempts >= self.max_attempts:
+                # リース切れを繰り返したジョブ（処理中に毎回落ちるファイルなど）は諦める
+                conn.execute("UPDATE load_jobs SET status = 'failed', error = ?, finished_at = ? WHERE job_id = ?",
+                             ("リース切れの上限回数に達しました", datetime.now().isoformat(timespec='seconds'), job_id))
+                return take(conn)
+            conn.execute("""
+                UPDATE load_jobs SET status = 'running', worker_id = ?, lease_until = ?, attempts = attempts + 1
+                WHERE job_id = ?
+            """, (worker_id, now + self.lease_seconds, job_id))
+            return Job(job_id, batch_id, file_name, attempts + 1)
+        return self._write(take)
+
+    def heartbeat(self, job: Job, worker_id: str) -> bool:
+        """リース期限を延ばす（リースを失っていた場合はFalse）"""
+        def extend(conn):
+            return conn.execute("""
+                UPDATE load_jobs SET lease_until = ?
+                WHERE job_id = ? AND worker_id = ? AND status = 'running' AND attempts = ?
+            """, (self.clock() + self.lease_seconds, job.job_id, worker_id, job.attempts)).rowcount == 1
+        return self._write(extend)
+
+    def complete(self, job: Job, worker_id: str, staging_db: str, result: Dict) -> bool:
+        """処理結果（ステージングDB・テーブル・比較レポートの行）を記録（リースを失っていた場合はFalse）"""
+        def finish(conn):
+            return conn.execute("""
+                UPDATE load_jobs SET status = 'done', staging_db = ?, result = ?, error = NULL, finished_at = ?
+                WHERE job_id = ? AND worker_id = ? AND status = 'running' AND attempts = ?
+            """, (staging_db, json.dumps(result, ensure_ascii=False, default=str),
+                  datetime.now().isoformat(timespec='seconds'), job.job_id, worker_id, job.attempts)).rowcount == 1
+        return self._write(finish)
+
+    def fail(self, job: Job, worker_id: str, error: str) -> None:
+        """失敗を記録（上限回数までは pending に戻して再試行）"""
+        def record(conn):
+            status = 'failed' if job.attempts >= self.max_attempts else 'pending'
+            conn.execute("""
+                UPDATE load_jobs SET status = ?, error = ?, lease_until = NULL, finished_at = ?
+                WHERE job_id = ? AND worker_id = ? AND status = 'running' AND attempts = ?
+            """, (status, error, datetime.now().isoformat(timespec='seconds'), job.job_id, worker_id, job.attempts))
+        self._write(record)
+
+    def mark_merged(self, job_id: int) -> None:
+        self._write(lambda conn: conn.execute("UPDATE load_jobs SET status = 'merged' WHERE job_id = ?", (job_id,)))
+
+    def mark_failed(self, job_id: int, error: str) -> None:
+        """取り込みに失敗し続けた完了済みのジョブを failed にする"""
+        self._write(lambda conn: conn.execute(
+            "UPDATE load_jobs SET status = 'failed', error = ? WHERE job_id = ? AND status = 'done'",
+            (error, job_id)))
+
+    def merged_rows(self, batch_id: str) -> List[Dict]:
+        """取り込み済みのジョブの比較レポートの行（中断・再開をまたいでバッチ全体）"""
+        conn = self._connect()
+        try:
+            results = [row[0] for row in conn.execute(
+                "SELECT result FROM load_jobs WHERE batch_id = ? AND status = 'merged' ORDER BY job_id", (batch_id,))]
+        finally:
+            conn.close()
+        return [row for result in results for row in json.loads(result)["rows"]]
+
+    def done_jobs(self, batch_id: str) -> List[Dict]:
+        """取り込み待ち（done）のジョブ → [{job_id, file_name, staging_db, result}]"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT job_id, file_name, staging_db, result FROM load_jobs
+                WHERE batch_id = ? AND status = 'done' ORDER BY job_id
+            """, (batch_id,)).fetchall()
+        finally:
+            conn.close()
+        return [{"job_id": job_id, "file_name": file_name, "staging_db": staging_db, "result": json.loads(result)}
+                for job_id, file_name, staging_db, result in rows]
+
+    def counts(self, batch_id: str) -> Dict[str, int]:
+        """状態ごとのジョブ数"""
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM load_jobs WHERE batch_id = ? GROUP BY status",
+                                     (batch_id,)).fetchall())
+        finally:
+            conn.close()
+
+    def failures(self, batch_id: str) -> List[Dict]:
+        conn = self._connect()
+        try:
+            return [{"file_name": name, "error": error} for name, error in conn.execute(
+                "SELECT file_name, error FROM load_jobs WHERE batch_id = ? AND status = 'failed' ORDER BY job_id",
+                (batch_id,))]
+        finally:
+            conn.close()
+
+    def has_open_jobs(self, batch_id: Optional[str] = None) -> bool:
+        """未処理・処理中のジョブがあるか（batch_id を指定しない場合はバッチを問わない）"""
+        conn = self._connect()
+        try:
+            if batch_id is None:
+                row = conn.execute("SELECT 1 FROM load_jobs WHERE status IN ('pending', 'running') LIMIT 1").fetchone()
+            else:
+                row = conn.execute("SELECT 1 FROM load_jobs WHERE batch_id = ? AND status IN ('pending', 'running') "
+                                   "LIMIT 1", (batch_id,)).fetchone()
+            return row is not None
+        finally:
+            conn.close()